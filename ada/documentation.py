@@ -200,6 +200,162 @@ libadalang_docs = {
         in ``Mapping`` does not belong to ``Context`` or if an analysis unit
         appears twice as a key in ``Mapping``.
     """,
+    'libadalang.set_reference_index_enabled': """
+        Enable or disable the use of the reference index for all analysis
+        units in ``Context``.
+
+        When enabled, each analysis unit gets an index that maps canonical
+        defining names to the references found in that unit, so that
+        ``find_all_references`` (and the properties built on top of it) do not
+        need to traverse and resolve whole units for each query. Indexes are
+        built lazily, and the index of a unit is rebuilt only when one of its
+        dependencies (the unit itself, the units in its import closure and the
+        units that contain the defining names it references) is reparsed.
+        Disabling the reference index releases all the indexes built so far.
+    """,
+    'libadalang.set_nameres_memo_dependency_scoped': """
+        Enable or disable dependency-scoped invalidation of memoized name
+        resolutions for all analysis units in ``Context``.
+
+        By default, memoized resolutions are discarded after any change in the
+        analysis context. When enabled, the resolutions memoized for a unit
+        are discarded only when a unit in its import closure (the unit itself,
+        the units it withs, its parent units, ...) is reparsed. Resolutions
+        made in the context of generic instantiations, and resolutions for
+        units whose import closure contains units that could not be found,
+        are still discarded after any change in the analysis context.
+    """,
+    'libadalang.set_nameres_memo_solver_profiling': """
+        Enable or disable the measure of the time spent solving xref equations
+        in ``Context`` (see the solver time counter of the name resolution
+        memoization table). This is disabled by default, as it requires
+        reading the clock twice per computed resolution.
+    """,
+    'libadalang.nameres_memo_stats': """
+        Return the counters for the name resolution memoization table of
+        ``Context``: the number of resolutions answered from the table
+        (hits), the number of resolutions that had to be computed (misses)
+        and the number of memoized resolutions that were discarded after a
+        change in the analysis context (evictions). Also return counters for
+        the computed resolutions: the number of xref equations that were
+        solved (equations), the number of them whose solving timed out
+        (timeouts, only counted for resolutions that do not generate
+        diagnostics) and the total time in seconds spent solving them (solver
+        time).
+
+        The solver time is measured only when solver profiling is enabled,
+        and is 0 otherwise. The time spent solving an equation excludes the
+        time spent in the resolutions that it triggers for other nodes, so
+        that each resolution is accounted for only once.
+
+        Counters are accumulated since the creation of ``Context``, or since
+        they were last reset.
+    """,
+    'libadalang.nameres_memo_reset_stats': """
+        Reset to zero the counters for the name resolution memoization table
+        of ``Context``.
+    """,
+    'libadalang.set_env_caches_collection_policy': """
+        Set the policy used to collect the lexical env caches of ``Context``.
+
+        Each time the total number of cache entries has grown by
+        ``Threshold_Increment`` since the last collection attempt, a
+        collection is attempted: units with less than ``Min_Entry_Count``
+        entries are left alone, and ``Kind`` decides which other units must
+        have their caches collected:
+
+        % if lang == "c":
+        * 0 (usefulness): collect caches whose usefulness (ratio of lookups,
+          of hits and of recent lookups) is lower than the ratio of cache
+          entries they hold. This is the default.
+        * 1 (LRU): collect caches that were not looked up during the last
+          ``LRU_Max_Age`` collection attempts.
+        * 2 (never): never collect caches.
+        % else:
+        * ``"usefulness"``: collect caches whose usefulness (ratio of lookups,
+          of hits and of recent lookups) is lower than the ratio of cache
+          entries they hold. This is the default.
+        * ``"lru"``: collect caches that were not looked up during the last
+          ``LRU_Max_Age`` collection attempts.
+        * ``"never"``: never collect caches.
+        % endif
+
+        If ``Memory_Budget`` is positive, caches of the least recently used
+        units are also collected until the estimated memory size of all cache
+        entries fits in it (in bytes). Collection attempts happen every 10000
+        new cache entries at most, which is the granularity for thresholds and
+        memory budgets.
+
+        % if lang == 'python':
+        Arguments that are not passed keep their current value.
+
+        % endif
+        This raises a ``Precondition_Failure`` exception if
+        ``Threshold_Increment`` or ``LRU_Max_Age`` is not positive, or if
+        ``Min_Entry_Count`` or ``Memory_Budget`` is negative.
+    """,
+    'libadalang.env_caches_collection_policy': """
+        Return the policy used to collect the lexical env caches of
+        ``Context``: see ``set_env_caches_collection_policy`` for the meaning
+        of ``Kind``, ``Threshold_Increment``, ``Min_Entry_Count``,
+        ``LRU_Max_Age`` and ``Memory_Budget``.
+    """,
+    'libadalang.context_env_caches_stats': """
+        Return statistics about the lexical env caches of all analysis units
+        in ``Context``: number of cache entries, number of lookups and hits
+        since the caches were last collected, and number of unit cache
+        collections.
+    """,
+    'libadalang.unit_env_caches_stats': """
+        Return statistics about the lexical env caches of ``Unit``: number of
+        cache entries, number of lookups and hits since the caches were last
+        collected, and number of collections.
+    """,
+    'libadalang.env_caches_stats': """
+        Return statistics about the lexical env caches of ``Unit`` if it is
+        not None, or of all analysis units in this context otherwise: number
+        of cache entries, number of lookups and hits since the caches were
+        last collected, and number of collections.
+    """,
+    'libadalang.set_memory_budget': """
+        Set the estimated memory size (in bytes) that the data derived from
+        all analysis units in ``Context`` must fit in, or remove the memory
+        budget if ``Budget`` is zero.
+
+        Derived data is the resolutions memoized during name resolution and
+        the reference and derivation indexes of units. Its size is computed
+        from the size of the objects that hold it. When the budget is
+        exceeded, the least recently queried units are reset: their derived
+        data is evicted, and computed again transparently the next time these
+        units are queried, and their lexical env caches are collected at the
+        next collection attempt.
+
+        Note that this budget does not bound the memory used by the analysis
+        context: source buffers, tokens, parse trees and lexical environments
+        are never freed (so node and unit references remain valid), and they
+        are not counted in the budget. Their memory grows with the number of
+        units loaded in the context, whatever the budget.
+
+        The budget is checked when it is set, and then every 1000 resolutions
+        at most. These periodic checks only reset units that were not queried
+        since the previous check (the working set is kept).
+
+        This raises a ``Precondition_Failure`` exception if ``Budget`` is
+        negative.
+    """,
+    'libadalang.enforce_memory_budget': """
+        Reset the least recently queried analysis units in ``Context`` until
+        the rest fits in its memory budget, including units in the working
+        set. This is useful to release derived data when the application is
+        idle.
+    """,
+    'libadalang.memory_budget_stats': """
+        Return statistics about the memory budget of ``Context``: memory size
+        (in bytes) of the derived data of all units (not including tokens,
+        parse trees nor lexical environments), number of units that hold
+        derived data, number of unit resets and number of reset units whose
+        data was computed again.
+    """,
     'libadalang.project_provider.invalid_project': """
         Raised when an error occurs while loading a project file.
     """,
@@ -220,6 +376,39 @@ libadalang_docs = {
         Source files are decoded using the given charset. If it is ``${null}``,
         the default charset (ISO-8859-1) is used.
 
+        % if lang != 'c':
+        If ``scan_headers`` is true, source files are not completely parsed:
+        only their context clauses and library item header are scanned to
+        determine the name and the kind of the compilation unit they contain,
+        which is much faster for big source files. Source files for which this
+        quick scan is ambiguous (several compilation units in the same file,
+        non-ASCII identifiers, brackets encoding, ...) are still fully parsed.
+        Note that in this mode, syntax errors after the library item header go
+        unnoticed, so the corresponding source files are not discarded. Header
+        scanning is disabled for charsets that are not ASCII-compatible
+        (UTF-16, UTF-32).
+
+        If ``cache_file`` is not ``${null}``, it designates a file used to
+        cache the list of compilation units found in each source file, keyed
+        by source file name, size and content digest. Source files whose
+        content has not changed since the cache file was written are neither
+        scanned nor parsed again. The cache file is created if it does not
+        exist, and it is ignored if it is invalid or if it was created with a
+        different charset or header scanning setting. The cache file is
+        replaced atomically, so concurrent users of the same cache file never
+        see a partially written one. Note that computing content digests
+        still requires reading every source file on each call.
+
+        ``jobs`` is the number of threads used to scan/parse source files in
+        parallel (0 means one thread per CPU). The result does not depend on
+        the number of jobs: source files are always considered in the given
+        order to decide which compilation unit to keep when the same unit is
+        found several times.
+        % if lang == 'python':
+        A ``ValueError`` is raised if ``jobs`` is negative.
+        % endif
+
+        % endif
         % if lang == 'c':
         ``input_files`` must point to a ``NULL``-terminated array of
         filenames.  Once this function returns, this array and the strings
@@ -231,4 +420,47 @@ libadalang_docs = {
 
         .. TODO: Find a way to report discarded source files/compilation units.
     """,
+    'libadalang.auto_provider_options': """
+        Options to tune how auto unit providers process source files.
+
+        If ``scan_headers`` is non-zero, source files are not completely
+        parsed: only their context clauses and library item header are scanned
+        to determine the name and the kind of the compilation unit they
+        contain, which is much faster for big source files. Source files for
+        which this quick scan is ambiguous (several compilation units in the
+        same file, non-ASCII identifiers, brackets encoding, ...) are still
+        fully parsed. Note that in this mode, syntax errors after the library
+        item header go unnoticed, so the corresponding source files are not
+        discarded. Header scanning is disabled for charsets that are not
+        ASCII-compatible (UTF-16, UTF-32).
+
+        If ``cache_file`` is not ``NULL``, it designates a file used to cache
+        the list of compilation units found in each source file, keyed by
+        source file name, size and content digest. Source files whose content
+        has not changed since the cache file was written are neither scanned
+        nor parsed again. The cache file is created if it does not exist, and
+        it is ignored if it is invalid or if it was created with a different
+        charset or header scanning setting. The cache file is replaced
+        atomically, so concurrent users of the same cache file never see a
+        partially written one. Note that computing content digests still
+        requires reading every source file on each call.
+
+        ``jobs`` is the number of threads used to scan/parse source files in
+        parallel (0 means one thread per CPU). The result does not depend on
+        the number of jobs: source files are always considered in the given
+        order to decide which compilation unit to keep when the same unit is
+        found several times.
+    """,
+    'libadalang.create_auto_provider_with_options': """
+        Like ``${capi.get_name('create_auto_provider')}``, but process source
+        files according to the given ``options``. If ``options`` is ``NULL``,
+        use the default options: no header scanning, no cache file and a
+        single job.
+
+        If ``options->jobs`` is negative, this sets the last exception to a
+        ``Precondition_Failure`` error and returns ``NULL``.
+
+        Once this function returns, ``options`` and the strings it references
+        can be deallocated.
+    """,
 }
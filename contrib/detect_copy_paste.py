@@ -757,8 +757,8 @@ def do_files(files):
     Analyze a list of files. Issue messages on longer copy-pastes, either
     inside the same file, or between different files.
     """
-    contexts = [(f, lal.AnalysisContext()) for f in files]
-    units = [(f, c.get_from_file(f)) for (f, c) in contexts]
+    context = lal.AnalysisContext()
+    units = [(f, context.get_from_file(f)) for f in files]
 
     # For the analysis of multiple files, issue a message for files that are
     # not parsable, and proceed with others.
@@ -5,232 +5,308 @@ This script will detect copy-pastes in the input Ada sources, taking as
 input list of files and directories.
 
 It starts by turning the text of the Ada sources into a string of hashes,
-roughly one per logical line of code.
+roughly one per logical line of code. This can be done in parallel for
+different files (see the --jobs option). It then uses the suffix array and LCP
+array of this string to find repeated substrings.
 """
 
 import argparse
+from array import array
+import bisect
 import datetime
+import multiprocessing
 import os
 
 import libadalang as lal
 
 
-# Suffix array computation in linear time using Karkkainen Sanders skew
-# algorithm. This is the exact implementation found at the end of the
-# original paper (in C++ in the paper).
-# Original paper can be found at:
-# <https://pdfs.semanticscholar.org/8dfc/1a49894632a27a88490db18441180a215fe2.pdf>.
-#
-# For note this algorithm was the first to propose linear time SA
-# construction. A faster one has been discovered since:
+# Suffix array computation in linear time using the SA-IS algorithm:
 # Nong, Ge; Zhang, Sen; Chan, Wai Hong (2009). Linear Suffix Array Construction
 # by Almost Pure Induced-Sorting. 2009 Data Compression Conference.
 #
-# Also in 2009 a new algorithm was found to handle in linear time dynamic
-# suffix array (compute a suffix array after insertion/deletion of part of
-# the input).
+# This implementation follows the one from the AtCoder Library
+# <https://github.com/atcoder/ac-library>. All sequences are stored in arrays
+# of machine integers (and the L/S types in a bytearray), which are much more
+# compact than lists of Python integers for big inputs, and no copy of the
+# input is made.
 
-def radix_pass(a, b, r, n, k):
-    c = [0] * (k + 1)
-    for i in range(n):
-        c[r[a[i]]] += 1
-    s = 0
-    for i in range(k + 1):
-        t = c[i]
-        c[i] = s
-        s += t
+def suffix_array(s, upper):
+    """
+    Return the suffix array for ``s``, i.e. the array of the start indexes of
+    the suffixes of ``s`` in lexicographic order.
+
+    :param s: Sequence of integers in the ``[0, upper]`` range.
+    :type s: array.array
+    :param int upper: Upper bound for the integers in ``s``.
+    :rtype: array.array
+    """
+    n = len(s)
+    if n == 0:
+        return array('i')
+    elif n == 1:
+        return array('i', [0])
+    elif n == 2:
+        return array('i', [0, 1] if s[0] < s[1] else [1, 0])
+
+    sa = array('i', [0]) * n
+
+    # ls[i] is 1 if the suffix starting at i is S-type (smaller than the
+    # suffix starting at i + 1), 0 if it is L-type.
+    ls = bytearray(n)
+    for i in range(n - 2, -1, -1):
+        ls[i] = ls[i + 1] if s[i] == s[i + 1] else s[i] < s[i + 1]
+
+    # Start of the L-type and S-type buckets for each character
+    sum_l = array('i', [0]) * (upper + 1)
+    sum_s = array('i', [0]) * (upper + 1)
     for i in range(n):
-        b[c[r[a[i]]]] = a[i]
-        c[r[a[i]]] += 1
-
-
-def suffix_array(s, k=256, n=None):
-    SA = []
-    if n is None:
-        n = len(s)
-        s += [0, 0, 0]
-
-    n0 = (n + 2) // 3
-    n1 = (n + 1) // 3
-    n2 = n // 3
-    n02 = n0 + n2
-
-    s12 = [0] * (n02 + 3)
-    SA12 = [0] * (n02 + 3)
-    s0 = [0] * n0
-    SA0 = [0] * n0
-    j = 0
-    for i in range(n + (n0 - n1)):
-        if i % 3 != 0:
-            s12[j] = i
-            j += 1
-
-    # radix sort of s12 triples
-    radix_pass(s12, SA12, s[2:], n02, k)
-    radix_pass(SA12, s12, s[1:], n02, k)
-    radix_pass(s12, SA12, s, n02, k)
-
-    name = 0
-    c0 = c1 = c2 = -1
-    for i in range(n02):
-        if s[SA12[i]] != c0 or s[SA12[i] + 1] != c1 or s[SA12[i] + 2] != c2:
-            name += 1
-            c0 = s[SA12[i]]
-            c1 = s[SA12[i] + 1]
-            c2 = s[SA12[i] + 2]
-        if SA12[i] % 3 == 1:
-            s12[SA12[i] // 3] = name
+        if ls[i]:
+            sum_l[s[i] + 1] += 1
         else:
-            s12[SA12[i] // 3 + n0] = name
+            sum_s[s[i]] += 1
+    for i in range(upper + 1):
+        sum_s[i] += sum_l[i]
+        if i < upper:
+            sum_l[i + 1] += sum_s[i]
+
+    def induce(lms):
+        for i in range(n):
+            sa[i] = -1
+
+        buf = array('i', sum_s)
+        for d in lms:
+            if d != n:
+                sa[buf[s[d]]] = d
+                buf[s[d]] += 1
+
+        buf = array('i', sum_l)
+        sa[buf[s[n - 1]]] = n - 1
+        buf[s[n - 1]] += 1
+        for i in range(n):
+            v = sa[i]
+            if v >= 1 and not ls[v - 1]:
+                sa[buf[s[v - 1]]] = v - 1
+                buf[s[v - 1]] += 1
+
+        buf = array('i', sum_l)
+        for i in range(n - 1, -1, -1):
+            v = sa[i]
+            if v >= 1 and ls[v - 1]:
+                buf[s[v - 1] + 1] -= 1
+                sa[buf[s[v - 1] + 1]] = v - 1
+
+    # Leftmost S-type suffixes, and their rank in the text
+    lms_map = array('i', [-1]) * (n + 1)
+    lms = array('i')
+    for i in range(1, n):
+        if not ls[i - 1] and ls[i]:
+            lms_map[i] = len(lms)
+            lms.append(i)
+    m = len(lms)
+
+    induce(lms)
+
+    if m:
+        # Name LMS substrings in sorted order, then sort LMS suffixes by
+        # computing the suffix array of the string of names.
+        sorted_lms = array('i', (v for v in sa if lms_map[v] != -1))
+        rec_s = array('i', [0]) * m
+        rec_upper = 0
+        rec_s[lms_map[sorted_lms[0]]] = 0
+        for i in range(1, m):
+            left = sorted_lms[i - 1]
+            right = sorted_lms[i]
+            end_l = lms[lms_map[left] + 1] if lms_map[left] + 1 < m else n
+            end_r = lms[lms_map[right] + 1] if lms_map[right] + 1 < m else n
+            same = True
+            if end_l - left != end_r - right:
+                same = False
+            else:
+                while left < end_l and s[left] == s[right]:
+                    left += 1
+                    right += 1
+                if left == n or s[left] != s[right]:
+                    same = False
+            if not same:
+                rec_upper += 1
+            rec_s[lms_map[sorted_lms[i]]] = rec_upper
 
-    if name < n02:
-        SA12 = suffix_array(s12, name, n02)
-    else:
-        for i in range(n02):
-            SA12[s12[i] - 1] = i
-
-    j = 0
-    for i in range(n02):
-        if SA12[i] < n0:
-            s0[j] = 3 * SA12[i]
-            j += 1
-    radix_pass(s0, SA0, s, n0, k)
-    p = 0
-    t = n0 - n1
-    for k in range(n):
-        i = SA12[t] * 3 + 1 \
-            if SA12[t] < n0 else (SA12[t] - n0) * 3 + 2
-        j = SA0[p]
-        if (SA12[t] < n0 and (s[i], s12[SA12[t] + n0]) <=
-                (s[j], s12[j // 3])) or \
-                (s[i], s[i + 1], s12[SA12[t] - n0 + 1]) <= \
-                (s[j], s[j + 1], s12[j // 3 + n0]):
-            SA.append(i)
-            t += 1
-            if t == n02:
-                k += 1
-                while p < n0:
-                    SA.append(SA0[p])
-                    p += 1
-                break
-        else:
-            SA.append(j)
-            p += 1
-            if p == n0:
-                while t < n02:
-                    SA.append(SA12[t] * 3 + 1 if SA12[t] < n0
-                              else (SA12[t] - n0) * 3 + 2)
-                    t += 1
-                break
+        rec_sa = suffix_array(rec_s, rec_upper)
+        for i in range(m):
+            sorted_lms[i] = lms[rec_sa[i]]
+        induce(sorted_lms)
 
-    return SA
+    return sa
 
 
-class Code(object):
+def lcp_array(s, sa):
     """
-    Define a 'code' for a construct rooted at a given node, which consists in 3
-    fields:
-    - a hash encoding a construct;
-    - a node representing this construct;
-    - the name of the file containing the node.
+    Return the longest common prefix array for ``s`` and its suffix array
+    ``sa``: the item at index ``i`` is the length of the longest common
+    prefix of the suffixes starting at ``sa[i]`` and ``sa[i + 1]``.
+
+    This uses the linear time algorithm from: Kasai, Toru; Lee, Gunho;
+    Arimura, Hiroki; Arikawa, Setsuo; Park, Kunsoo (2001). Linear-Time
+    Longest-Common-Prefix Computation in Suffix Arrays and Its Applications.
+
+    :type s: array.array
+    :type sa: array.array
+    :rtype: array.array
     """
-    __slots__ = ('h', 'node', 'filename')
+    n = len(s)
+    if n == 0:
+        return array('i')
 
-    def __init__(self, h, node, filename):
-        self.h = h
-        self.node = node
-        self.filename = filename
+    rank = array('i', [0]) * n
+    for i in range(n):
+        rank[sa[i]] = i
+
+    lcp = array('i', [0]) * (n - 1)
+    h = 0
+    for i in range(n):
+        if h > 0:
+            h -= 1
+        if rank[i] == 0:
+            continue
+        j = sa[rank[i] - 1]
+        while j + h < n and i + h < n and s[j + h] == s[i + h]:
+            h += 1
+        lcp[rank[i] - 1] = h
+    return lcp
+
+
+class FileCodes(object):
+    """
+    Codes for the constructs in a source file, as computed by an ``Encoder``.
 
-    @property
-    def line(self):
-        return self.node.token_start.sloc_range.start.line
+    Codes are stored in a compact form that does not reference Libadalang
+    nodes, so that they can be computed in worker processes:
+
+    - ``symbols`` is the list of strings that encode constructs in this file;
+    - ``codes`` is an array of indexes in ``symbols``, starting from 1 (0
+      stands for local names, which all match ``Encoder.JOKER``);
+    - ``lines`` is an array with the first line of each construct, plus one
+      for the end-of-file marker.
+
+    ``codes`` is None if the file could not be parsed.
+    """
+    __slots__ = ('filename', 'symbols', 'codes', 'lines')
 
-    @property
-    def end_line(self):
-        return self.node.token_end.sloc_range.end.line
+    def __init__(self, filename, symbols, codes, lines):
+        self.filename = filename
+        self.symbols = symbols
+        self.codes = codes
+        self.lines = lines
 
 
 class Encoder(object):
 
     JOKER = 1
 
-    def __init__(self):
-        self.rank = 4
-        self.rank_dict = {}
+    def __init__(self, ignore_ids=False):
+        self.ignore_ids = ignore_ids
 
-    def set_local_names(self, node, reset=True):
+    @staticmethod
+    def local_names(root):
         """Collect local names for a given subtree.
 
-        :type node: lal.AdaNode
-        :return: the list of local names
+        :type root: lal.AdaNode
+        :return: the set of local names
         :rtype: set[str]
         """
+        result = set()
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.is_a(lal.BaseTypeDecl):
+                if node.f_type_id is not None:
+                    result.add(node.f_type_id.text)
+            elif node.is_a(lal.EntryDecl):
+                if node.f_entry_id is not None:
+                    result.add(node.f_entry_id.text)
+            elif node.is_a(lal.EnumLiteralDecl):
+                if node.f_enum_identifier is not None:
+                    result.add(node.f_enum_identifier.text)
+            elif hasattr(node, 'f_id'):
+                if node.f_id is not None:
+                    result.add(node.f_id.text)
+            elif hasattr(node, 'f_ids'):
+                for ident in node.f_ids:
+                    result.add(ident.text)
+
+            stack.extend(sub for sub in node if sub is not None)
+        return result
 
-        if reset:
-            self.local_names = set()
-
-        if node.is_a(lal.BaseTypeDecl):
-            if node.f_type_id is not None:
-                self.local_names.add(node.f_type_id.text)
-        elif node.is_a(lal.EntryDecl):
-            if node.f_entry_id is not None:
-                self.local_names.add(node.f_entry_id.text)
-        elif node.is_a(lal.EnumLiteralDecl):
-            if node.f_enum_identifier is not None:
-                self.local_names.add(node.f_enum_identifier.text)
-        elif hasattr(node, 'f_id'):
-            if node.f_id is not None:
-                self.local_names.add(node.f_id.text)
-        elif hasattr(node, 'f_ids'):
-            for ident in node.f_ids:
-                self.local_names.add(ident.text)
-
-        for sub in node:
-            if sub is not None:
-                self.set_local_names(sub, reset=False)
-
-    def encode(self, filename, node, ignore_ids=False):
-        if ignore_ids:
-            self.local_names = set()
-        else:
-            self.set_local_names(node, reset=True)
+    def encode(self, filename, root):
+        """Encode the constructs in the ``root`` tree, in source order.
 
-        result = list(self.encode_internal(filename, node))
+        :type filename: str
+        :type root: lal.AdaNode
+        :rtype: FileCodes
+        """
+        local_names = set() if self.ignore_ids else self.local_names(root)
+        symbols = {}
+        codes = array('i')
+        lines = array('i')
 
-        # Add marker unique to the file to avoid cross file boundaries matches
-        result.append(Code(self.rank, node, filename))
-        self.rank += 1
-        return result
+        stack = [root]
+        while stack:
+            node = stack.pop()
 
-    def encode_internal(self, filename, node):
-        # Skip declaration as we are usually interested in bodies
-        if node.is_a(lal.SubpDecl, lal.ObjectDecl, lal.BaseTypeDecl):
-            pass
-        # Handle constructs with children
-        elif len(node) > 0:
-            result = []
-            for sub in node:
-                if sub is not None:
-                    result += list(self.encode_internal(filename, sub))
-            if len(result) == 1:
-                yield result[0]
-            elif len(result) > 1:
-                for r in result:
-                    yield r
-        # Ignore empty lists
-        elif node.is_a(lal.AdaNodeList, lal.AdaList, lal.PragmaNodeList):
-            pass
-        # Local names are made 'anonymous'
-        elif node.text in self.local_names:
-            yield Code(Encoder.JOKER, node, filename)
+            # Skip declaration as we are usually interested in bodies
+            if node.is_a(lal.SubpDecl, lal.ObjectDecl, lal.BaseTypeDecl):
+                pass
+            # Handle constructs with children
+            elif len(node) > 0:
+                stack.extend(
+                    sub for sub in reversed(list(node)) if sub is not None
+                )
+            # Ignore empty lists
+            elif node.is_a(lal.AdaNodeList, lal.AdaList, lal.PragmaNodeList):
+                pass
+            else:
+                # Local names are made 'anonymous'
+                if node.text in local_names:
+                    codes.append(0)
+                # Finally take care of other entities. Include kind of the
+                # entities in the name to avoid collisions.
+                else:
+                    s = str(node.kind_name) + ':' + node.text
+                    codes.append(symbols.setdefault(s, len(symbols) + 1))
+                lines.append(node.token_start.sloc_range.start.line)
+
+        # Line for the marker added at the end of each file
+        lines.append(root.token_start.sloc_range.start.line)
+
+        return FileCodes(filename, list(symbols), codes, lines)
+
+
+FILES_PER_CONTEXT = 20
+"""
+Number of files that each worker parses with the same analysis context. The
+context is discarded after that, so that memory usage does not grow with the
+number of files.
+"""
+
+
+def encode_files(args):
+    """
+    Parse and encode the given files. This is run in worker processes.
+
+    :param args: List of filenames, and whether to ignore identifiers.
+    :rtype: list[FileCodes]
+    """
+    filenames, ignore_ids = args
+    context = lal.AnalysisContext()
+    encoder = Encoder(ignore_ids)
+    result = []
+    for f in filenames:
+        unit = context.get_from_file(f)
+        if unit.root is None:
+            result.append(FileCodes(f, None, None, None))
         else:
-            # Finally take care of other entities. Include kind of the
-            # entities in the name to avoid collisions.
-            s = str(node.kind_name) + ':' + node.text
-            if s not in self.rank_dict:
-                self.rank_dict[s] = self.rank
-                self.rank += 1
-            yield Code(self.rank_dict[s], node, filename)
+            result.append(encoder.encode(f, unit.root))
+    return result
 
 
 class CodeChunk(object):
@@ -309,32 +385,65 @@ def do_files(files, args):
             start_time = now
         return start_time
 
-    contexts = [(f, lal.AnalysisContext()) for f in files]
-    units = [(f, c.get_from_file(f)) for (f, c) in contexts]
-
-    # For the analysis of multiple files, issue a message for files that are
-    # not parsable, and proceed with others.
-    for (f, unit) in units:
-        if unit.root is None:
-            print('Could not parse {}:'.format(f))
+    # Parse and encode the code into a list of 'hashes', in worker processes
+    # if requested. Hashes are ranks assigned to each symbol by order of first
+    # occurrence (after special values such as Encoder.JOKER). Each file is
+    # followed by a unique hash, to avoid matches that cross file boundaries.
+    batches = [(files[i:i + FILES_PER_CONTEXT], args.ignore_ids)
+               for i in range(0, len(files), FILES_PER_CONTEXT)]
+    pool = None
+    if args.jobs == 1:
+        encoded_batches = map(encode_files, batches)
+    else:
+        pool = multiprocessing.Pool(args.jobs or None)
+        encoded_batches = pool.imap(encode_files, batches)
+
+    ranked_code = array('i')
+    lines = array('i')
+    file_starts = []
+    filenames = []
+    rank = 4
+    rank_dict = {}
+    for batch in encoded_batches:
+        for file_codes in batch:
+            # For the analysis of multiple files, issue a message for files
+            # that are not parsable, and proceed with others.
+            if file_codes.codes is None:
+                print('Could not parse {}:'.format(file_codes.filename))
+                continue
+
+            ranks = array('i', [Encoder.JOKER])
+            for symbol in file_codes.symbols:
+                if symbol not in rank_dict:
+                    rank_dict[symbol] = rank
+                    rank += 1
+                ranks.append(rank_dict[symbol])
+
+            file_starts.append(len(ranked_code))
+            filenames.append(file_codes.filename)
+            ranked_code.extend(ranks[c] for c in file_codes.codes)
+            ranked_code.append(rank)
+            rank += 1
+            lines.extend(file_codes.lines)
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    def filename(index):
+        """
+        Return the name of the file for the code at the given index.
+        """
+        return filenames[bisect.bisect_right(file_starts, index) - 1]
 
-    units = [(f, unit) for (f, unit) in units if unit.root is not None]
-    start_time = show_time(start_time,
-                           'libadalang analysis (%s units)' % len(units))
-
-    # All the units have been parsed correctly. Now encode the code into
-    # a list of 'hashes'.
-    codes = []
-    encoder = Encoder()
-    for i, (f, unit) in enumerate(units):
-        codes += encoder.encode(f, unit.root, args.ignore_ids)
     start_time = show_time(start_time,
-                           'encode ast (code size: %s)' % len(codes))
+                           'libadalang analysis and encoding (%s units, code'
+                           ' size: %s)' % (len(filenames), len(ranked_code)))
 
-    ranked_code = [code.h for code in codes]
-    result = suffix_array(ranked_code, k=encoder.rank)
+    result = suffix_array(ranked_code, rank)
     start_time = show_time(start_time,
-                           'compute suffix array (rank:%s)' % encoder.rank)
+                           'compute suffix array (rank:%s)' % rank)
+    lcp = lcp_array(ranked_code, result)
+    start_time = show_time(start_time, 'compute LCP array')
 
     # Copy/Paste results arranged by paths
     copy_pastes = {}
@@ -348,41 +457,32 @@ def do_files(files, args):
         # Get the next two suffixes
         suffix = (result[index], result[index + 1])
 
+        # Size of the common prefix
+        prefix_length = lcp[index]
+
         # Discard if nothing in common
-        if ranked_code[suffix[0]] != ranked_code[suffix[1]]:
+        if prefix_length == 0:
             stats['no_prefix'] += 1
             continue
 
         # Check if a longer prefix exists in the suffix array. Analyse
         # only the longest prefixes.
         if suffix[0] > 0 and suffix[1] > 0 and \
-                codes[suffix[0] - 1].h == codes[suffix[1] - 1].h:
+                ranked_code[suffix[0] - 1] == ranked_code[suffix[1] - 1]:
             stats['skipped'] += 1
             continue
 
-        # Find the length of the common prefix between the two suffixes.
-        # The following code is a bit naive and can be removed in case the
-        # LCP table is computed at the same time as the suffix array.
-        # With skew algorithm this is possible (keeping the linear property).
-
-        # Size of the common prefix
-        prefix_length = 0
-
-        while ranked_code[suffix[0] + prefix_length] == \
-                ranked_code[suffix[1] + prefix_length]:
-            prefix_length += 1
-
         stats['prefix'] += 1
         # Two suffixes with similarities lasting more than min_size "items"
         if prefix_length + 1 >= args.min_size:
 
-            code = (CodeChunk(codes[suffix[0]].filename,
-                              codes[suffix[0]].line,
-                              codes[suffix[0] + prefix_length - 1].line,
+            code = (CodeChunk(filename(suffix[0]),
+                              lines[suffix[0]],
+                              lines[suffix[0] + prefix_length - 1],
                               prefix_length),
-                    CodeChunk(codes[suffix[1]].filename,
-                              codes[suffix[1]].line,
-                              codes[suffix[1] + prefix_length - 1].line,
+                    CodeChunk(filename(suffix[1]),
+                              lines[suffix[1]],
+                              lines[suffix[1] + prefix_length - 1],
                               prefix_length))
             if code[0].path > code[1].path or \
                     (code[0].path == code[1].path and
@@ -462,6 +562,11 @@ def main():
         default=20,
         help='minimum size in lines of reported copy-paste '
         '(default: 20)')
+    parser.add_argument(
+        '--jobs', '-j', type=int,
+        default=1,
+        help='number of processes to use to parse and encode source files'
+        ' (default: 1). If zero, use one process per CPU.')
     parser.add_argument(
         '--dump-code', action='store_true', default=False)
     parser.add_argument(
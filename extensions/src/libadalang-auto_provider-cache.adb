@@ -0,0 +1,351 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Ada.Directories;
+with Ada.Exceptions;
+with Ada.IO_Exceptions;
+with Ada.Streams;         use Ada.Streams;
+with Ada.Streams.Stream_IO;
+with Ada.Strings.Fixed;
+with Ada.Text_IO;         use Ada.Text_IO;
+
+with GNAT.OS_Lib;
+with GNAT.SHA1;
+
+with GNATCOLL.Traces;
+with GNATCOLL.VFS; use GNATCOLL.VFS;
+
+package body Libadalang.Auto_Provider.Cache is
+
+   Trace : constant GNATCOLL.Traces.Trace_Handle := GNATCOLL.Traces.Create
+     ("LIBADALANG.AUTO_PROVIDER_CACHE", GNATCOLL.Traces.From_Config);
+
+   Magic : constant String := "libadalang-auto-provider-cache 2";
+   --  First line of cache files. The number must be incremented each time
+   --  the format of cache files changes.
+
+   Charset_Prefix      : constant String := "charset: ";
+   Scan_Headers_Prefix : constant String := "scan-headers: ";
+   File_Prefix         : constant String := "file: ";
+   Stamp_Prefix        : constant String := "stamp: ";
+   Unit_Prefix         : constant String := "unit: ";
+   --  Prefixes for the lines of cache files. After the magic line, cache
+   --  files contain:
+   --
+   --  * a "charset: " line and a "scan-headers: " line for the settings used
+   --    to discover compilation units;
+   --
+   --  * then, for each source file, a "file: " line for its absolute name, a
+   --    "stamp: " line for its stamp, and then one "unit: " line per
+   --    compilation unit it contains. Each "unit: " line contains the unit
+   --    kind (s or b), the PLE root index and the UTF-8 encoded unit name,
+   --    separated by spaces.
+
+   Malformed_Cache : exception;
+   --  Exception raised when reading a malformed cache file
+
+   function Has_Prefix (Line, Prefix : String) return Boolean
+   is (Line'Length >= Prefix'Length
+       and then Line (Line'First .. Line'First + Prefix'Length - 1) = Prefix);
+   --  Return whether ``Line`` starts with ``Prefix``
+
+   function Strip (Line, Prefix : String) return String
+   is (Line (Line'First + Prefix'Length .. Line'Last));
+   --  Return ``Line`` without its first ``Prefix'Length`` characters
+
+   function Parse_Unit (Line : String) return Unit_Entry;
+   --  Decode the content of a "unit: " line (without the prefix). Raise a
+   --  Malformed_Cache exception if it is invalid.
+
+   function Image (N : Natural) return String
+   is (Ada.Strings.Fixed.Trim (Natural'Image (N), Ada.Strings.Left));
+   --  Return the decimal representation of ``N``, without leading space
+
+   procedure Create_Temporary_File (Filename : String; F : out File_Type);
+   --  Create a new file in the same directory as ``Filename`` and open it
+   --  as ``F`` for writing. The name of the new file is built from
+   --  ``Filename``, the current process ID and a counter, and the file is
+   --  created with exclusive access, so that it is never shared with another
+   --  writer, even in another process.
+
+   -----------
+   -- Stamp --
+   -----------
+
+   function Stamp (File : Virtual_File) return Unbounded_String is
+      use type Ada.Directories.File_Kind;
+
+      Name   : constant String := +File.Full_Name;
+      F      : Stream_IO.File_Type;
+      Ctx    : GNAT.SHA1.Context := GNAT.SHA1.Initial_Context;
+      Buffer : Stream_Element_Array (1 .. 16 * 1024);
+      Last   : Stream_Element_Offset;
+      Size   : Stream_Element_Count := 0;
+   begin
+      if not Ada.Directories.Exists (Name)
+         or else Ada.Directories.Kind (Name) /= Ada.Directories.Ordinary_File
+      then
+         return Null_Unbounded_String;
+      end if;
+
+      Stream_IO.Open (F, Stream_IO.In_File, Name);
+      loop
+         Stream_IO.Read (F, Buffer, Last);
+         exit when Last < Buffer'First;
+         GNAT.SHA1.Update (Ctx, Buffer (Buffer'First .. Last));
+         Size := Size + Last;
+      end loop;
+      Stream_IO.Close (F);
+
+      return To_Unbounded_String
+        (Ada.Strings.Fixed.Trim
+           (Stream_Element_Count'Image (Size), Ada.Strings.Left)
+         & " " & GNAT.SHA1.Digest (Ctx));
+   exception
+      when Ada.IO_Exceptions.Name_Error
+         | Ada.IO_Exceptions.Use_Error
+         | Ada.IO_Exceptions.Device_Error
+      =>
+         if Stream_IO.Is_Open (F) then
+            Stream_IO.Close (F);
+         end if;
+         return Null_Unbounded_String;
+   end Stamp;
+
+   ---------------------------
+   -- Create_Temporary_File --
+   ---------------------------
+
+   procedure Create_Temporary_File (Filename : String; F : out File_Type) is
+      use GNAT.OS_Lib;
+
+      Prefix : constant String :=
+        Filename & ".tmp-" & Image (Pid_To_Integer (Current_Process_Id)) & "-";
+      FD     : File_Descriptor;
+   begin
+      for Counter in 1 .. 1000 loop
+         declare
+            Candidate : constant String := Prefix & Image (Counter);
+         begin
+            FD := Create_New_File (Candidate, Text);
+            if FD /= Invalid_FD then
+               Close (FD);
+               Open (F, Out_File, Candidate);
+               return;
+            end if;
+         end;
+      end loop;
+
+      raise Use_Error with "cannot create a temporary file for " & Filename;
+   end Create_Temporary_File;
+
+   ----------------
+   -- Parse_Unit --
+   ----------------
+
+   function Parse_Unit (Line : String) return Unit_Entry is
+      First_Space  : constant Natural :=
+        Ada.Strings.Fixed.Index (Line, " ");
+      Second_Space : constant Natural :=
+        (if First_Space = 0
+         then 0
+         else Ada.Strings.Fixed.Index (Line, " ", First_Space + 1));
+      Result       : Unit_Entry;
+   begin
+      if Second_Space = 0 or else Second_Space = Line'Last then
+         raise Malformed_Cache with "invalid unit line";
+      end if;
+
+      declare
+         Kind  : String renames Line (Line'First .. First_Space - 1);
+         Index : String renames Line (First_Space + 1 .. Second_Space - 1);
+         Name  : String renames Line (Second_Space + 1 .. Line'Last);
+      begin
+         if Kind = "s" then
+            Result.Kind := Unit_Specification;
+         elsif Kind = "b" then
+            Result.Kind := Unit_Body;
+         else
+            raise Malformed_Cache with "invalid unit kind";
+         end if;
+
+         Result.PLE_Root_Index := Positive'Value (Index);
+         Result.Name := To_Unbounded_Text (From_UTF8 (Name));
+      end;
+      return Result;
+
+   exception
+      when Constraint_Error =>
+         raise Malformed_Cache with "invalid unit line";
+   end Parse_Unit;
+
+   ----------
+   -- Load --
+   ----------
+
+   procedure Load
+     (Filename     : String;
+      Charset      : String;
+      Scan_Headers : Boolean;
+      Files        : out File_Entry_Maps.Map)
+   is
+      F : File_Type;
+
+      procedure Expect (Line : String);
+      --  Read the next line and raise a Malformed_Cache exception if it is
+      --  not ``Line``.
+
+      ------------
+      -- Expect --
+      ------------
+
+      procedure Expect (Line : String) is
+      begin
+         if End_Of_File (F) or else Get_Line (F) /= Line then
+            raise Malformed_Cache with "unexpected header";
+         end if;
+      end Expect;
+
+      Current_File : Unbounded_String;
+      Current      : File_Entry;
+   begin
+      Files.Clear;
+      if not Ada.Directories.Exists (Filename) then
+         Trace.Trace ("No cache file at " & Filename);
+         return;
+      end if;
+
+      Open (F, In_File, Filename);
+      Expect (Magic);
+      Expect (Charset_Prefix & Charset);
+      Expect (Scan_Headers_Prefix & Boolean'Image (Scan_Headers));
+
+      while not End_Of_File (F) loop
+         declare
+            Line : constant String := Get_Line (F);
+         begin
+            if Has_Prefix (Line, File_Prefix) then
+               if Length (Current_File) > 0 then
+                  Files.Include (Current_File, Current);
+               end if;
+               Current_File := To_Unbounded_String (Strip (Line, File_Prefix));
+               Current := (Stamp => Null_Unbounded_String, others => <>);
+
+               if End_Of_File (F) then
+                  raise Malformed_Cache with "missing stamp";
+               end if;
+               declare
+                  Stamp_Line : constant String := Get_Line (F);
+               begin
+                  if not Has_Prefix (Stamp_Line, Stamp_Prefix) then
+                     raise Malformed_Cache with "missing stamp";
+                  end if;
+                  Current.Stamp :=
+                    To_Unbounded_String (Strip (Stamp_Line, Stamp_Prefix));
+               end;
+
+            elsif Has_Prefix (Line, Unit_Prefix)
+                  and then Length (Current_File) > 0
+            then
+               Current.Units.Append (Parse_Unit (Strip (Line, Unit_Prefix)));
+
+            else
+               raise Malformed_Cache with "unexpected line";
+            end if;
+         end;
+      end loop;
+      if Length (Current_File) > 0 then
+         Files.Include (Current_File, Current);
+      end if;
+
+      Close (F);
+      if Trace.Is_Active then
+         Trace.Trace
+           ("Loaded" & Ada.Containers.Count_Type'Image (Files.Length)
+            & " entries from " & Filename);
+      end if;
+
+   exception
+      when Exc : Malformed_Cache | Name_Error | Use_Error | Data_Error
+               | End_Error =>
+         if Is_Open (F) then
+            Close (F);
+         end if;
+         Files.Clear;
+         Trace.Trace
+           ("Ignoring cache file " & Filename & ": "
+            & Ada.Exceptions.Exception_Message (Exc));
+   end Load;
+
+   ----------
+   -- Save --
+   ----------
+
+   procedure Save
+     (Filename     : String;
+      Charset      : String;
+      Scan_Headers : Boolean;
+      Files        : File_Entry_Maps.Map)
+   is
+      F       : File_Type;
+      Success : Boolean;
+   begin
+      Create_Temporary_File (Filename, F);
+      Put_Line (F, Magic);
+      Put_Line (F, Charset_Prefix & Charset);
+      Put_Line (F, Scan_Headers_Prefix & Boolean'Image (Scan_Headers));
+
+      for Cur in Files.Iterate loop
+         Put_Line (F, File_Prefix & To_String (File_Entry_Maps.Key (Cur)));
+         declare
+            E : File_Entry renames Files.Constant_Reference (Cur);
+         begin
+            Put_Line (F, Stamp_Prefix & To_String (E.Stamp));
+            for U of E.Units loop
+               Put_Line
+                 (F,
+                  Unit_Prefix
+                  & (case U.Kind is
+                     when Unit_Specification => "s",
+                     when Unit_Body          => "b")
+                  & " "
+                  & Image (U.PLE_Root_Index)
+                  & " "
+                  & To_UTF8 (To_Text (U.Name)));
+            end loop;
+         end;
+      end loop;
+
+      --  Replace the cache file in one step: on POSIX systems, renaming a
+      --  file over an existing one is atomic.
+
+      declare
+         Temp_Filename : constant String := Name (F);
+      begin
+         Close (F);
+         GNAT.OS_Lib.Rename_File (Temp_Filename, Filename, Success);
+         if not Success then
+            GNAT.OS_Lib.Delete_File (Temp_Filename, Success);
+            raise Use_Error with "cannot rename " & Temp_Filename;
+         end if;
+      end;
+
+      if Trace.Is_Active then
+         Trace.Trace
+           ("Saved" & Ada.Containers.Count_Type'Image (Files.Length)
+            & " entries to " & Filename);
+      end if;
+
+   exception
+      when Exc : Name_Error | Use_Error | Device_Error =>
+         if Is_Open (F) then
+            Delete (F);
+         end if;
+         Trace.Trace
+           ("Cannot write cache file " & Filename & ": "
+            & Ada.Exceptions.Exception_Message (Exc));
+   end Save;
+
+end Libadalang.Auto_Provider.Cache;
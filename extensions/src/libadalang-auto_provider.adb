@@ -4,9 +4,17 @@
 --
 
 with Ada.Containers.Vectors;
+with Ada.Exceptions;
 with Ada.Strings.Wide_Wide_Unbounded;
+with Ada.Unchecked_Deallocation;
 with Ada.Wide_Wide_Characters.Handling;
 
+with GNAT.Strings;
+
+with System.Multiprocessors;
+
+with Libadalang.Auto_Provider.Cache;
+with Libadalang.Header_Scanner;
 with Libadalang.Unit_Files;
 
 package body Libadalang.Auto_Provider is
@@ -26,9 +34,32 @@ package body Libadalang.Auto_Provider is
    procedure Add_Entry
      (Provider       : in out Auto_Unit_Provider;
       Filename       : Unbounded_String;
-      CU             : Compilation_Unit;
+      Name           : Text_Type;
+      Kind           : Analysis_Unit_Kind;
       PLE_Root_Index : Positive);
-   --  Add a CU -> Filename entry to Provider.Mapping
+   --  Add a Name/Kind -> Filename entry to Provider.Mapping
+
+   function Unit_Entry_For
+     (CU             : Compilation_Unit;
+      PLE_Root_Index : Positive) return Cache.Unit_Entry;
+   --  Return the name, kind and PLE root index for ``CU``
+
+   procedure Parse_File
+     (Context  : Analysis_Context;
+      Filename : String;
+      Units    : in out Cache.Unit_Entry_Vectors.Vector);
+   --  Parse the ``Filename`` source file in ``Context`` and append all the
+   --  compilation units it contains to ``Units``. Do nothing if the file has
+   --  parsing errors.
+
+   procedure Scan_File
+     (File    : Virtual_File;
+      Units   : in out Cache.Unit_Entry_Vectors.Vector;
+      Success : out Boolean);
+   --  Use the header scanner to find the compilation unit in ``File`` and
+   --  append it to ``Units``. Set ``Success`` to False if the scan was
+   --  ambiguous (``Units`` is left unchanged in that case), meaning that the
+   --  file must be fully parsed instead.
 
    ---------------
    -- Add_Entry --
@@ -37,37 +68,90 @@ package body Libadalang.Auto_Provider is
    procedure Add_Entry
      (Provider       : in out Auto_Unit_Provider;
       Filename       : Unbounded_String;
-      CU             : Compilation_Unit;
+      Name           : Text_Type;
+      Kind           : Analysis_Unit_Kind;
       PLE_Root_Index : Positive)
+   is
+      Key       : constant Symbol_Type := As_Key (Name, Kind, Provider);
+      Value     : constant Filename_And_PLE_Root := (Filename, PLE_Root_Index);
+      Dummy_Cur : Unit_Maps.Cursor;
+      Inserted  : Boolean;
+   begin
+      Provider.Mapping.Insert (Key, Value, Dummy_Cur, Inserted);
+
+      --  TODO??? Somehow report duplicate entries
+      pragma Unreferenced (Inserted);
+   end Add_Entry;
+
+   --------------------
+   -- Unit_Entry_For --
+   --------------------
+
+   function Unit_Entry_For
+     (CU             : Compilation_Unit;
+      PLE_Root_Index : Positive) return Cache.Unit_Entry
    is
       use Ada.Strings.Wide_Wide_Unbounded;
 
-      FQN  : constant Unbounded_Text_Type_Array :=
+      FQN    : constant Unbounded_Text_Type_Array :=
         CU.P_Syntactic_Fully_Qualified_Name;
-      Kind : constant Analysis_Unit_Kind := CU.P_Unit_Kind;
-      Name : Unbounded_Wide_Wide_String;
+      Result : Cache.Unit_Entry :=
+        (Name           => Null_Unbounded_Wide_Wide_String,
+         Kind           => CU.P_Unit_Kind,
+         PLE_Root_Index => PLE_Root_Index);
    begin
       for I in FQN'Range loop
          if I > FQN'First then
-            Append (Name, '.');
+            Append (Result.Name, '.');
          end if;
-         Append (Name, To_Text (FQN (I)));
+         Append (Result.Name, To_Text (FQN (I)));
       end loop;
+      return Result;
+   end Unit_Entry_For;
+
+   ---------------
+   -- Scan_File --
+   ---------------
+
+   procedure Scan_File
+     (File    : Virtual_File;
+      Units   : in out Cache.Unit_Entry_Vectors.Vector;
+      Success : out Boolean)
+   is
+      use Header_Scanner;
+
+      Buffer : GNAT.Strings.String_Access := File.Read_File;
+   begin
+      if Buffer = null then
+         Success := False;
+         return;
+      end if;
 
       declare
-         Key       : constant Symbol_Type :=
-           As_Key (To_Wide_Wide_String (Name), Kind, Provider);
-         Value     : constant Filename_And_PLE_Root :=
-           (Filename, PLE_Root_Index);
-         Dummy_Cur : Unit_Maps.Cursor;
-         Inserted  : Boolean;
+         Result : constant Scan_Result := Scan (Buffer.all);
       begin
-         Provider.Mapping.Insert (Key, Value, Dummy_Cur, Inserted);
-
-         --  TODO??? Somehow report duplicate entries
-         pragma Unreferenced (Inserted);
+         GNAT.Strings.Free (Buffer);
+         case Result.Status is
+            when Unit_Found =>
+               Units.Append
+                 ((Name           => To_Unbounded_Text
+                                       (To_Text (To_String (Result.Name))),
+                   Kind           => Result.Kind,
+                   PLE_Root_Index => 1));
+               Success := True;
+
+            when No_Unit =>
+
+               --  Just like for parsed files that contain only pragmas, there
+               --  is no entry to register here.
+
+               Success := True;
+
+            when Ambiguous =>
+               Success := False;
+         end case;
       end;
-   end Add_Entry;
+   end Scan_File;
 
    ----------------
    -- Find_Files --
@@ -256,61 +340,338 @@ package body Libadalang.Auto_Provider is
       Destroy (Provider.Keys);
    end Release;
 
+   ----------------
+   -- Parse_File --
+   ----------------
+
+   procedure Parse_File
+     (Context  : Analysis_Context;
+      Filename : String;
+      Units    : in out Cache.Unit_Entry_Vectors.Vector)
+   is
+      Unit : constant Analysis_Unit :=
+        Get_From_File (Context, Filename, Reparse => True);
+      R    : constant Ada_Node := Root (Unit);
+   begin
+      if not Has_Diagnostics (Unit) then
+
+         --  If parsing went fine, add the compilation units File contains to
+         --  the result.
+         --
+         --  TODO??? Somehow report parsing errors.
+
+         case Unit_Files.Root_Nodes (R.Kind) is
+            when Ada_Compilation_Unit =>
+               Units.Append (Unit_Entry_For (R.As_Compilation_Unit, 1));
+            when Ada_Compilation_Unit_List =>
+               for I in 1 .. R.Children_Count loop
+                  Units.Append
+                    (Unit_Entry_For (R.Child (I).As_Compilation_Unit, I));
+               end loop;
+
+            when Ada_Pragma_Node_List =>
+
+               --  This could be a configuration pragma file, or a body that
+               --  contains just "pragma No_Body;". In any case, there is no
+               --  entry to register here.
+
+               null;
+         end case;
+      end if;
+   end Parse_File;
+
    --------------------------
    -- Create_Auto_Provider --
    --------------------------
 
    procedure Create_Auto_Provider
-     (Provider    : out Auto_Unit_Provider;
-      Input_Files : GNATCOLL.VFS.File_Array;
-      Charset     : String := Default_Charset)
+     (Provider     : out Auto_Unit_Provider;
+      Input_Files  : GNATCOLL.VFS.File_Array;
+      Charset      : String := Default_Charset;
+      Scan_Headers : Boolean := False;
+      Cache_File   : String := "";
+      Jobs         : Natural := 1)
    is
-      Context : constant Analysis_Context := Create_Context (Charset);
-   begin
-      --  Go through every input file and try to parse them
+      use Cache.File_Entry_Maps;
+
+      type Unit_Vector_Array is
+        array (Natural range <>) of Cache.Unit_Entry_Vectors.Vector;
+      type Unit_Vector_Array_Access is access Unit_Vector_Array;
+      procedure Free is new Ada.Unchecked_Deallocation
+        (Unit_Vector_Array, Unit_Vector_Array_Access);
+
+      type Stamp_Array is array (Natural range <>) of Unbounded_String;
+      type Stamp_Array_Access is access Stamp_Array;
+      procedure Free is new Ada.Unchecked_Deallocation
+        (Stamp_Array, Stamp_Array_Access);
+
+      type Boolean_Array is array (Natural range <>) of Boolean;
+      type Boolean_Array_Access is access Boolean_Array;
+      procedure Free is new Ada.Unchecked_Deallocation
+        (Boolean_Array, Boolean_Array_Access);
+
+      --  Per-file data is allocated on the heap, as there may be too many
+      --  input files for the stack.
+
+      Results : Unit_Vector_Array_Access :=
+        new Unit_Vector_Array (Input_Files'Range);
+      --  Compilation units found in each input file
+
+      Stamps : Stamp_Array_Access := new Stamp_Array (Input_Files'Range);
+      --  If the cache is used, stamp for each input file
+
+      To_Process : Boolean_Array_Access :=
+        new Boolean_Array'(Input_Files'Range => True);
+      --  Whether each input file must be scanned/parsed, i.e. whether the
+      --  cache could not tell which compilation units it contains.
+
+      Process_Count : Natural := 0;
+      --  Number of input files to process
+
+      Use_Scanner : constant Boolean :=
+        Scan_Headers and then Header_Scanner.Is_ASCII_Compatible (Charset);
+      Use_Cache   : constant Boolean := Cache_File /= "";
+
+      Old_Files, New_Files : Map;
+      --  Content of the cache file before and after this run
+
+      procedure Process_File (Index : Natural; Context : Analysis_Context);
+      --  Scan or parse the input file at ``Index`` (using ``Context`` if
+      --  needed) to find the compilation units it contains, and store them in
+      --  ``Results (Index)``.
+
+      procedure Run_Jobs (Job_Count : Positive);
+      --  Process all the files that are marked in ``To_Process`` using
+      --  ``Job_Count`` tasks, each task having its own analysis context.
+
+      ------------------
+      -- Process_File --
+      ------------------
+
+      procedure Process_File (Index : Natural; Context : Analysis_Context) is
+         Scanned : Boolean := False;
+      begin
+         if Use_Scanner then
+            Scan_File (Input_Files (Index), Results (Index), Scanned);
+         end if;
+
+         if not Scanned then
+            Parse_File
+              (Context, +Input_Files (Index).Full_Name, Results (Index));
+         end if;
+      end Process_File;
+
+      --------------
+      -- Run_Jobs --
+      --------------
+
+      procedure Run_Jobs (Job_Count : Positive) is
+
+         protected Scheduler is
+            procedure Next_File (Index : out Natural; Found : out Boolean);
+            --  Return in ``Index`` the next input file to process. Set
+            --  ``Found`` to False if there is no file left.
+
+            procedure Set_Error (Error : Ada.Exceptions.Exception_Occurrence);
+            --  Record an unexpected error that occurred in a job. Only the
+            --  first one is kept.
+
+            procedure Reraise_Error;
+            --  If an unexpected error was recorded, re-raise it
+         private
+            Next       : Natural := Input_Files'First;
+            Has_Error  : Boolean := False;
+            First_Error : Ada.Exceptions.Exception_Occurrence;
+         end Scheduler;
+
+         task type Job_Task
+            --  Increase task's Storage_Size to match the primary stack size,
+            --  to avoid stack overflows when parsing big sources.
+            with Storage_Size => 8 * 1024 * 1024
+         is
+            entry Start (Context : Analysis_Context);
+         end Job_Task;
+
+         ---------------
+         -- Scheduler --
+         ---------------
+
+         protected body Scheduler is
+
+            ---------------
+            -- Next_File --
+            ---------------
+
+            procedure Next_File (Index : out Natural; Found : out Boolean) is
+            begin
+               while Next <= Input_Files'Last
+                     and then not To_Process (Next)
+               loop
+                  Next := Next + 1;
+               end loop;
+
+               Found := Next <= Input_Files'Last and then not Has_Error;
+               Index := Next;
+               if Found then
+                  Next := Next + 1;
+               end if;
+            end Next_File;
+
+            ---------------
+            -- Set_Error --
+            ---------------
+
+            procedure Set_Error (Error : Ada.Exceptions.Exception_Occurrence)
+            is
+            begin
+               if not Has_Error then
+                  Has_Error := True;
+                  Ada.Exceptions.Save_Occurrence (First_Error, Error);
+               end if;
+            end Set_Error;
+
+            -------------------
+            -- Reraise_Error --
+            -------------------
+
+            procedure Reraise_Error is
+            begin
+               if Has_Error then
+                  Ada.Exceptions.Reraise_Occurrence (First_Error);
+               end if;
+            end Reraise_Error;
+         end Scheduler;
+
+         --------------
+         -- Job_Task --
+         --------------
+
+         task body Job_Task is
+            Job_Context : Analysis_Context;
+            Index       : Natural;
+            Found       : Boolean;
+         begin
+            accept Start (Context : Analysis_Context) do
+               Job_Context := Context;
+            end Start;
+
+            loop
+               Scheduler.Next_File (Index, Found);
+               exit when not Found;
+               Process_File (Index, Job_Context);
+            end loop;
+
+         exception
+            when E : others =>
+               Scheduler.Set_Error (E);
+         end Job_Task;
+
+      begin
+         --  Analysis contexts are created here rather than in jobs, so that
+         --  each job just has to use its own.
 
-      for Filename_VFS of Input_Files loop
          declare
-            Filename_String : constant String := +Filename_VFS.Full_Name;
-            Filename_Unb    : constant Unbounded_String :=
-              To_Unbounded_String (Filename_String);
+            Task_Pool : array (1 .. Job_Count) of Job_Task;
+         begin
+            for T of Task_Pool loop
+               T.Start (Create_Context (Charset));
+            end loop;
+         end;
 
-            Unit : constant Analysis_Unit :=
-              Get_From_File (Context, Filename_String, Reparse => True);
-            R    : constant Ada_Node := Root (Unit);
+         Scheduler.Reraise_Error;
+      end Run_Jobs;
+
+   begin
+      if Use_Cache then
+         Cache.Load (Cache_File, Charset, Scan_Headers, Old_Files);
+      end if;
+
+      --  Use the cache to find out the compilation units in all input files
+      --  that have not changed since it was written.
+
+      for I in Input_Files'Range loop
+         if Use_Cache then
+            Stamps (I) := Cache.Stamp (Input_Files (I));
+
+            declare
+               Cur : constant Cursor :=
+                 Old_Files.Find (To_Unbounded_String
+                                   (+Input_Files (I).Full_Name));
+            begin
+               if Has_Element (Cur)
+                  and then Length (Stamps (I)) > 0
+                  and then Old_Files.Constant_Reference (Cur).Stamp
+                           = Stamps (I)
+               then
+                  Results (I) := Old_Files.Constant_Reference (Cur).Units;
+                  To_Process (I) := False;
+               end if;
+            end;
+         end if;
+
+         if To_Process (I) then
+            Process_Count := Process_Count + 1;
+         end if;
+      end loop;
+
+      --  Go through all the other input files and try to scan or parse them.
+      --  Do it in parallel if requested.
+
+      if Process_Count > 0 then
+         declare
+            Job_Count : constant Positive :=
+              Positive'Min
+                (Process_Count,
+                 (if Jobs = 0
+                  then Positive (System.Multiprocessors.Number_Of_CPUs)
+                  else Jobs));
          begin
-            if not Has_Diagnostics (Unit) then
-
-               --  If parsing went fine, add the compilation units File
-               --  contains to our internal mapping.
-               --
-               --  TODO??? Somehow report parsing errors.
-
-               case Unit_Files.Root_Nodes (R.Kind) is
-                  when Ada_Compilation_Unit =>
-                     Add_Entry
-                       (Provider, Filename_Unb, R.As_Compilation_Unit, 1);
-                  when Ada_Compilation_Unit_List =>
-                     for I in 1 .. R.Children_Count loop
-                        Add_Entry
-                          (Provider,
-                           Filename_Unb,
-                           R.Child (I).As_Compilation_Unit,
-                           I);
-                     end loop;
-
-                  when Ada_Pragma_Node_List =>
-
-                     --  This could be a configuration pragma file, or a body
-                     --  that contains just "pragma No_Body;". In any case,
-                     --  there is no entry to register here.
-
-                     null;
-               end case;
+            if Job_Count = 1 then
+               declare
+                  Context : constant Analysis_Context :=
+                    Create_Context (Charset);
+               begin
+                  for I in Input_Files'Range loop
+                     if To_Process (I) then
+                        Process_File (I, Context);
+                     end if;
+                  end loop;
+               end;
+            else
+               Run_Jobs (Job_Count);
             end if;
          end;
+      end if;
 
+      --  Now that we know which compilation units all input files contain,
+      --  fill in the mapping. Do this sequentially and in the order of input
+      --  files, so that, regardless of the number of jobs, the first file
+      --  that contains a given compilation unit always wins.
+
+      for I in Input_Files'Range loop
+         declare
+            Filename : constant Unbounded_String :=
+              To_Unbounded_String (+Input_Files (I).Full_Name);
+         begin
+            for U of Results (I) loop
+               Add_Entry
+                 (Provider, Filename, To_Text (U.Name), U.Kind,
+                  U.PLE_Root_Index);
+            end loop;
+
+            if Use_Cache and then Length (Stamps (I)) > 0 then
+               New_Files.Include (Filename, (Stamps (I), Results (I)));
+            end if;
+         end;
       end loop;
+
+      if Use_Cache then
+         Cache.Save (Cache_File, Charset, Scan_Headers, New_Files);
+      end if;
+
+      Free (Results);
+      Free (Stamps);
+      Free (To_Process);
    end Create_Auto_Provider;
 
    --------------------------
@@ -318,12 +679,16 @@ package body Libadalang.Auto_Provider is
    --------------------------
 
    function Create_Auto_Provider
-     (Input_Files : GNATCOLL.VFS.File_Array;
-      Charset     : String := Default_Charset) return Auto_Unit_Provider is
+     (Input_Files  : GNATCOLL.VFS.File_Array;
+      Charset      : String := Default_Charset;
+      Scan_Headers : Boolean := False;
+      Cache_File   : String := "";
+      Jobs         : Natural := 1) return Auto_Unit_Provider is
    begin
       return Provider : Auto_Unit_Provider do
          Provider.Keys := Create_Symbol_Table;
-         Create_Auto_Provider (Provider, Input_Files, Charset);
+         Create_Auto_Provider
+           (Provider, Input_Files, Charset, Scan_Headers, Cache_File, Jobs);
       end return;
    end Create_Auto_Provider;
 
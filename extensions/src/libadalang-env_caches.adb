@@ -0,0 +1,129 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Common;         use Libadalang.Common;
+with Libadalang.Env_Caches_Impl;
+with Libadalang.Implementation; use Libadalang.Implementation;
+with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+
+package body Libadalang.Env_Caches is
+
+   package Impl renames Libadalang.Env_Caches_Impl;
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context;
+   --  Return the internal context for ``Context``. Raise a
+   --  ``Precondition_Failure`` exception if it is null.
+
+   ------------
+   -- Unwrap --
+   ------------
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+      return C;
+   end Unwrap;
+
+   ---------------------------
+   -- Set_Collection_Policy --
+   ---------------------------
+
+   procedure Set_Collection_Policy
+     (Context : Analysis_Context; Policy : Collection_Policy)
+   is
+      C : constant Internal_Context := Unwrap (Context);
+   begin
+      if Policy.Threshold_Increment <= 0 then
+         raise Precondition_Failure
+           with "threshold increment must be positive";
+      elsif Policy.Min_Entry_Count < 0 then
+         raise Precondition_Failure with "negative minimum entry count";
+      elsif Policy.Memory_Budget < 0 then
+         raise Precondition_Failure with "negative memory budget";
+      end if;
+
+      declare
+         State : Impl.Context_Collection_State renames
+           C.Env_Caches_Collection;
+      begin
+         State.Policy :=
+           (Kind                => Impl.Policy_Kind'Val
+                                     (Collection_Policy_Kind'Pos
+                                        (Policy.Kind)),
+            Threshold_Increment => Policy.Threshold_Increment,
+            Min_Entry_Count     => Policy.Min_Entry_Count,
+            LRU_Max_Age         => Policy.LRU_Max_Age,
+            Memory_Budget       => Policy.Memory_Budget);
+         State.Next_Threshold :=
+           Long_Long_Integer (C.Env_Caches_Stats.Entry_Count)
+           + Policy.Threshold_Increment;
+      end;
+   end Set_Collection_Policy;
+
+   ---------------------------
+   -- Get_Collection_Policy --
+   ---------------------------
+
+   function Get_Collection_Policy
+     (Context : Analysis_Context) return Collection_Policy
+   is
+      P : Impl.Collection_Policy renames
+        Unwrap (Context).Env_Caches_Collection.Policy;
+   begin
+      return
+        (Kind                => Collection_Policy_Kind'Val
+                                  (Impl.Policy_Kind'Pos (P.Kind)),
+         Threshold_Increment => P.Threshold_Increment,
+         Min_Entry_Count     => P.Min_Entry_Count,
+         LRU_Max_Age         => P.LRU_Max_Age,
+         Memory_Budget       => P.Memory_Budget);
+   end Get_Collection_Policy;
+
+   ---------------
+   -- Get_Stats --
+   ---------------
+
+   function Get_Stats (Unit : Analysis_Unit) return Env_Caches_Stats is
+      U : constant Internal_Unit := Unwrap_Unit (Unit);
+   begin
+      if U = null then
+         raise Precondition_Failure with "null unit";
+      end if;
+
+      return
+        (Entries     => Long_Long_Integer (U.Env_Caches_Stats.Entry_Count),
+         Lookups     => Long_Long_Integer (U.Env_Caches_Stats.Lookup_Count),
+         Hits        => Long_Long_Integer (U.Env_Caches_Stats.Hit_Count),
+         Collections => U.Env_Caches_Collection.Collections);
+   end Get_Stats;
+
+   ---------------
+   -- Get_Stats --
+   ---------------
+
+   function Get_Stats (Context : Analysis_Context) return Env_Caches_Stats is
+      C      : constant Internal_Context := Unwrap (Context);
+      Result : Env_Caches_Stats :=
+        (Entries     => 0,
+         Lookups     => 0,
+         Hits        => 0,
+         Collections => C.Env_Caches_Collection.Collections);
+   begin
+      for U of C.Units loop
+         Result.Entries :=
+           Result.Entries + Long_Long_Integer (U.Env_Caches_Stats.Entry_Count);
+         Result.Lookups :=
+           Result.Lookups
+           + Long_Long_Integer (U.Env_Caches_Stats.Lookup_Count);
+         Result.Hits :=
+           Result.Hits + Long_Long_Integer (U.Env_Caches_Stats.Hit_Count);
+      end loop;
+      return Result;
+   end Get_Stats;
+
+end Libadalang.Env_Caches;
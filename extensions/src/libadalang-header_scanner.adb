@@ -0,0 +1,733 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Ada.Characters.Handling; use Ada.Characters.Handling;
+
+package body Libadalang.Header_Scanner is
+
+   type Token_Kind is
+     (Identifier,
+      Dot,
+      Semicolon,
+      Left_Paren,
+      Right_Paren,
+      Other,
+      Termination,
+      Unsupported);
+   --  Coarse kinds of tokens. Keywords are scanned as identifiers. All tokens
+   --  that are irrelevant to find the structure of the library item header
+   --  (literals, operators, ...) are scanned as ``Other``. ``Unsupported``
+   --  designates text that this scanner cannot process (non-ASCII characters,
+   --  brackets encoding, unterminated string literals).
+
+   type Token_Type is record
+      Kind  : Token_Kind := Termination;
+      First : Positive := 1;
+      Last  : Natural := 0;
+      --  Bounds of the token text in the scanned buffer
+   end record;
+
+   -------------------------
+   -- Is_ASCII_Compatible --
+   -------------------------
+
+   function Is_ASCII_Compatible (Charset : String) return Boolean is
+      Canon : constant String := To_Lower (Charset);
+
+      function Has_Prefix (Prefix : String) return Boolean
+      is (Canon'Length >= Prefix'Length
+          and then Canon (Canon'First .. Canon'First + Prefix'Length - 1)
+                   = Prefix);
+   begin
+      return not (Has_Prefix ("utf-16")
+                  or else Has_Prefix ("utf16")
+                  or else Has_Prefix ("utf-32")
+                  or else Has_Prefix ("utf32")
+                  or else Has_Prefix ("ucs-2")
+                  or else Has_Prefix ("ucs2")
+                  or else Has_Prefix ("ucs-4")
+                  or else Has_Prefix ("ucs4"));
+   end Is_ASCII_Compatible;
+
+   ----------
+   -- Scan --
+   ----------
+
+   function Scan (Buffer : String) return Scan_Result is
+
+      Index : Positive := Buffer'First;
+      --  Index in Buffer of the next character to scan
+
+      Token : Token_Type;
+      --  Last token scanned
+
+      Previous_Token : Token_Type;
+      --  Token that was scanned right before Token
+
+      Name : Unbounded_String;
+      --  Name of the compilation unit
+
+      Simple_Name_First : Positive := 1;
+      --  Index in Name of the first character of the last component of the
+      --  name, i.e. the designator that the "end" of the unit must repeat.
+
+      Kind : Analysis_Unit_Kind := Unit_Specification;
+
+      Withed_Units : Name_Vectors.Vector;
+      --  Names of the units mentioned in "with" clauses
+
+      Separate_Parent : Unbounded_String;
+      --  Name of the parent body, for subunits
+
+      Ends_With_End : Boolean := False;
+      --  Whether the library item ends with "end <name>;" (package specs and
+      --  bodies, subprogram bodies) rather than right after its header
+      --  (subprogram declarations, generic instantiations and renamings).
+
+      procedure Next;
+      --  Scan the next token and store it in Token
+
+      function Text (T : Token_Type) return String
+      is (Buffer (T.First .. T.Last));
+      --  Return the text for the T token
+
+      function Is_Keyword (T : Token_Type; Keyword : String) return Boolean;
+      --  Return whether T is an identifier that matches Keyword (which must
+      --  be lower case). The comparison is case insensitive.
+
+      function Is_Keyword (Keyword : String) return Boolean
+      is (Is_Keyword (Token, Keyword));
+      --  Shortcut for Is_Keyword on the current token
+
+      function Same_Identifier (Left, Right : String) return Boolean;
+      --  Return whether Left and Right are the same identifiers, ignoring
+      --  casing.
+
+      procedure Skip_Past_Semicolon;
+      --  Skip tokens until the next semicolon that is not nested in
+      --  parentheses, and scan the token that follows it. Stop on termination
+      --  and unsupported tokens.
+
+      function Scan_Name (Target : in out Unbounded_String) return Boolean;
+      --  If Token starts a (possibly dotted) name, append it to Target, scan
+      --  the token that follows it and return True. Return False otherwise.
+
+      function Scan_Name return Boolean
+      is (Scan_Name (Name));
+      --  Shortcut for Scan_Name on the name of the compilation unit
+
+      function Scan_With_Clause return Boolean;
+      --  Token must be the "with" keyword of a with clause: append the names
+      --  of the units it mentions to Withed_Units, scan the token that
+      --  follows the clause and return True. Return False if the with clause
+      --  is malformed.
+
+      function Check_Pragmas_Only return Boolean;
+      --  Return whether the rest of the source file contains only pragmas
+
+      function Check_End (Simple_Name : String) return Boolean;
+      --  Return whether the rest of the source file ends with ``end
+      --  Simple_Name;`` (or ``end <prefix>.Simple_Name;``), possibly followed
+      --  by pragmas, and contains no other occurrence of this pattern, which
+      --  would be the sign that the file contains several compilation units.
+
+      ----------
+      -- Next --
+      ----------
+
+      procedure Next is
+         C : Character;
+      begin
+         Previous_Token := Token;
+
+         --  Skip whitespaces and comments
+
+         loop
+            if Index > Buffer'Last then
+               Token := (Termination, Index, Index - 1);
+               return;
+            end if;
+
+            C := Buffer (Index);
+            if C in ' ' | ASCII.HT | ASCII.LF | ASCII.VT | ASCII.FF | ASCII.CR
+            then
+               Index := Index + 1;
+
+            elsif C = '-'
+                  and then Index < Buffer'Last
+                  and then Buffer (Index + 1) = '-'
+            then
+               while Index <= Buffer'Last
+                     and then Buffer (Index) not in ASCII.LF | ASCII.CR
+               loop
+                  Index := Index + 1;
+               end loop;
+
+            else
+               exit;
+            end if;
+         end loop;
+
+         Token.First := Index;
+         Index := Index + 1;
+
+         case C is
+            when 'a' .. 'z' | 'A' .. 'Z' =>
+               Token.Kind := Identifier;
+               while Index <= Buffer'Last
+                     and then Buffer (Index)
+                              in 'a' .. 'z' | 'A' .. 'Z' | '0' .. '9' | '_'
+               loop
+                  Index := Index + 1;
+               end loop;
+
+            when '0' .. '9' =>
+
+               --  Numeric literals: include based literals and decimal
+               --  points, but stop on ".." (range delimiter).
+
+               Token.Kind := Other;
+               while Index <= Buffer'Last
+                     and then Buffer (Index)
+                              in 'a' .. 'z' | 'A' .. 'Z' | '0' .. '9' | '_'
+                               | '#' | '.'
+               loop
+                  exit when Buffer (Index) = '.'
+                            and then (Index = Buffer'Last
+                                      or else Buffer (Index + 1)
+                                              not in '0' .. '9');
+                  Index := Index + 1;
+               end loop;
+
+            when '"' =>
+
+               --  String literals cannot span multiple lines. Doubled quotes
+               --  stand for one quote character.
+
+               Token.Kind := Other;
+               loop
+                  if Index > Buffer'Last
+                     or else Buffer (Index) in ASCII.LF | ASCII.CR
+                  then
+                     Token.Kind := Unsupported;
+                     exit;
+
+                  elsif Buffer (Index) = '"' then
+                     Index := Index + 1;
+                     exit when Index > Buffer'Last
+                               or else Buffer (Index) /= '"';
+                  end if;
+                  Index := Index + 1;
+               end loop;
+
+            when ''' =>
+
+               --  After an identifier or a closing parenthesis, this is an
+               --  attribute tick. Otherwise, this starts a character
+               --  literal.
+
+               Token.Kind := Other;
+               if Previous_Token.Kind not in Identifier | Right_Paren
+                  and then Index < Buffer'Last
+                  and then Buffer (Index + 1) = '''
+               then
+                  Index := Index + 2;
+               end if;
+
+            when '.' =>
+               if Index <= Buffer'Last and then Buffer (Index) = '.' then
+                  Token.Kind := Other;
+                  Index := Index + 1;
+               else
+                  Token.Kind := Dot;
+               end if;
+
+            when ';' =>
+               Token.Kind := Semicolon;
+
+            when '(' =>
+               Token.Kind := Left_Paren;
+
+            when ')' =>
+               Token.Kind := Right_Paren;
+
+            when '[' | Character'Val (128) .. Character'Val (255) =>
+               Token.Kind := Unsupported;
+
+            when others =>
+               Token.Kind := Other;
+         end case;
+
+         Token.Last := Index - 1;
+      end Next;
+
+      ----------------
+      -- Is_Keyword --
+      ----------------
+
+      function Is_Keyword (T : Token_Type; Keyword : String) return Boolean
+      is
+      begin
+         return T.Kind = Identifier
+                and then Same_Identifier (Text (T), Keyword);
+      end Is_Keyword;
+
+      ---------------------
+      -- Same_Identifier --
+      ---------------------
+
+      function Same_Identifier (Left, Right : String) return Boolean is
+      begin
+         if Left'Length /= Right'Length then
+            return False;
+         end if;
+
+         for I in 0 .. Left'Length - 1 loop
+            if To_Lower (Left (Left'First + I))
+               /= To_Lower (Right (Right'First + I))
+            then
+               return False;
+            end if;
+         end loop;
+         return True;
+      end Same_Identifier;
+
+      -------------------------
+      -- Skip_Past_Semicolon --
+      -------------------------
+
+      procedure Skip_Past_Semicolon is
+         Depth : Natural := 0;
+      begin
+         loop
+            case Token.Kind is
+               when Termination | Unsupported =>
+                  return;
+
+               when Left_Paren =>
+                  Depth := Depth + 1;
+
+               when Right_Paren =>
+                  if Depth > 0 then
+                     Depth := Depth - 1;
+                  end if;
+
+               when Semicolon =>
+                  if Depth = 0 then
+                     Next;
+                     return;
+                  end if;
+
+               when others =>
+                  null;
+            end case;
+            Next;
+         end loop;
+      end Skip_Past_Semicolon;
+
+      ---------------
+      -- Scan_Name --
+      ---------------
+
+      function Scan_Name (Target : in out Unbounded_String) return Boolean
+      is
+      begin
+         loop
+            if Token.Kind /= Identifier then
+               return False;
+            end if;
+            Append (Target, Text (Token));
+
+            Next;
+            exit when Token.Kind /= Dot;
+            Append (Target, '.');
+            Next;
+         end loop;
+         return True;
+      end Scan_Name;
+
+      ----------------------
+      -- Scan_With_Clause --
+      ----------------------
+
+      function Scan_With_Clause return Boolean is
+      begin
+         loop
+            Next;
+            declare
+               Unit_Name : Unbounded_String;
+            begin
+               if not Scan_Name (Unit_Name) then
+                  return False;
+               end if;
+               Withed_Units.Append (Unit_Name);
+            end;
+            exit when Token.Kind /= Other or else Text (Token) /= ",";
+         end loop;
+
+         if Token.Kind /= Semicolon then
+            return False;
+         end if;
+         Next;
+         return True;
+      end Scan_With_Clause;
+
+      ------------------------
+      -- Check_Pragmas_Only --
+      ------------------------
+
+      function Check_Pragmas_Only return Boolean is
+      begin
+         loop
+            if Token.Kind = Termination then
+               return True;
+            elsif not Is_Keyword ("pragma") then
+               return False;
+            end if;
+            Skip_Past_Semicolon;
+         end loop;
+      end Check_Pragmas_Only;
+
+      ---------------
+      -- Check_End --
+      ---------------
+
+      function Check_End (Simple_Name : String) return Boolean is
+         Before_Previous : Token_Type;
+         --  Token that was scanned right before Previous_Token
+
+         End_Count : Natural := 0;
+         --  Number of "end Simple_Name;" patterns found so far
+
+         In_Tail : Boolean := False;
+         --  Whether all the tokens scanned since the last "end Simple_Name;"
+         --  pattern belong to pragmas (which are part of the compilation
+         --  unit).
+
+         In_Pragma : Boolean := False;
+         --  If In_Tail, whether we are in the middle of a pragma
+      begin
+         loop
+            case Token.Kind is
+               when Termination =>
+                  return In_Tail and then not In_Pragma and then End_Count = 1;
+
+               when Unsupported =>
+                  return False;
+
+               when others =>
+                  if Token.Kind = Semicolon
+                     and then Previous_Token.Kind = Identifier
+                     and then Same_Identifier
+                                (Text (Previous_Token), Simple_Name)
+                     and then (Before_Previous.Kind = Dot
+                               or else Is_Keyword (Before_Previous, "end"))
+                  then
+                     End_Count := End_Count + 1;
+                     In_Tail := True;
+                     In_Pragma := False;
+
+                  elsif In_Tail then
+                     if In_Pragma then
+                        In_Pragma := Token.Kind /= Semicolon;
+                     else
+                        In_Pragma := Is_Keyword ("pragma");
+                        In_Tail := In_Pragma;
+                     end if;
+                  end if;
+            end case;
+
+            Before_Previous := Previous_Token;
+            Next;
+         end loop;
+      end Check_End;
+
+   begin
+      Next;
+
+      --  Go through context clauses, collecting the names of "with"ed units
+
+      loop
+         if Is_Keyword ("use") or else Is_Keyword ("pragma") then
+            Skip_Past_Semicolon;
+
+         elsif Is_Keyword ("with") then
+            if not Scan_With_Clause then
+               return (Status => Ambiguous);
+            end if;
+
+         elsif Is_Keyword ("limited") then
+            Next;
+            if Is_Keyword ("private") then
+               Next;
+            end if;
+            if not Is_Keyword ("with") or else not Scan_With_Clause then
+               return (Status => Ambiguous);
+            end if;
+
+         elsif Is_Keyword ("private") then
+
+            --  This is either a private with clause or the start of a
+            --  private child unit.
+
+            Next;
+            exit when not Is_Keyword ("with");
+            if not Scan_With_Clause then
+               return (Status => Ambiguous);
+            end if;
+
+         else
+            exit;
+         end if;
+      end loop;
+
+      --  Now analyze the library item header
+
+      if Token.Kind = Termination then
+         return (Status => No_Unit);
+
+      elsif Is_Keyword ("separate") then
+
+         --  Subunit: its name is the parent unit name followed by the name of
+         --  the proper body. Subunits are always bodies.
+
+         Kind := Unit_Body;
+         Ends_With_End := True;
+
+         Next;
+         if Token.Kind /= Left_Paren then
+            return (Status => Ambiguous);
+         end if;
+         Next;
+         if not Scan_Name or else Token.Kind /= Right_Paren then
+            return (Status => Ambiguous);
+         end if;
+         Separate_Parent := Name;
+         Next;
+
+         if Is_Keyword ("not") then
+            Next;
+         end if;
+         if Is_Keyword ("overriding") then
+            Next;
+         end if;
+
+         if Is_Keyword ("procedure") or else Is_Keyword ("function") then
+            Next;
+         elsif Is_Keyword ("package")
+               or else Is_Keyword ("task")
+               or else Is_Keyword ("protected")
+         then
+            Next;
+            if not Is_Keyword ("body") then
+               return (Status => Ambiguous);
+            end if;
+            Next;
+         else
+            return (Status => Ambiguous);
+         end if;
+
+         if Token.Kind /= Identifier then
+            return (Status => Ambiguous);
+         end if;
+         Append (Name, '.');
+         Simple_Name_First := Length (Name) + 1;
+         Append (Name, Text (Token));
+         Next;
+
+      elsif Is_Keyword ("generic") then
+
+         --  Generic declarations are always specs. Skip the generic formal
+         --  part to find the generic unit: formal subprograms and packages
+         --  are introduced by "with" and access-to-subprogram types by
+         --  "access" or "access protected".
+
+         loop
+            Next;
+            case Token.Kind is
+               when Termination | Unsupported =>
+                  return (Status => Ambiguous);
+
+               when Identifier =>
+                  exit when
+                    (Is_Keyword ("package")
+                     or else Is_Keyword ("procedure")
+                     or else Is_Keyword ("function"))
+                    and then not Is_Keyword (Previous_Token, "with")
+                    and then not Is_Keyword (Previous_Token, "access")
+                    and then not Is_Keyword (Previous_Token, "protected");
+
+               when others =>
+                  null;
+            end case;
+         end loop;
+
+         declare
+            Is_Package : constant Boolean := Is_Keyword ("package");
+         begin
+            Next;
+            if not Scan_Name then
+               return (Status => Ambiguous);
+            end if;
+
+            if Is_Package and then Is_Keyword ("is") then
+               Ends_With_End := True;
+            elsif Is_Package and then Is_Keyword ("with") then
+
+               --  Skip aspects up to the package "is"
+
+               while Token.Kind in Identifier | Dot | Other | Left_Paren
+                                 | Right_Paren
+                     and then not Is_Keyword ("is")
+               loop
+                  Next;
+               end loop;
+               if not Is_Keyword ("is") then
+                  return (Status => Ambiguous);
+               end if;
+               Ends_With_End := True;
+            else
+               Skip_Past_Semicolon;
+            end if;
+         end;
+
+      elsif Is_Keyword ("package") then
+         Next;
+         if Is_Keyword ("body") then
+            Kind := Unit_Body;
+            Ends_With_End := True;
+            Next;
+            if not Scan_Name then
+               return (Status => Ambiguous);
+            end if;
+
+         else
+            if not Scan_Name then
+               return (Status => Ambiguous);
+            end if;
+
+            if Is_Keyword ("renames") then
+               Skip_Past_Semicolon;
+
+            elsif Is_Keyword ("is") then
+               Next;
+               if Is_Keyword ("new") then
+                  Skip_Past_Semicolon;
+               else
+                  Ends_With_End := True;
+               end if;
+
+            elsif Is_Keyword ("with") then
+
+               --  Aspects: this must be a regular package spec
+
+               Ends_With_End := True;
+
+            else
+               return (Status => Ambiguous);
+            end if;
+         end if;
+
+      elsif Is_Keyword ("procedure") or else Is_Keyword ("function") then
+
+         --  Look for the end of the subprogram specification to determine
+         --  whether this is a declaration or a body.
+
+         Next;
+         if not Scan_Name then
+            return (Status => Ambiguous);
+         end if;
+
+         declare
+            Depth : Natural := 0;
+         begin
+            loop
+               case Token.Kind is
+                  when Termination | Unsupported =>
+                     return (Status => Ambiguous);
+
+                  when Left_Paren =>
+                     Depth := Depth + 1;
+
+                  when Right_Paren =>
+                     if Depth > 0 then
+                        Depth := Depth - 1;
+                     end if;
+
+                  when Semicolon =>
+                     if Depth = 0 then
+                        Next;
+                        exit;
+                     end if;
+
+                  when Identifier =>
+                     if Depth = 0 and then Is_Keyword ("renames") then
+                        Skip_Past_Semicolon;
+                        exit;
+
+                     elsif Depth = 0 and then Is_Keyword ("is") then
+                        Next;
+                        if Is_Keyword ("new") then
+                           Skip_Past_Semicolon;
+                           exit;
+
+                        elsif Is_Keyword ("null")
+                              or else Is_Keyword ("abstract")
+                              or else Is_Keyword ("separate")
+                              or else Token.Kind = Left_Paren
+                        then
+                           --  These are not valid library items: let the
+                           --  parser deal with them.
+
+                           return (Status => Ambiguous);
+
+                        else
+                           Kind := Unit_Body;
+                           Ends_With_End := True;
+                           exit;
+                        end if;
+                     end if;
+
+                  when others =>
+                     null;
+               end case;
+               Next;
+            end loop;
+         end;
+
+      else
+         return (Status => Ambiguous);
+      end if;
+
+      --  Make sure that the source file contains only this compilation unit
+
+      if Ends_With_End then
+         if Simple_Name_First = 1 then
+            for I in reverse 1 .. Length (Name) loop
+               if Element (Name, I) = '.' then
+                  Simple_Name_First := I + 1;
+                  exit;
+               end if;
+            end loop;
+         end if;
+
+         if not Check_End
+           (Slice (Name, Simple_Name_First, Length (Name)))
+         then
+            return (Status => Ambiguous);
+         end if;
+
+      elsif not Check_Pragmas_Only then
+         return (Status => Ambiguous);
+      end if;
+
+      return (Status          => Unit_Found,
+              Name            => Name,
+              Kind            => Kind,
+              Withed_Units    => Withed_Units,
+              Separate_Parent => Separate_Parent);
+   end Scan;
+
+end Libadalang.Header_Scanner;
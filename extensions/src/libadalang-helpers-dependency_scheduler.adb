@@ -0,0 +1,676 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Ada.Characters.Handling;
+with Ada.Containers;        use Ada.Containers;
+with Ada.Containers.Hashed_Maps;
+with Ada.Containers.Ordered_Sets;
+with Ada.Containers.Vectors;
+with Ada.Strings.Unbounded.Hash;
+with Ada.Strings.Wide_Wide_Unbounded; use Ada.Strings.Wide_Wide_Unbounded;
+with Ada.Unchecked_Deallocation;
+
+with GNAT.OS_Lib;
+with GNAT.Strings;
+
+with GNATCOLL.VFS; use GNATCOLL.VFS;
+
+with Langkit_Support.Text; use Langkit_Support.Text;
+
+with Libadalang.Common; use Libadalang.Common;
+with Libadalang.Header_Scanner;
+with Libadalang.Unit_Files;
+
+package body Libadalang.Helpers.Dependency_Scheduler is
+
+   Trace : constant GNATCOLL.Traces.Trace_Handle := GNATCOLL.Traces.Create
+     ("LIBADALANG.DEPENDENCY_SCHEDULER", GNATCOLL.Traces.From_Config);
+
+   package Node_Vectors is new Ada.Containers.Vectors (Positive, Positive);
+   --  List of nodes in a dependency graph
+
+   package Node_Vector_Vectors is new Ada.Containers.Vectors
+     (Positive, Node_Vectors.Vector, Node_Vectors."=");
+
+   package Node_Maps is new Ada.Containers.Hashed_Maps
+     (Key_Type        => Unbounded_String,
+      Element_Type    => Positive,
+      Hash            => Ada.Strings.Unbounded.Hash,
+      Equivalent_Keys => "=");
+
+   type Dependency_Graph is record
+      Nodes : Node_Maps.Map;
+      --  Node for each source file in the graph
+
+      Filenames : String_Vectors.Vector;
+      --  Source file for each node in the graph
+
+      Dependencies : Node_Vector_Vectors.Vector;
+      --  Direct dependencies for each node in the graph
+   end record;
+   --  Graph of the syntactic dependencies between source files. Each node is
+   --  a source file.
+
+   type Dependency is record
+      Name : Unbounded_Text_Type;
+      Kind : Analysis_Unit_Kind;
+   end record;
+   --  Compilation unit that some compilation unit depends on
+
+   package Dependency_Vectors is new Ada.Containers.Vectors
+     (Positive, Dependency);
+
+   type Natural_Array is array (Positive range <>) of Natural;
+   type Natural_Array_Access is access Natural_Array;
+   procedure Free is new Ada.Unchecked_Deallocation
+     (Natural_Array, Natural_Array_Access);
+
+   type Node_Vector_Array is array (Positive range <>) of Node_Vectors.Vector;
+   type Node_Vector_Array_Access is access Node_Vector_Array;
+   procedure Free is new Ada.Unchecked_Deallocation
+     (Node_Vector_Array, Node_Vector_Array_Access);
+
+   type Boolean_Matrix is
+     array (Job_ID range <>, Positive range <>) of Boolean;
+   type Boolean_Matrix_Access is access Boolean_Matrix;
+   procedure Free is new Ada.Unchecked_Deallocation
+     (Boolean_Matrix, Boolean_Matrix_Access);
+
+   type Job_Load is record
+      Load : Natural;
+      --  Number of source files that the job must process plus number of
+      --  nodes it must load.
+
+      Job : Job_ID;
+   end record;
+
+   function "<" (Left, Right : Job_Load) return Boolean
+   is (Left.Load < Right.Load
+       or else (Left.Load = Right.Load and then Left.Job < Right.Job));
+
+   package Job_Queues is new Ada.Containers.Ordered_Sets (Job_Load);
+   --  Priority queues of jobs, by increasing load
+
+   package Job_Load_Vectors is new Ada.Containers.Vectors
+     (Positive, Job_Load);
+
+   function Join (Name : Unbounded_Text_Type_Array) return Unbounded_Text_Type;
+   --  Return the dot-separated concatenation of all items in ``Name``
+
+   procedure Append_Dependencies
+     (CU : Compilation_Unit; Deps : in out Dependency_Vectors.Vector);
+   --  Append to ``Deps`` the compilation units that ``CU`` syntactically
+   --  depends on: "with"ed units, parent units, the spec for a body and the
+   --  parent body for a subunit.
+
+   procedure Append_Dependencies
+     (Scan : Header_Scanner.Scan_Result;
+      Deps : in out Dependency_Vectors.Vector)
+     with Pre => Scan.Status = Header_Scanner.Unit_Found;
+   --  Likewise, for a compilation unit found by the header scanner
+
+   procedure Scan_Dependencies
+     (Filename : String;
+      Deps     : in out Dependency_Vectors.Vector;
+      Success  : out Boolean);
+   --  Use the header scanner to append to ``Deps`` the compilation units that
+   --  the ``Filename`` source file syntactically depends on. Set ``Success``
+   --  to whether this was possible: if not, the source file must be parsed
+   --  instead.
+
+   function Get_Node
+     (Graph    : in out Dependency_Graph;
+      Filename : Unbounded_String;
+      Is_New   : out Boolean) return Positive;
+   --  Return the node for ``Filename`` in ``Graph``, creating it if needed.
+   --  Set ``Is_New`` to whether it was just created.
+
+   procedure Build_Graph
+     (Graph         : in out Dependency_Graph;
+      Files         : String_Vectors.Vector;
+      Charset       : String;
+      File_Reader   : File_Reader_Reference;
+      Unit_Provider : Unit_Provider_Reference);
+   --  Add ``Files`` and all the source files they transitively depend on to
+   --  ``Graph``.
+   --
+   --  Source files are not parsed when possible: the header scanner is
+   --  enough to find out their dependencies, and the unit provider to locate
+   --  the corresponding source files. Only the source files that the scanner
+   --  cannot process are parsed.
+
+   procedure Compute_Closure
+     (Graph   : Dependency_Graph;
+      Root    : Positive;
+      Marks   : in out Natural_Array;
+      Mark    : Positive;
+      Closure : in out Node_Vectors.Vector);
+   --  Set ``Closure`` to the list of nodes that ``Root`` transitively depends
+   --  on, including ``Root`` itself. ``Marks (N) = Mark`` is used to flag
+   --  nodes that are already in ``Closure``, so ``Mark`` must be different
+   --  from all the values in ``Marks``.
+
+   ----------
+   -- Join --
+   ----------
+
+   function Join (Name : Unbounded_Text_Type_Array) return Unbounded_Text_Type
+   is
+      Result : Unbounded_Text_Type;
+   begin
+      for I in Name'Range loop
+         if I > Name'First then
+            Append (Result, '.');
+         end if;
+         Append (Result, Name (I));
+      end loop;
+      return Result;
+   end Join;
+
+   -------------------------
+   -- Append_Dependencies --
+   -------------------------
+
+   procedure Append_Dependencies
+     (CU : Compilation_Unit; Deps : in out Dependency_Vectors.Vector) is
+   begin
+      --  "with"ed units. Do not try to tell packages from library-level
+      --  subprograms here: Build_Graph looks for a body if there is no spec.
+
+      for Clause of CU.F_Prelude loop
+         if Clause.Kind = Ada_With_Clause then
+            for N of Clause.As_With_Clause.F_Packages loop
+               begin
+                  Deps.Append
+                    ((Join (N.P_As_Symbol_Array), Unit_Specification));
+               exception
+                  when Property_Error =>
+                     null;
+               end;
+            end loop;
+         end if;
+      end loop;
+
+      declare
+         FQN : constant Unbounded_Text_Type_Array :=
+           CU.P_Syntactic_Fully_Qualified_Name;
+      begin
+         --  Parent units
+
+         for Last in FQN'First .. FQN'Last - 1 loop
+            Deps.Append
+              ((Join (FQN (FQN'First .. Last)), Unit_Specification));
+         end loop;
+
+         --  Spec for a body, or parent body for a subunit
+
+         if CU.F_Body.Kind = Ada_Subunit then
+            Deps.Append
+              ((Join (CU.F_Body.As_Subunit.F_Name.P_As_Symbol_Array),
+                Unit_Body));
+         elsif CU.P_Unit_Kind = Unit_Body then
+            Deps.Append ((Join (FQN), Unit_Specification));
+         end if;
+      end;
+
+   exception
+      when Property_Error =>
+
+         --  This can happen on invalid source files: just ignore the
+         --  dependencies we could not compute.
+
+         null;
+   end Append_Dependencies;
+
+   -------------------------
+   -- Append_Dependencies --
+   -------------------------
+
+   procedure Append_Dependencies
+     (Scan : Header_Scanner.Scan_Result;
+      Deps : in out Dependency_Vectors.Vector)
+   is
+      function To_Name (S : String) return Unbounded_Text_Type
+      is (To_Unbounded_Text (To_Text (Ada.Characters.Handling.To_Lower (S))));
+      --  The header scanner only accepts ASCII names: just convert them to
+      --  the case folded form that the unit provider expects.
+
+      Name : constant String := To_String (Scan.Name);
+   begin
+      --  "with"ed units
+
+      for W of Scan.Withed_Units loop
+         Deps.Append ((To_Name (To_String (W)), Unit_Specification));
+      end loop;
+
+      --  Parent units
+
+      for I in Name'Range loop
+         if Name (I) = '.' then
+            Deps.Append
+              ((To_Name (Name (Name'First .. I - 1)), Unit_Specification));
+         end if;
+      end loop;
+
+      --  Spec for a body, or parent body for a subunit
+
+      if Length (Scan.Separate_Parent) > 0 then
+         Deps.Append ((To_Name (To_String (Scan.Separate_Parent)), Unit_Body));
+      elsif Scan.Kind = Unit_Body then
+         Deps.Append ((To_Name (Name), Unit_Specification));
+      end if;
+   end Append_Dependencies;
+
+   -----------------------
+   -- Scan_Dependencies --
+   -----------------------
+
+   procedure Scan_Dependencies
+     (Filename : String;
+      Deps     : in out Dependency_Vectors.Vector;
+      Success  : out Boolean)
+   is
+      use Header_Scanner;
+
+      Buffer : GNAT.Strings.String_Access :=
+        Create (Filesystem_String (Filename)).Read_File;
+   begin
+      Success := False;
+      if Buffer = null then
+         return;
+      end if;
+
+      declare
+         Result : constant Scan_Result := Scan (Buffer.all);
+      begin
+         GNAT.Strings.Free (Buffer);
+         case Result.Status is
+            when Unit_Found =>
+               Append_Dependencies (Result, Deps);
+               Success := True;
+
+            when No_Unit =>
+               Success := True;
+
+            when Ambiguous =>
+               null;
+         end case;
+      end;
+   end Scan_Dependencies;
+
+   --------------
+   -- Get_Node --
+   --------------
+
+   function Get_Node
+     (Graph    : in out Dependency_Graph;
+      Filename : Unbounded_String;
+      Is_New   : out Boolean) return Positive
+   is
+      Cur : constant Node_Maps.Cursor := Graph.Nodes.Find (Filename);
+   begin
+      Is_New := not Node_Maps.Has_Element (Cur);
+      if not Is_New then
+         return Node_Maps.Element (Cur);
+      end if;
+
+      Graph.Filenames.Append (Filename);
+      Graph.Dependencies.Append (Node_Vectors.Empty_Vector);
+      Graph.Nodes.Insert (Filename, Graph.Filenames.Last_Index);
+      return Graph.Filenames.Last_Index;
+   end Get_Node;
+
+   -----------------
+   -- Build_Graph --
+   -----------------
+
+   procedure Build_Graph
+     (Graph         : in out Dependency_Graph;
+      Files         : String_Vectors.Vector;
+      Charset       : String;
+      File_Reader   : File_Reader_Reference;
+      Unit_Provider : Unit_Provider_Reference)
+   is
+      Provider : constant Unit_Provider_Reference :=
+        (if Unit_Provider.Is_Null
+         then Libadalang.Unit_Files.Default_Provider
+         else Unit_Provider);
+      --  Unit provider to locate the source files for dependencies. Like
+      --  analysis contexts, use the default one if none is given.
+
+      Use_Scanner : constant Boolean :=
+        File_Reader.Is_Null
+        and then Header_Scanner.Is_ASCII_Compatible (Charset);
+      --  Whether the header scanner can process source files. Source files
+      --  that go through a file reader must be parsed, as the file reader may
+      --  alter their content (preprocessing for instance).
+
+      Context : Analysis_Context := No_Analysis_Context;
+      --  Context to parse source files that the header scanner cannot
+      --  process. Do not use the app's event handler for this context:
+      --  missing dependencies are reported when actually processing source
+      --  files.
+
+      Parsed_Count : Natural := 0;
+      --  Number of source files that had to be parsed
+
+      To_Visit : Node_Vectors.Vector;
+      --  Nodes whose dependencies must be computed
+
+      function Locate (D : Dependency) return Unbounded_String;
+      --  Return the name of the source file that contains ``D``, or an empty
+      --  string if it cannot be found.
+
+      ------------
+      -- Locate --
+      ------------
+
+      function Locate (D : Dependency) return Unbounded_String is
+         Name           : constant Text_Type := To_Text (D.Name);
+         Filename       : Unbounded_String;
+         PLE_Root_Index : Natural := 1;
+      begin
+         Provider.Get.Get_Unit_Location
+           (Name, D.Kind, Filename, PLE_Root_Index);
+
+         --  "with"ed library-level subprograms may have no spec
+
+         if D.Kind = Unit_Specification
+            and then not GNAT.OS_Lib.Is_Regular_File (To_String (Filename))
+         then
+            Provider.Get.Get_Unit_Location
+              (Name, Unit_Body, Filename, PLE_Root_Index);
+         end if;
+
+         if GNAT.OS_Lib.Is_Regular_File (To_String (Filename)) then
+            return Filename;
+         else
+            return Null_Unbounded_String;
+         end if;
+
+      exception
+         when Invalid_Unit_Name_Error =>
+            return Null_Unbounded_String;
+      end Locate;
+
+      Node   : Positive;
+      Is_New : Boolean;
+   begin
+      for F of Files loop
+         Node := Get_Node (Graph, F, Is_New);
+         if Is_New then
+            To_Visit.Append (Node);
+         end if;
+      end loop;
+
+      while not To_Visit.Is_Empty loop
+         declare
+            Current  : constant Positive := To_Visit.Last_Element;
+            Filename : constant String :=
+              To_String (Graph.Filenames (Current));
+            Deps     : Dependency_Vectors.Vector;
+            Scanned  : Boolean := False;
+         begin
+            To_Visit.Delete_Last;
+
+            if Use_Scanner then
+               Scan_Dependencies (Filename, Deps, Scanned);
+            end if;
+
+            if not Scanned then
+               if Context = No_Analysis_Context then
+                  Context := Create_Context
+                    (Charset       => Charset,
+                     File_Reader   => File_Reader,
+                     Unit_Provider => Unit_Provider);
+               end if;
+               Parsed_Count := Parsed_Count + 1;
+
+               declare
+                  Unit      : constant Analysis_Unit :=
+                    Context.Get_From_File (Filename);
+                  Root_Node : constant Ada_Node := Unit.Root;
+               begin
+                  if not Root_Node.Is_Null then
+                     case Root_Node.Kind is
+                        when Ada_Compilation_Unit =>
+                           Append_Dependencies
+                             (Root_Node.As_Compilation_Unit, Deps);
+                        when Ada_Compilation_Unit_List =>
+                           for I in 1 .. Root_Node.Children_Count loop
+                              Append_Dependencies
+                                (Root_Node.Child (I).As_Compilation_Unit,
+                                 Deps);
+                           end loop;
+                        when others =>
+                           null;
+                     end case;
+                  end if;
+               end;
+            end if;
+
+            for D of Deps loop
+               declare
+                  Dep_Filename : constant Unbounded_String := Locate (D);
+               begin
+                  if Length (Dep_Filename) > 0 then
+                     Node := Get_Node (Graph, Dep_Filename, Is_New);
+                     if Node /= Current
+                        and then not Graph.Dependencies (Current).Contains
+                                       (Node)
+                     then
+                        Graph.Dependencies (Current).Append (Node);
+                     end if;
+                     if Is_New then
+                        To_Visit.Append (Node);
+                     end if;
+                  end if;
+               end;
+            end loop;
+         end;
+      end loop;
+
+      if Trace.Is_Active then
+         Trace.Trace
+           ("Parsed" & Natural'Image (Parsed_Count) & " out of"
+            & Natural'Image (Graph.Filenames.Last_Index)
+            & " source files to find dependencies");
+      end if;
+   end Build_Graph;
+
+   ---------------------
+   -- Compute_Closure --
+   ---------------------
+
+   procedure Compute_Closure
+     (Graph   : Dependency_Graph;
+      Root    : Positive;
+      Marks   : in out Natural_Array;
+      Mark    : Positive;
+      Closure : in out Node_Vectors.Vector)
+   is
+      I : Positive := 1;
+   begin
+      Closure.Clear;
+      Closure.Append (Root);
+      Marks (Root) := Mark;
+
+      --  Closure is also the work list: process its nodes in order until we
+      --  reach its end.
+
+      while I <= Closure.Last_Index loop
+         for D of Graph.Dependencies (Closure (I)) loop
+            if Marks (D) /= Mark then
+               Marks (D) := Mark;
+               Closure.Append (D);
+            end if;
+         end loop;
+         I := I + 1;
+      end loop;
+   end Compute_Closure;
+
+   --------------
+   -- Schedule --
+   --------------
+
+   function Schedule
+     (Files         : String_Vectors.Vector;
+      Job_Count     : Job_ID;
+      Charset       : String;
+      File_Reader   : File_Reader_Reference;
+      Unit_Provider : Unit_Provider_Reference) return File_Batch_Array
+   is
+      File_Count : constant Natural := Natural (Files.Length);
+
+      Graph  : Dependency_Graph;
+      Result : File_Batch_Array (1 .. Job_Count);
+   begin
+      if File_Count = 0 then
+         return Result;
+      end if;
+
+      Trace.Increase_Indent ("Computing the dependency graph");
+      Build_Graph (Graph, Files, Charset, File_Reader, Unit_Provider);
+      Trace.Decrease_Indent;
+
+      declare
+         Node_Count : constant Positive := Graph.Filenames.Last_Index;
+
+         Marks : Natural_Array_Access :=
+           new Natural_Array'(1 .. Node_Count => 0);
+         Mark  : Natural := 0;
+         --  See Compute_Closure
+
+         Closures : Node_Vector_Array_Access :=
+           new Node_Vector_Array (1 .. File_Count);
+         --  Dependency closure for each source file
+
+         Loaded : Boolean_Matrix_Access :=
+           new Boolean_Matrix'(1 .. Job_Count => (1 .. Node_Count => False));
+         --  For each job, whether each node is loaded by at least one source
+         --  file assigned to that job.
+
+         Load_Counts : array (Result'Range) of Natural := (others => 0);
+         --  For each job, number of nodes it loads
+
+         Queue : Job_Queues.Set;
+         --  All jobs, by increasing load
+
+         Order : Node_Vectors.Vector;
+
+         function Before (Left, Right : Positive) return Boolean
+         is (Closures (Left).Length > Closures (Right).Length
+             or else (Closures (Left).Length = Closures (Right).Length
+                      and then Left < Right));
+         --  Sort source files by decreasing closure size, keeping the
+         --  original order for source files with the same closure size.
+
+         package Sorting is new Node_Vectors.Generic_Sorting (Before);
+      begin
+         for I in 1 .. File_Count loop
+            Mark := Mark + 1;
+            Compute_Closure
+              (Graph, Graph.Nodes.Element (Files (I)), Marks.all, Mark,
+               Closures (I));
+            Order.Append (I);
+         end loop;
+         Sorting.Sort (Order);
+
+         for J in Result'Range loop
+            Queue.Insert ((Load => 0, Job => J));
+         end loop;
+
+         --  Assign each source file to the job whose load would be the
+         --  smallest after the assignment: its current load, plus one for the
+         --  source file itself, plus the number of nodes in the closure that
+         --  it does not load yet. This favors jobs that already load most of
+         --  the closure while keeping loads balanced. Start with the biggest
+         --  closures, as they are the most likely to contain the smaller
+         --  ones.
+
+         for I of Order loop
+            declare
+               Closure   : Node_Vectors.Vector renames Closures (I);
+               Examined  : Job_Load_Vectors.Vector;
+               Best      : Job_ID := Result'First;
+               Best_Load : Natural := Natural'Last;
+               Missing   : Natural;
+            begin
+               --  Jobs come out of the queue by increasing current load: stop
+               --  as soon as the current load alone cannot beat the best
+               --  candidate so far.
+
+               while not Queue.Is_Empty
+                     and then Queue.First_Element.Load + 1 < Best_Load
+               loop
+                  declare
+                     Candidate : constant Job_Load := Queue.First_Element;
+                  begin
+                     Queue.Delete_First;
+                     Examined.Append (Candidate);
+
+                     Missing := 0;
+                     for N of Closure loop
+                        if not Loaded (Candidate.Job, N) then
+                           Missing := Missing + 1;
+                        end if;
+                     end loop;
+
+                     if Candidate.Load + 1 + Missing < Best_Load then
+                        Best := Candidate.Job;
+                        Best_Load := Candidate.Load + 1 + Missing;
+                     end if;
+                  end;
+               end loop;
+
+               Result (Best).Append (Files (I));
+               for N of Closure loop
+                  if not Loaded (Best, N) then
+                     Loaded (Best, N) := True;
+                     Load_Counts (Best) := Load_Counts (Best) + 1;
+                  end if;
+               end loop;
+
+               --  Put the examined jobs back in the queue, with the updated
+               --  load for the one that got the source file.
+
+               for E of Examined loop
+                  if E.Job = Best then
+                     Queue.Insert ((Load => Best_Load, Job => Best));
+                  else
+                     Queue.Insert (E);
+                  end if;
+               end loop;
+            end;
+         end loop;
+
+         if Trace.Is_Active then
+            Trace.Trace
+              ("Scheduled" & Natural'Image (File_Count) & " source files on"
+               & Job_ID'Image (Job_Count) & " jobs ("
+               & Positive'Image (Node_Count)
+               & " source files in the dependency graph)");
+            for J in Result'Range loop
+               Trace.Trace
+                 ("Job" & Job_ID'Image (J) & ":"
+                  & Count_Type'Image (Result (J).Length) & " source files,"
+                  & Natural'Image (Load_Counts (J)) & " source files to load");
+            end loop;
+         end if;
+
+         Free (Marks);
+         Free (Closures);
+         Free (Loaded);
+      end;
+
+      --  Jobs take source files from the end of their batch
+
+      for Batch of Result loop
+         Batch.Reverse_Elements;
+      end loop;
+      return Result;
+   end Schedule;
+
+end Libadalang.Helpers.Dependency_Scheduler;
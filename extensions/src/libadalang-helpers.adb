@@ -3,6 +3,7 @@
 --  SPDX-License-Identifier: Apache-2.0
 --
 
+with Ada.Calendar;
 with Ada.Command_Line;
 with Ada.Containers.Synchronized_Queue_Interfaces;
 with Ada.Containers.Unbounded_Synchronized_Queues;
@@ -29,8 +30,11 @@ with Langkit_Support.Text;         use Langkit_Support.Text;
 with Libadalang.Auto_Provider;    use Libadalang.Auto_Provider;
 with Libadalang.GPR_Utils;        use Libadalang.GPR_Utils;
 with Libadalang.Common;
+with Libadalang.Helpers.Dependency_Scheduler;
+with Libadalang.Implementation;
 with Libadalang.Preprocessing;    use Libadalang.Preprocessing;
 with Libadalang.Project_Provider; use Libadalang.Project_Provider;
+with Libadalang.Public_Converters;
 
 package body Libadalang.Helpers is
 
@@ -215,6 +219,27 @@ package body Libadalang.Helpers is
          Files : String_Vectors.Vector;
          Queue : String_Queues.Queue;
 
+         type File_Batch_Array_Access is
+           access Dependency_Scheduler.File_Batch_Array;
+         procedure Free is new Ada.Unchecked_Deallocation
+           (Dependency_Scheduler.File_Batch_Array, File_Batch_Array_Access);
+
+         Batches : File_Batch_Array_Access;
+         --  If source files are scheduled by dependencies, list of source
+         --  files that remain to be processed for each job (see
+         --  Dependency_Scheduler.Schedule). Used instead of Queue in that
+         --  case.
+
+         protected Batch_Queue is
+            procedure Next_File
+              (JID : Job_ID; F : out Unbounded_String; Found : out Boolean);
+            --  Remove the next source file to process for the ``JID`` job
+            --  from Batches and return it in ``F``. If the batch for this job
+            --  is empty, take the last source file of the biggest batch
+            --  instead. Set ``Found`` to False if there is no source file
+            --  left at all.
+         end Batch_Queue;
+
          task type Main_Task_Type
             --  Increase task's Storage_Size to match the primary stack size.
             --  This helps avoiding stack overflows in PLE for client programs
@@ -241,8 +266,50 @@ package body Libadalang.Helpers is
             end if;
 
             Free (Job_Contexts);
+            Free (Batches);
          end Finalize;
 
+         -----------------
+         -- Batch_Queue --
+         -----------------
+
+         protected body Batch_Queue is
+
+            ---------------
+            -- Next_File --
+            ---------------
+
+            procedure Next_File
+              (JID : Job_ID; F : out Unbounded_String; Found : out Boolean)
+            is
+               Source : Job_ID := JID;
+            begin
+               --  If this job has nothing left to process in its own batch,
+               --  steal work from the job that has the most left, taking the
+               --  source file it would process last.
+
+               if Batches (JID).Is_Empty then
+                  for Other in Batches'Range loop
+                     if Batches (Other).Length > Batches (Source).Length then
+                        Source := Other;
+                     end if;
+                  end loop;
+
+                  Found := not Batches (Source).Is_Empty;
+                  if Found then
+                     F := Batches (Source).First_Element;
+                     Batches (Source).Delete_First;
+                  end if;
+
+               else
+                  Found := True;
+                  F := Batches (JID).Last_Element;
+                  Batches (JID).Delete_Last;
+               end if;
+            end Next_File;
+
+         end Batch_Queue;
+
          --------------------
          -- Main_Task_Type --
          --------------------
@@ -261,11 +328,16 @@ package body Libadalang.Helpers is
             --  appropriate.
 
             declare
+               use type Ada.Calendar.Time;
+
                Job_Name : constant String := "Job" & JID'Image;
                Job_Ctx  : App_Job_Context renames Job_Contexts (JID);
 
                type Any_Step is (Setup, In_Unit, Post_Process);
                Step : Any_Step := Setup;
+
+               Start_Time : constant Ada.Calendar.Time := Ada.Calendar.Clock;
+               Found      : Boolean;
             begin
                Trace.Increase_Indent ("Setting up " & Job_Name);
                Job_Setup (Job_Ctx);
@@ -285,18 +357,27 @@ package body Libadalang.Helpers is
 
                   --  Pick the next file and process it
 
-                  select
-                     Queue.Dequeue (F);
-                  or
-                     delay 0.1;
-                     exit;
-                  end select;
+                  if Batches /= null then
+                     Batch_Queue.Next_File (JID, F, Found);
+                     exit when not Found;
+                  else
+                     select
+                        Queue.Dequeue (F);
+                     or
+                        delay 0.1;
+                        exit;
+                     end select;
+                  end if;
 
                   Trace.Increase_Indent (Job_Name & ": Processing " & (+F));
                   declare
-                     Unit : constant Analysis_Unit :=
+                     Load_Start : constant Ada.Calendar.Time :=
+                       Ada.Calendar.Clock;
+                     Unit       : constant Analysis_Unit :=
                        Job_Ctx.Analysis_Ctx.Get_From_File (+F);
                   begin
+                     Job_Ctx.Unit_Load_Time :=
+                       Ada.Calendar.Clock - Load_Start;
                      Process_Unit (Job_Ctx, Unit);
                      Job_Ctx.Units_Processed.Append (Unit);
                   end;
@@ -309,6 +390,23 @@ package body Libadalang.Helpers is
                Job_Post_Process (Job_Ctx);
                Trace.Decrease_Indent;
 
+               --  Report how much work this job did, so that the effect of
+               --  the scheduling of source files can be measured.
+
+               if Trace.Is_Active then
+                  Trace.Trace
+                    (Job_Name & ": processed"
+                     & Ada.Containers.Count_Type'Image
+                         (Job_Ctx.Units_Processed.Length)
+                     & " source files, loaded"
+                     & Ada.Containers.Count_Type'Image
+                         (Public_Converters.Unwrap_Context
+                            (Job_Ctx.Analysis_Ctx).Units.Length)
+                     & " analysis units in"
+                     & Duration'Image (Ada.Calendar.Clock - Start_Time)
+                     & "s");
+               end if;
+
             --  Make sure to handle properly uncaught errors (they have nowhere
             --  to propagate once here) and abortion requests.
 
@@ -541,7 +639,11 @@ package body Libadalang.Helpers is
                end loop;
                Found_Files := Find_Files (Directories => Dirs);
                UFP := Create_Auto_Provider_Reference
-                 (Found_Files.all, +Args.Charset.Get);
+                 (Found_Files.all,
+                  +Args.Charset.Get,
+                  Scan_Headers => Args.Auto_Dir_Scan_Headers.Get,
+                  Cache_File   => To_String (Args.Auto_Dir_Cache.Get),
+                  Jobs         => Args.Jobs.Get);
 
                if not Files_From_Args (Files) then
                   Sort (Found_Files.all);
@@ -654,6 +756,7 @@ package body Libadalang.Helpers is
                                      Unit_Provider => UFP,
                                      Event_Handler => EH),
                Units_Processed => <>,
+               Unit_Load_Time  => 0.0,
                Aborted         => False);
          end loop;
 
@@ -663,6 +766,21 @@ package body Libadalang.Helpers is
          Trace.Trace ("Setting up the app");
          App_Setup (App_Ctx, Job_Contexts.all);
 
+         --  If requested, distribute source files among jobs according to
+         --  their dependencies. This is useless with only one job.
+
+         if Args.Schedule_By_Deps.Get and then Job_Contexts'Length > 1 then
+            Trace.Increase_Indent ("Scheduling source files by dependencies");
+            Batches := new Dependency_Scheduler.File_Batch_Array'
+              (Dependency_Scheduler.Schedule
+                 (Files         => Files,
+                  Job_Count     => Job_Contexts'Last,
+                  Charset       => +Default_Charset,
+                  File_Reader   => FR,
+                  Unit_Provider => UFP));
+            Trace.Decrease_Indent;
+         end if;
+
          Trace.Trace ("Running jobs");
          declare
             Task_Pool : array (Job_Contexts.all'Range) of Main_Task_Type;
@@ -671,9 +789,11 @@ package body Libadalang.Helpers is
                Task_Pool (JID).Start (JID);
             end loop;
 
-            for F of Files loop
-               Queue.Enqueue (F);
-            end loop;
+            if Batches = null then
+               for F of Files loop
+                  Queue.Enqueue (F);
+               end loop;
+            end if;
 
             for T of Task_Pool loop
                T.Stop;
@@ -24,6 +24,10 @@ with Libadalang.GPR_Impl;          use Libadalang.GPR_Impl;
 with Libadalang.Preprocessing;     use Libadalang.Preprocessing;
 with Libadalang.Project_Provider;  use Libadalang.Project_Provider;
 with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+with Libadalang.Env_Caches;
+with Libadalang.Memory_Budget;
+with Libadalang.Nameres_Memo;
+with Libadalang.Reference_Index;
 
 package body Libadalang.Implementation.C.Extensions is
 
@@ -399,6 +403,20 @@ package body Libadalang.Implementation.C.Extensions is
    function ada_create_auto_provider
      (Input_Files : System.Address;
       Charset     : chars_ptr)
+      return ada_unit_provider is
+   begin
+      return ada_create_auto_provider_with_options
+        (Input_Files, Charset, null);
+   end ada_create_auto_provider;
+
+   -------------------------------------------
+   -- ada_create_auto_provider_with_options --
+   -------------------------------------------
+
+   function ada_create_auto_provider_with_options
+     (Input_Files : System.Address;
+      Charset     : chars_ptr;
+      Options     : access constant ada_auto_provider_options)
       return ada_unit_provider
    is
       type C_String_Array is array (Positive) of chars_ptr
@@ -411,7 +429,25 @@ package body Libadalang.Implementation.C.Extensions is
 
       Actual_Charset : constant String :=
         (if Charset = Null_Ptr then Default_Charset else Value (Charset));
+
+      Scan_Headers : Boolean := False;
+      Cache_File   : Unbounded_String;
+      Jobs         : Natural := 1;
    begin
+      Clear_Last_Exception;
+
+      if Options /= null then
+         if Options.Jobs < 0 then
+            raise Precondition_Failure with "jobs must be non-negative";
+         end if;
+
+         Scan_Headers := Options.Scan_Headers /= 0;
+         if Options.Cache_File /= Null_Ptr then
+            Cache_File := To_Unbounded_String (Value (Options.Cache_File));
+         end if;
+         Jobs := Natural (Options.Jobs);
+      end if;
+
       while Input_Files_Array (Files_Count + 1) /= Null_Ptr loop
          Files_Count := Files_Count + 1;
       end loop;
@@ -427,12 +463,21 @@ package body Libadalang.Implementation.C.Extensions is
          end loop;
 
          return Provider : constant ada_unit_provider := To_C_Provider
-           (Create_Auto_Provider_Reference (Files.all, Actual_Charset))
+           (Create_Auto_Provider_Reference
+              (Files.all,
+               Actual_Charset,
+               Scan_Headers,
+               To_String (Cache_File),
+               Jobs))
          do
             Unchecked_Free (Files);
          end return;
       end;
-   end ada_create_auto_provider;
+   exception
+      when Exc : Precondition_Failure =>
+         Set_Last_Exception (Exc);
+         return ada_unit_provider (System.Null_Address);
+   end ada_create_auto_provider_with_options;
 
    ----------------------------------
    -- ada_gpr_project_source_files --
@@ -766,4 +811,266 @@ package body Libadalang.Implementation.C.Extensions is
          Set_Last_Exception (Exc);
    end ada_set_config_pragmas_mapping;
 
+   -------------------------------------
+   -- ada_set_reference_index_enabled --
+   -------------------------------------
+
+   procedure ada_set_reference_index_enabled
+     (Context : ada_analysis_context; Enabled : int) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Reference_Index.Set_Enabled
+        (Wrap_Context (Context), Enabled /= 0);
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_set_reference_index_enabled;
+
+   --------------------------------------------
+   -- ada_set_nameres_memo_dependency_scoped --
+   --------------------------------------------
+
+   procedure ada_set_nameres_memo_dependency_scoped
+     (Context : ada_analysis_context; Enabled : int) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Nameres_Memo.Set_Dependency_Scoped
+        (Wrap_Context (Context), Enabled /= 0);
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_set_nameres_memo_dependency_scoped;
+
+   -------------------------------------------
+   -- ada_set_nameres_memo_solver_profiling --
+   -------------------------------------------
+
+   procedure ada_set_nameres_memo_solver_profiling
+     (Context : ada_analysis_context; Enabled : int) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Nameres_Memo.Set_Solver_Profiling
+        (Wrap_Context (Context), Enabled /= 0);
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_set_nameres_memo_solver_profiling;
+
+   ----------------------------
+   -- ada_nameres_memo_stats --
+   ----------------------------
+
+   procedure ada_nameres_memo_stats
+     (Context     : ada_analysis_context;
+      Hits        : access Interfaces.Integer_64;
+      Misses      : access Interfaces.Integer_64;
+      Evictions   : access Interfaces.Integer_64;
+      Equations   : access Interfaces.Integer_64;
+      Timeouts    : access Interfaces.Integer_64;
+      Solver_Time : access double) is
+   begin
+      Clear_Last_Exception;
+      declare
+         S : constant Libadalang.Nameres_Memo.Memo_Stats :=
+           Libadalang.Nameres_Memo.Stats (Wrap_Context (Context));
+      begin
+         Hits.all := Interfaces.Integer_64 (S.Hits);
+         Misses.all := Interfaces.Integer_64 (S.Misses);
+         Evictions.all := Interfaces.Integer_64 (S.Evictions);
+         Equations.all := Interfaces.Integer_64 (S.Equations);
+         Timeouts.all := Interfaces.Integer_64 (S.Timeouts);
+         Solver_Time.all := double (S.Solver_Time);
+      end;
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_nameres_memo_stats;
+
+   ----------------------------------
+   -- ada_nameres_memo_reset_stats --
+   ----------------------------------
+
+   procedure ada_nameres_memo_reset_stats (Context : ada_analysis_context) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Nameres_Memo.Reset_Stats (Wrap_Context (Context));
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_nameres_memo_reset_stats;
+
+   ------------------------------------------
+   -- ada_set_env_caches_collection_policy --
+   ------------------------------------------
+
+   procedure ada_set_env_caches_collection_policy
+     (Context             : ada_analysis_context;
+      Kind                : int;
+      Threshold_Increment : Interfaces.Integer_64;
+      Min_Entry_Count     : Interfaces.Integer_64;
+      LRU_Max_Age         : int;
+      Memory_Budget       : Interfaces.Integer_64)
+   is
+      use Libadalang.Env_Caches;
+   begin
+      Clear_Last_Exception;
+
+      if Kind not in Collection_Policy_Kind'Pos (Collection_Policy_Kind'First)
+                  .. Collection_Policy_Kind'Pos (Collection_Policy_Kind'Last)
+      then
+         raise Precondition_Failure with "invalid collection policy kind";
+      elsif LRU_Max_Age <= 0 then
+         raise Precondition_Failure with "LRU max age must be positive";
+      end if;
+
+      Set_Collection_Policy
+        (Wrap_Context (Context),
+         (Kind                => Collection_Policy_Kind'Val (Kind),
+          Threshold_Increment => Long_Long_Integer (Threshold_Increment),
+          Min_Entry_Count     => Long_Long_Integer (Min_Entry_Count),
+          LRU_Max_Age         => Positive (LRU_Max_Age),
+          Memory_Budget       => Long_Long_Integer (Memory_Budget)));
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_set_env_caches_collection_policy;
+
+   --------------------------------------
+   -- ada_env_caches_collection_policy --
+   --------------------------------------
+
+   procedure ada_env_caches_collection_policy
+     (Context             : ada_analysis_context;
+      Kind                : access int;
+      Threshold_Increment : access Interfaces.Integer_64;
+      Min_Entry_Count     : access Interfaces.Integer_64;
+      LRU_Max_Age         : access int;
+      Memory_Budget       : access Interfaces.Integer_64)
+   is
+      use Libadalang.Env_Caches;
+   begin
+      Clear_Last_Exception;
+      declare
+         P : constant Collection_Policy :=
+           Get_Collection_Policy (Wrap_Context (Context));
+      begin
+         Kind.all := Collection_Policy_Kind'Pos (P.Kind);
+         Threshold_Increment.all :=
+           Interfaces.Integer_64 (P.Threshold_Increment);
+         Min_Entry_Count.all := Interfaces.Integer_64 (P.Min_Entry_Count);
+         LRU_Max_Age.all := int (P.LRU_Max_Age);
+         Memory_Budget.all := Interfaces.Integer_64 (P.Memory_Budget);
+      end;
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_env_caches_collection_policy;
+
+   ----------------------------------
+   -- ada_context_env_caches_stats --
+   ----------------------------------
+
+   procedure ada_context_env_caches_stats
+     (Context     : ada_analysis_context;
+      Entries     : access Interfaces.Integer_64;
+      Lookups     : access Interfaces.Integer_64;
+      Hits        : access Interfaces.Integer_64;
+      Collections : access int) is
+   begin
+      Clear_Last_Exception;
+      declare
+         S : constant Libadalang.Env_Caches.Env_Caches_Stats :=
+           Libadalang.Env_Caches.Get_Stats (Wrap_Context (Context));
+      begin
+         Entries.all := Interfaces.Integer_64 (S.Entries);
+         Lookups.all := Interfaces.Integer_64 (S.Lookups);
+         Hits.all := Interfaces.Integer_64 (S.Hits);
+         Collections.all := int (S.Collections);
+      end;
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_context_env_caches_stats;
+
+   -------------------------------
+   -- ada_unit_env_caches_stats --
+   -------------------------------
+
+   procedure ada_unit_env_caches_stats
+     (Unit        : ada_analysis_unit;
+      Entries     : access Interfaces.Integer_64;
+      Lookups     : access Interfaces.Integer_64;
+      Hits        : access Interfaces.Integer_64;
+      Collections : access int) is
+   begin
+      Clear_Last_Exception;
+      declare
+         S : constant Libadalang.Env_Caches.Env_Caches_Stats :=
+           Libadalang.Env_Caches.Get_Stats (Wrap_Unit (Unit));
+      begin
+         Entries.all := Interfaces.Integer_64 (S.Entries);
+         Lookups.all := Interfaces.Integer_64 (S.Lookups);
+         Hits.all := Interfaces.Integer_64 (S.Hits);
+         Collections.all := int (S.Collections);
+      end;
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_unit_env_caches_stats;
+
+   ---------------------------
+   -- ada_set_memory_budget --
+   ---------------------------
+
+   procedure ada_set_memory_budget
+     (Context : ada_analysis_context;
+      Budget  : Interfaces.Integer_64) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Memory_Budget.Set_Memory_Budget
+        (Wrap_Context (Context), Long_Long_Integer (Budget));
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_set_memory_budget;
+
+   -------------------------------
+   -- ada_enforce_memory_budget --
+   -------------------------------
+
+   procedure ada_enforce_memory_budget (Context : ada_analysis_context) is
+   begin
+      Clear_Last_Exception;
+      Libadalang.Memory_Budget.Enforce (Wrap_Context (Context));
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_enforce_memory_budget;
+
+   -----------------------------
+   -- ada_memory_budget_stats --
+   -----------------------------
+
+   procedure ada_memory_budget_stats
+     (Context        : ada_analysis_context;
+      Estimated_Size : access Interfaces.Integer_64;
+      Units          : access int;
+      Evictions      : access int;
+      Reloads        : access int) is
+   begin
+      Clear_Last_Exception;
+      declare
+         S : constant Libadalang.Memory_Budget.Memory_Stats :=
+           Libadalang.Memory_Budget.Stats (Wrap_Context (Context));
+      begin
+         Estimated_Size.all := Interfaces.Integer_64 (S.Estimated_Size);
+         Units.all := int (S.Units);
+         Evictions.all := int (S.Evictions);
+         Reloads.all := int (S.Reloads);
+      end;
+   exception
+      when Exc : others =>
+         Set_Last_Exception (Exc);
+   end ada_memory_budget_stats;
+
 end Libadalang.Implementation.C.Extensions;
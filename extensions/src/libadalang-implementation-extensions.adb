@@ -3,11 +3,14 @@
 --  SPDX-License-Identifier: Apache-2.0
 --
 
+with Ada.Calendar;
+with Ada.Containers.Hashed_Sets;
 with Ada.Containers.Vectors;
 with Ada.Directories;
 with Ada.Strings.Wide_Wide_Unbounded;
 
 with GNATCOLL.GMP.Integers;
+with GNATCOLL.Traces;
 
 with Langkit_Support.Adalog.Debug;
 with Langkit_Support.Bump_Ptr;
@@ -18,8 +21,12 @@ with Libadalang.Analysis; use Libadalang.Analysis;
 with Libadalang.Common;
 with Libadalang.Config_Pragmas_Impl;
 with Libadalang.Doc_Utils;
+with Libadalang.Env_Caches_Impl;
 with Libadalang.Env_Hooks;
 with Libadalang.Expr_Eval;
+with Libadalang.Import_Graph_Impl;
+with Libadalang.Memory_Budget_Impl;
+with Libadalang.Nameres_Memo_Impl;
 with Libadalang.Public_Converters;
 with Libadalang.Sources;
 with Libadalang.Unit_Files;
@@ -28,12 +35,151 @@ with Libadalang.Unit_Files;
 
 package body Libadalang.Implementation.Extensions is
 
+   Import_Graph_Trace : constant GNATCOLL.Traces.Trace_Handle :=
+     GNATCOLL.Traces.Create
+       ("LIBADALANG.IMPORT_GRAPH", GNATCOLL.Traces.From_Config);
+   --  Trace to show statistics about the import graph (number of edges
+   --  walked and saved thanks to the graph).
+
+   Nameres_Memo_Trace : constant GNATCOLL.Traces.Trace_Handle :=
+     GNATCOLL.Traces.Create
+       ("LIBADALANG.NAMERES_MEMO", GNATCOLL.Traces.From_Config);
+   --  Trace to show evictions in the ``AdaNode.resolve_own_names``
+   --  memoization table, with statistics (hits, misses, evictions).
+
+   Memory_Budget_Trace : constant GNATCOLL.Traces.Trace_Handle :=
+     GNATCOLL.Traces.Create
+       ("LIBADALANG.MEMORY_BUDGET", GNATCOLL.Traces.From_Config);
+   --  Trace to show units evicted to honor the memory budget of analysis
+   --  contexts.
+
    procedure Alloc_Logic_Vars (Node : Bare_Expr) with Inline;
 
    function CU_Subunit (CU : Bare_Compilation_Unit) return Bare_Subunit;
    --  If CU is a subunit, return the corresponding subunit node. Return null
    --  otherwise.
 
+   procedure Build_Ref_Index
+     (Unit : Internal_Unit; Imprecise_Fallback : Boolean);
+   --  (Re)build the reference index of ``Unit`` corresponding to the given
+   --  value for the ``imprecise_fallback`` dynamic variable.
+
+   procedure Build_Derivation_Index (Unit : Internal_Unit);
+   --  (Re)build the derivation index of ``Unit``
+
+   package Analysis_Unit_Vectors is new Ada.Containers.Vectors
+     (Index_Type   => Positive,
+      Element_Type => Internal_Unit);
+
+   package Ref_Entry_Vectors is new Ada.Containers.Vectors
+     (Index_Type   => Positive,
+      Element_Type => Internal_Ref_Index_Entry);
+
+   type CU_Array is array (Positive range <>) of Bare_Compilation_Unit;
+
+   function All_Compilation_Units_From
+     (Root : Bare_Ada_Node) return CU_Array;
+   --  Given a node that is the root of an analysis unit, return all the
+   --  compilation units that are defined inside of it.
+
+   function Key (Unit : Implementation.Internal_Unit)
+                 return Import_Graph_Impl.Internal_Unit
+   is (Import_Graph_Impl.Internal_Unit (Unit));
+
+   function Is_Up_To_Date
+     (Graph         : Import_Graph_Impl.Import_Graph_Type;
+      Unit          : Internal_Unit;
+      Cache_Version : Integer) return Boolean;
+   --  Return whether ``Graph`` has up-to-date direct imports for ``Unit``,
+   --  ``Cache_Version`` being the current context-wide cache version.
+
+   procedure Compute_Imports
+     (Graph         : in out Import_Graph_Impl.Import_Graph_Type;
+      Unit          : Internal_Unit;
+      Cache_Version : Integer);
+   --  Compute the direct imports of ``Unit`` and update ``Graph``
+   --  accordingly. ``Cache_Version`` is the current context-wide cache
+   --  version.
+
+   procedure Update_Import_Graph
+     (Context : Internal_Context; Units : Analysis_Unit_Vectors.Vector);
+   --  Make sure that the import graph of ``Context`` has up-to-date direct
+   --  imports for all ``Units`` and for all the units they transitively
+   --  import.
+
+   procedure Evict_Nameres_Cache (Unit : Internal_Unit);
+   --  Free all the resolutions memoized in ``Unit.Nodes_Nameres`` and count
+   --  them as evictions.
+
+   function Deps_Are_Fresh
+     (Deps : Import_Graph_Impl.Unit_Deps_Type) return Boolean;
+   --  Return whether ``Deps`` is complete and no unit in it was reparsed since
+   --  it was computed.
+
+   function Revalidate_Deps
+     (Unit : Internal_Unit;
+      Deps : in out Import_Graph_Impl.Unit_Deps_Type) return Boolean;
+   --  Return whether data computed for ``Unit`` with the given dependencies
+   --  is still valid. If so, stamp ``Deps`` with the current context-wide
+   --  cache version, so that the next check is immediate as long as the
+   --  context does not change.
+
+   procedure Compute_Unit_Deps
+     (Unit : Internal_Unit; Deps : in out Import_Graph_Impl.Unit_Deps_Type);
+   --  Compute the import closure of ``Unit`` and store it in ``Deps``, stamped
+   --  with the current context-wide cache version. ``Deps`` is left
+   --  incomplete (not scoped) if the closure cannot be computed.
+
+   procedure Check_Nameres_Deps (Unit : Internal_Unit);
+   --  Assuming that dependency-scoped invalidation of the
+   --  ``AdaNode.resolve_own_names`` memoization table is enabled, make sure
+   --  that the resolutions memoized for ``Unit`` do not depend on units that
+   --  were reparsed since they were computed: evict them all otherwise, and
+   --  compute the new dependencies of ``Unit``.
+
+   function Solve_Xref_Equation
+     (R : Solver.Relation; Node : Bare_Ada_Node) return Boolean;
+   --  Solve the xref equation ``R`` for ``Node``, like ``Solve_Wrapper``,
+   --  and count timeouts in the name resolution counters of its context.
+   --
+   --  The solver's timeout error is caught here rather than from the
+   --  property error that ``Solve_Wrapper`` turns it into, so that other
+   --  property errors are never mistaken for timeouts.
+
+   procedure Touch_Unit (Unit : Internal_Unit);
+   --  Record that ``Unit`` is being queried, for the memory budget of its
+   --  context.
+
+   procedure Start_Unit_Computation (Unit : Internal_Unit);
+   --  Record that evictable data is about to be computed for ``Unit``: count
+   --  a reload if it was evicted, check the memory budget if it is time to,
+   --  and mark the context as busy until ``End_Unit_Computation`` is called.
+
+   procedure End_Unit_Computation (Unit : Internal_Unit);
+   --  Record that the computation started with ``Start_Unit_Computation``
+   --  is done.
+
+   procedure Plan_Env_Caches_Collection
+     (Ctx                        : Internal_Context;
+      All_Env_Caches_Entry_Count : Long_Long_Natural);
+   --  Start a new collection attempt for the env caches of ``Ctx``: decide
+   --  whether to consider it according to the collection policy of ``Ctx``
+   --  and, if so, which units must have their env caches collected.
+
+   function Is_Fresh
+     (Unit : Internal_Unit; Cached : Resolution_Val) return Boolean
+   is (Cached.Cache_Version >= Unit.Context.Cache_Version
+       or else (Unit.Context.Nameres_Memo_Scoped
+                and then Unit.Nameres_Deps.Is_Scoped
+                and then Cached.Rebindings = null));
+   --  Return whether ``Cached``, a resolution memoized for a node in
+   --  ``Unit``, is still valid for the same rebindings. When
+   --  dependency-scoped invalidation is enabled, ``Check_Nameres_Deps`` must
+   --  have been called on ``Unit`` first. Resolutions made with rebindings
+   --  may depend on units outside of the import closure of ``Unit`` (generic
+   --  instantiations), so they are always validated against the
+   --  context-wide cache version.
+
    ----------------
    -- CU_Subunit --
    ----------------
@@ -184,6 +330,191 @@ package body Libadalang.Implementation.Extensions is
       return Is_Keyword (Token, Version);
    end Ada_Node_P_Is_Keyword;
 
+   --------------------------------
+   -- All_Compilation_Units_From --
+   --------------------------------
+
+   function All_Compilation_Units_From
+     (Root : Bare_Ada_Node) return CU_Array is
+   begin
+      if Root = null then
+         return (1 .. 0 => <>);
+      end if;
+
+      case Unit_Files.Root_Nodes (Root.Kind) is
+         when Ada_Compilation_Unit =>
+            return (1 => Bare_Compilation_Unit (Root));
+         when Ada_Compilation_Unit_List =>
+            declare
+               List : constant Bare_Compilation_Unit_List :=
+                  Bare_Compilation_Unit_List (Root);
+
+               Res : CU_Array (1 .. List.Count);
+            begin
+               for I in 1 .. List.Count loop
+                  Res (I) := List.Nodes (I);
+               end loop;
+               return Res;
+            end;
+         when Ada_Pragma_Node_List =>
+            return (1 .. 0 => <>);
+      end case;
+   end All_Compilation_Units_From;
+
+   -------------------
+   -- Is_Up_To_Date --
+   -------------------
+
+   function Is_Up_To_Date
+     (Graph         : Import_Graph_Impl.Import_Graph_Type;
+      Unit          : Internal_Unit;
+      Cache_Version : Integer) return Boolean
+   is
+      use Import_Graph_Impl;
+
+      Cur : constant Unit_Imports_Maps.Cursor :=
+        Graph.Imports.Find (Key (Unit));
+   begin
+      if not Unit_Imports_Maps.Has_Element (Cur) then
+         return False;
+      end if;
+
+      --  Imports are stale if the unit was reparsed. If some imports could
+      --  not be found, they may have been loaded since the imports were
+      --  computed, which can happen only if the cache version changed.
+
+      declare
+         Imports : Unit_Imports renames Graph.Imports.Constant_Reference (Cur);
+      begin
+         return Imports.Unit_Version = Natural (Unit.Unit_Version)
+                and then (not Imports.Has_Missing
+                          or else Imports.Cache_Version = Cache_Version);
+      end;
+   end Is_Up_To_Date;
+
+   ---------------------
+   -- Compute_Imports --
+   ---------------------
+
+   procedure Compute_Imports
+     (Graph         : in out Import_Graph_Impl.Import_Graph_Type;
+      Unit          : Internal_Unit;
+      Cache_Version : Integer)
+   is
+      use Import_Graph_Impl;
+
+      Version     : constant Natural := Natural (Unit.Unit_Version);
+      CUs         : constant CU_Array :=
+        All_Compilation_Units_From (Root (Unit));
+      Imports     : Unit_Sets.Set;
+      Has_Missing : Boolean := False;
+      Cur         : Unit_Imports_Maps.Cursor;
+   begin
+      --  First compute the new set of direct imports: if a property error
+      --  occurs, the graph is left untouched.
+
+      for Comp_Unit of CUs loop
+         declare
+            Units_Array : Internal_Entity_Compilation_Unit_Array_Access :=
+               Compilation_Unit_P_Imported_Units (Comp_Unit);
+         begin
+            for Imported_Unit of Units_Array.Items loop
+               if Imported_Unit.Node /= null then
+                  Imports.Include (Key (Imported_Unit.Node.Unit));
+                  Graph.Stats.Edge_Walks := Graph.Stats.Edge_Walks + 1;
+               else
+                  Has_Missing := True;
+               end if;
+            end loop;
+            Dec_Ref (Units_Array);
+         end;
+      end loop;
+
+      --  Then remove the reverse edges for the previous imports, if any,
+      --  and add the new ones.
+
+      Cur := Graph.Imports.Find (Key (Unit));
+      if Unit_Imports_Maps.Has_Element (Cur) then
+         for Imported of Unit_Imports_Maps.Element (Cur).Imports loop
+            Graph.Importers.Reference (Imported).Exclude (Key (Unit));
+         end loop;
+      end if;
+
+      for Imported of Imports loop
+         if not Graph.Importers.Contains (Imported) then
+            Graph.Importers.Insert (Imported, Unit_Sets.Empty_Set);
+         end if;
+         Graph.Importers.Reference (Imported).Include (Key (Unit));
+      end loop;
+
+      Graph.Imports.Include
+        (Key (Unit),
+         (Unit_Version  => Version,
+          Imports       => Imports,
+          Has_Missing   => Has_Missing,
+          Cache_Version => Cache_Version));
+
+      --  The graph has changed: cached closures may be stale
+
+      Graph.Closures.Clear;
+   end Compute_Imports;
+
+   -------------------------
+   -- Update_Import_Graph --
+   -------------------------
+
+   procedure Update_Import_Graph
+     (Context : Internal_Context; Units : Analysis_Unit_Vectors.Vector)
+   is
+      use Import_Graph_Impl;
+
+      Graph         : Import_Graph_Type renames Context.Import_Graph;
+      Cache_Version : constant Integer := Integer (Context.Cache_Version);
+      Worklist      : Analysis_Unit_Vectors.Vector := Units;
+      Visited       : Unit_Sets.Set;
+   begin
+      --  Units can be reparsed (or loaded) only when the context-wide cache
+      --  version changes. If it did not change since the last check, we only
+      --  need to check that all queried units are in the graph.
+
+      if Graph.Cache_Version = Cache_Version
+         and then (for all U of Units => Graph.Imports.Contains (Key (U)))
+      then
+         return;
+      end if;
+
+      --  Invalidate the graph while we update it, so that if a property error
+      --  aborts the update, the next query updates it again.
+
+      Graph.Cache_Version := -1;
+
+      while not Worklist.Is_Empty loop
+         declare
+            Unit : constant Internal_Unit := Worklist.Last_Element;
+         begin
+            Worklist.Delete_Last;
+            if not Visited.Contains (Key (Unit)) then
+               Visited.Insert (Key (Unit));
+
+               if Is_Up_To_Date (Graph, Unit, Cache_Version) then
+                  Graph.Stats.Edge_Walks_Saved :=
+                    Graph.Stats.Edge_Walks_Saved
+                    + Natural
+                        (Graph.Imports.Element (Key (Unit)).Imports.Length);
+               else
+                  Compute_Imports (Graph, Unit, Cache_Version);
+               end if;
+
+               for Imported of Graph.Imports.Element (Key (Unit)).Imports loop
+                  Worklist.Append (Internal_Unit (Imported));
+               end loop;
+            end if;
+         end;
+      end loop;
+
+      Graph.Cache_Version := Cache_Version;
+   end Update_Import_Graph;
+
    --------------------------------------
    -- Ada_Node_P_Filter_Is_Imported_By --
    --------------------------------------
@@ -194,19 +525,11 @@ package body Libadalang.Implementation.Extensions is
       Transitive : Boolean) return Internal_Unit_Array_Access
    is
 
-      package Analysis_Unit_Vectors is new Ada.Containers.Vectors
-        (Index_Type   => Positive,
-         Element_Type => Internal_Unit);
-
-      package Analysis_Unit_Maps is new Ada.Containers.Hashed_Maps
-        (Key_Type        => Internal_Unit,
-         Element_Type    => Boolean,
-         Hash            => Hash,
-         Equivalent_Keys => "=");
-
-      type CU_Array is array (Positive range <>) of Bare_Compilation_Unit;
+      use Import_Graph_Impl;
 
       Context : constant Internal_Context := Node.Unit.Context;
+      Graph   : Import_Graph_Type renames Context.Import_Graph;
+      Stats   : Import_Graph_Stats renames Graph.Stats;
 
       Ada_Text_IO_Symbol_Array : constant Internal_Symbol_Type_Array :=
         (1 => Lookup_Symbol (Context, "ada"),
@@ -239,14 +562,11 @@ package body Libadalang.Implementation.Extensions is
       --  defining Ada.Text_IO instead, which allows the correct behavior of
       --  this whole routine.
 
-      function All_Compilation_Units_From
-        (Root : Bare_Ada_Node) return CU_Array;
-      --  Given a node that is the root of an analysis unit, return all the
-      --  compilation units that are defined inside of it.
-
-      function Does_Import_Target (From : Internal_Unit) return Boolean;
-      --  Predicate that returns True iff the given unit imports the target.
-      --  If Transitive is True, handle transitive imports.
+      function Importers_Of
+        (Target : Internal_Unit) return Unit_Sets.Set;
+      --  Return the set of units that import ``Target`` (directly or
+      --  transitively depending on ``Transitive``), including ``Target``
+      --  itself.
 
       --------------------------
       -- Is_Special_Unit_Name --
@@ -295,101 +615,97 @@ package body Libadalang.Implementation.Extensions is
          return Target;
       end Actual_Target;
 
-      ---------------------------
-      -- All_Compilation_Units --
-      ---------------------------
+      ------------------
+      -- Importers_Of --
+      ------------------
 
-      function All_Compilation_Units_From
-        (Root : Bare_Ada_Node) return CU_Array is
+      function Importers_Of
+        (Target : Internal_Unit) return Unit_Sets.Set
+      is
+         Result   : Unit_Sets.Set;
+         Worklist : Analysis_Unit_Vectors.Vector;
       begin
-         if Root = null then
-            return (1 .. 0 => <>);
-         end if;
-
-         case Unit_Files.Root_Nodes (Root.Kind) is
-            when Ada_Compilation_Unit =>
-               return (1 => Bare_Compilation_Unit (Root));
-            when Ada_Compilation_Unit_List =>
-               declare
-                  List : constant Bare_Compilation_Unit_List :=
-                     Bare_Compilation_Unit_List (Root);
-
-                  Res : CU_Array (1 .. List.Count);
-               begin
-                  for I in 1 .. List.Count loop
-                     Res (I) := List.Nodes (I);
-                  end loop;
-                  return Res;
-               end;
-            when Ada_Pragma_Node_List =>
-               return (1 .. 0 => <>);
-         end case;
-      end All_Compilation_Units_From;
-
-      Target              : constant Internal_Unit := Actual_Target;
-      Units_Import_Target : Analysis_Unit_Maps.Map;
-
-      ------------------------
-      -- Does_Import_Target --
-      ------------------------
+         Result.Insert (Key (Target));
 
-      function Does_Import_Target (From : Internal_Unit) return Boolean is
-         Root_Node   : constant Bare_Ada_Node := Root (From);
-         Units       : constant CU_Array :=
-            All_Compilation_Units_From (Root_Node);
-
-         From_Cursor : constant Analysis_Unit_Maps.Cursor :=
-            Units_Import_Target.Find (From);
-      begin
-         if Analysis_Unit_Maps.Has_Element (From_Cursor) then
-            return Analysis_Unit_Maps.Element (From_Cursor);
-         elsif Root_Node = null then
-            return False;
+         if not Transitive then
+            if Graph.Importers.Contains (Key (Target)) then
+               Result.Union (Graph.Importers.Element (Key (Target)));
+            end if;
+            return Result;
          end if;
 
-         if From = Target then
-            Units_Import_Target.Insert (From, True);
-            return True;
-         end if;
+         --  Transitive closures are cached until the next graph change
 
-         Units_Import_Target.Insert (From, False);
+         declare
+            Cur : constant Unit_Set_Maps.Cursor :=
+              Graph.Closures.Find (Key (Target));
+         begin
+            if Unit_Set_Maps.Has_Element (Cur) then
+               Stats.Closures_Reused := Stats.Closures_Reused + 1;
+               return Unit_Set_Maps.Element (Cur);
+            end if;
+         end;
 
-         for Comp_Unit of Units loop
+         Worklist.Append (Target);
+         while not Worklist.Is_Empty loop
             declare
-               Units_Array : Internal_Entity_Compilation_Unit_Array_Access :=
-                  Compilation_Unit_P_Imported_Units (Comp_Unit);
+               Unit : constant Internal_Unit := Worklist.Last_Element;
             begin
-               for Imported_Unit of Units_Array.Items loop
-                  if Imported_Unit.Node /= null then
-                     declare
-                        Unit : constant Internal_Unit :=
-                           Imported_Unit.Node.Unit;
-                     begin
-                        if Unit = Target or else
-                             (Transitive and then Does_Import_Target (Unit))
-                        then
-                           Units_Import_Target.Replace (From, True);
-                           Dec_Ref (Units_Array);
-                           return True;
-                        end if;
-                     end;
-                  end if;
-               end loop;
-               Dec_Ref (Units_Array);
+               Worklist.Delete_Last;
+               if Graph.Importers.Contains (Key (Unit)) then
+                  for Importer of Graph.Importers.Element (Key (Unit)) loop
+                     if not Result.Contains (Importer) then
+                        Result.Insert (Importer);
+                        Worklist.Append (Internal_Unit (Importer));
+                     end if;
+                  end loop;
+               end if;
             end;
          end loop;
 
-         return False;
-      end Does_Import_Target;
+         Stats.Closures_Computed := Stats.Closures_Computed + 1;
+         Graph.Closures.Insert (Key (Target), Result);
+         return Result;
+      end Importers_Of;
 
+      Target        : constant Internal_Unit := Actual_Target;
       Result_Vector : Analysis_Unit_Vectors.Vector;
    begin
-      --  Place the units that satisfy the predicate into a temporary vector
-      for Unit of Units.Items loop
-         if Does_Import_Target (Unit) then
-            Result_Vector.Append (Unit);
-         end if;
-      end loop;
+      Stats.Queries := Stats.Queries + 1;
+
+      declare
+         Roots : Analysis_Unit_Vectors.Vector;
+      begin
+         for U of Units.Items loop
+            Roots.Append (U);
+         end loop;
+         Update_Import_Graph (Context, Roots);
+      end;
+
+      --  Place the units that satisfy the predicate into a temporary vector.
+      --  Units without a tree cannot import anything.
+
+      declare
+         Importers : constant Unit_Sets.Set := Importers_Of (Target);
+      begin
+         for Unit of Units.Items loop
+            if Root (Unit) /= null
+               and then Importers.Contains (Key (Unit))
+            then
+               Result_Vector.Append (Unit);
+            end if;
+         end loop;
+      end;
+
+      if Import_Graph_Trace.Is_Active then
+         Import_Graph_Trace.Trace
+           ("filter_is_imported_by #" & Natural'Image (Stats.Queries)
+            & ": edge walks:" & Natural'Image (Stats.Edge_Walks)
+            & ", saved:" & Natural'Image (Stats.Edge_Walks_Saved)
+            & ", closures computed:"
+            & Natural'Image (Stats.Closures_Computed)
+            & ", reused:" & Natural'Image (Stats.Closures_Reused));
+      end if;
 
       --  Create the result array from the vector
       declare
@@ -938,6 +1254,206 @@ package body Libadalang.Implementation.Extensions is
       end return;
    end Expr_P_Expected_Type_Var;
 
+   -------------------------
+   -- Evict_Nameres_Cache --
+   -------------------------
+
+   procedure Evict_Nameres_Cache (Unit : Internal_Unit) is
+      Cache : Nameres_Maps.Map renames Unit.Nodes_Nameres;
+      Stats : Nameres_Memo_Impl.Nameres_Memo_Stats renames
+        Unit.Context.Nameres_Memo_Stats;
+   begin
+      if Cache.Is_Empty then
+         return;
+      end if;
+
+      Stats.Evictions := Stats.Evictions + Long_Long_Integer (Cache.Length);
+      if Nameres_Memo_Trace.Is_Active then
+         Nameres_Memo_Trace.Trace
+           ("Evicting" & Ada.Containers.Count_Type'Image (Cache.Length)
+            & " resolutions for " & Get_Filename (Unit)
+            & " (hits:" & Long_Long_Integer'Image (Stats.Hits)
+            & ", misses:" & Long_Long_Integer'Image (Stats.Misses)
+            & ", evictions:" & Long_Long_Integer'Image (Stats.Evictions)
+            & ")");
+      end if;
+
+      for Cur in Cache.Iterate loop
+         declare
+            V : Resolution_Val renames Cache.Reference (Cur);
+         begin
+            Free_Memoized_Error (V.Exc_Id, V.Exc_Msg);
+            Dec_Ref (V.Return_Value);
+         end;
+      end loop;
+      Cache.Clear;
+   end Evict_Nameres_Cache;
+
+   --------------------
+   -- Deps_Are_Fresh --
+   --------------------
+
+   function Deps_Are_Fresh
+     (Deps : Import_Graph_Impl.Unit_Deps_Type) return Boolean
+   is
+      use Import_Graph_Impl;
+   begin
+      if not Deps.Is_Scoped then
+         return False;
+      end if;
+
+      for Cur in Deps.Units.Iterate loop
+         if Natural (Unit_Version_Maps.Key (Cur).Unit_Version)
+            /= Unit_Version_Maps.Element (Cur)
+         then
+            return False;
+         end if;
+      end loop;
+      return True;
+   end Deps_Are_Fresh;
+
+   ---------------------
+   -- Revalidate_Deps --
+   ---------------------
+
+   function Revalidate_Deps
+     (Unit : Internal_Unit;
+      Deps : in out Import_Graph_Impl.Unit_Deps_Type) return Boolean
+   is
+      Cache_Version : constant Integer := Integer (Unit.Context.Cache_Version);
+   begin
+      --  Units can be reparsed only when the context-wide cache version
+      --  changes: there is nothing to check if it did not change since the
+      --  last check. Otherwise, data is still valid as long as no unit in
+      --  ``Deps`` was reparsed.
+
+      if Deps.Cache_Version = Cache_Version then
+         return True;
+      elsif Deps_Are_Fresh (Deps) then
+         Deps.Cache_Version := Cache_Version;
+         return True;
+      else
+         return False;
+      end if;
+   end Revalidate_Deps;
+
+   -----------------------
+   -- Compute_Unit_Deps --
+   -----------------------
+
+   procedure Compute_Unit_Deps
+     (Unit : Internal_Unit; Deps : in out Import_Graph_Impl.Unit_Deps_Type)
+   is
+      use Import_Graph_Impl;
+
+      Context  : constant Internal_Context := Unit.Context;
+      Graph    : Import_Graph_Type renames Context.Import_Graph;
+      Worklist : Analysis_Unit_Vectors.Vector;
+   begin
+      --  Computing the import closure may trigger the resolution of names in
+      --  ``Unit``. Consider that dependencies are incomplete until we are
+      --  done, so that such resolutions are validated against the
+      --  context-wide cache version, and so that this procedure is not
+      --  called recursively.
+
+      Deps.Cache_Version := Integer (Context.Cache_Version);
+      Deps.Is_Scoped := False;
+      Deps.Units.Clear;
+
+      Worklist.Append (Unit);
+      Update_Import_Graph (Context, Worklist);
+
+      declare
+         Units       : Unit_Version_Maps.Map;
+         Has_Missing : Boolean := False;
+      begin
+         while not Worklist.Is_Empty loop
+            declare
+               U : constant Internal_Unit := Worklist.Last_Element;
+            begin
+               Worklist.Delete_Last;
+               if not Units.Contains (Key (U)) then
+                  Units.Insert (Key (U), Natural (U.Unit_Version));
+                  declare
+                     Imports : Unit_Imports renames
+                       Graph.Imports.Constant_Reference (Key (U));
+                  begin
+                     Has_Missing := Has_Missing or else Imports.Has_Missing;
+                     for Imported of Imports.Imports loop
+                        Worklist.Append (Internal_Unit (Imported));
+                     end loop;
+                  end;
+               end if;
+            end;
+         end loop;
+
+         Deps.Units := Units;
+         Deps.Is_Scoped := not Has_Missing;
+      end;
+
+   exception
+      when Exc : others =>
+         --  If the import closure cannot be computed, fall back to the
+         --  context-wide cache version.
+
+         if Properties_May_Raise (Exc) then
+            Deps.Units.Clear;
+            Deps.Is_Scoped := False;
+         else
+            raise;
+         end if;
+   end Compute_Unit_Deps;
+
+   ------------------------
+   -- Check_Nameres_Deps --
+   ------------------------
+
+   procedure Check_Nameres_Deps (Unit : Internal_Unit) is
+      Deps : Import_Graph_Impl.Unit_Deps_Type renames Unit.Nameres_Deps;
+   begin
+      --  As long as no unit in the import closure of ``Unit`` was reparsed,
+      --  memoized resolutions are still valid.
+
+      if Revalidate_Deps (Unit, Deps) then
+         return;
+      end if;
+
+      Evict_Nameres_Cache (Unit);
+      Compute_Unit_Deps (Unit, Deps);
+
+      if Nameres_Memo_Trace.Is_Active then
+         Nameres_Memo_Trace.Trace
+           ("Dependencies of " & Get_Filename (Unit) & ":"
+            & Ada.Containers.Count_Type'Image (Deps.Units.Length)
+            & " units"
+            & (if Deps.Is_Scoped then "" else " (incomplete)"));
+      end if;
+   end Check_Nameres_Deps;
+
+   -------------------------
+   -- Solve_Xref_Equation --
+   -------------------------
+
+   function Solve_Xref_Equation
+     (R : Solver.Relation; Node : Bare_Ada_Node) return Boolean
+   is
+      Context : constant Internal_Context := Node.Unit.Context;
+   begin
+      if Langkit_Support.Adalog.Debug.Debug then
+         Assign_Names_To_Logic_Vars (Node);
+      end if;
+
+      return Solver.Solve_First
+        (R, Timeout => Context.Logic_Resolution_Timeout);
+   exception
+      when Langkit_Support.Adalog.Early_Binding_Error =>
+         raise Property_Error with "invalid equation for logic resolution";
+      when Langkit_Support.Adalog.Timeout_Error =>
+         Context.Nameres_Memo_Stats.Timeouts :=
+           Context.Nameres_Memo_Stats.Timeouts + 1;
+         raise Property_Error with "logic resolution timed out";
+   end Solve_Xref_Equation;
+
    ----------------------------------
    -- Ada_Node_P_Resolve_Own_Names --
    ----------------------------------
@@ -955,8 +1471,16 @@ package body Libadalang.Implementation.Extensions is
       use Libadalang.Implementation.Solver;
 
       Cache : Nameres_Maps.Map renames Node.Unit.Nodes_Nameres;
-      C     : constant Cursor := Cache.Find (Node);
+      Stats : Nameres_Memo_Impl.Nameres_Memo_Stats renames
+        Node.Unit.Context.Nameres_Memo_Stats;
+      C     : Cursor;
    begin
+      Touch_Unit (Node.Unit);
+      if Node.Unit.Context.Nameres_Memo_Scoped then
+         Check_Nameres_Deps (Node.Unit);
+      end if;
+      C := Cache.Find (Node);
+
       --  If we already resolved this node with the same rebindings and if the
       --  cache is still fresh, return the memoized result.
 
@@ -964,12 +1488,14 @@ package body Libadalang.Implementation.Extensions is
          declare
             use type Ada.Exceptions.Exception_Id;
             Cached : Resolution_Val renames Cache.Reference (C);
+            Fresh  : constant Boolean := Is_Fresh (Node.Unit, Cached);
          begin
-            if Cached.Cache_Version >= Node.Unit.Context.Cache_Version
+            if Fresh
                and then Cached.Rebindings = E_Info.Rebindings
                and then (not Generate_Diagnostics
                          or else Cached.Has_Diagnostics)
             then
+               Stats.Hits := Stats.Hits + 1;
                if Cached.Exc_Id = Ada.Exceptions.Null_Id then
                   return Cached.Return_Value.Success;
                else
@@ -977,17 +1503,28 @@ package body Libadalang.Implementation.Extensions is
                end if;
             end if;
 
+            if not Fresh then
+               Stats.Evictions := Stats.Evictions + 1;
+            end if;
+
             --  This cache entry will be replaced in the next code section no
             --  matter what, so decrease reference count here while we still
             --  have a reference to the cached value.
             Dec_Ref (Cached.Return_Value);
          end;
       end if;
+      Stats.Misses := Stats.Misses + 1;
 
       --  Past this point, we know we cannot rely on the cache: perform the
-      --  resolution and memoize the result or the exception.
+      --  resolution and memoize the result or the exception. The memory
+      --  budget may evict data for other units before we start, but not
+      --  during the resolution.
+
+      Start_Unit_Computation (Node.Unit);
 
       declare
+         use type Ada.Calendar.Time;
+
          R : Relation;
          V : Resolution_Val :=
            (Cache_Version   => Node.Unit.Context.Cache_Version,
@@ -996,23 +1533,71 @@ package body Libadalang.Implementation.Extensions is
             Return_Value    => (False, null),
             Exc_Id          => Ada.Exceptions.Null_Id,
             Exc_Msg         => null);
+
+         Profiling : Nameres_Memo_Impl.Solver_Profiling_State renames
+           Node.Unit.Context.Solver_Profiling;
+         Profile   : constant Boolean := Profiling.Enabled;
+         --  Whether to measure the solving time for this equation. Keep the
+         --  value from the start of the solving so that saved and nested times
+         --  stay consistent even if profiling is toggled meanwhile.
+
+         Solve_Start : Ada.Calendar.Time;
+         Outer_Time  : Duration := 0.0;
+         Solving     : Boolean := False;
+
+         procedure Stop_Solver_Timer;
+         --  Account for the time spent solving ``R`` since ``Solve_Start``,
+         --  minus the time spent solving the equations of nested
+         --  resolutions.
+
+         -----------------------
+         -- Stop_Solver_Timer --
+         -----------------------
+
+         procedure Stop_Solver_Timer is
+            Elapsed : Duration;
+         begin
+            Solving := False;
+            if not Profile then
+               return;
+            end if;
+
+            Elapsed := Ada.Calendar.Clock - Solve_Start;
+            Stats.Solver_Time :=
+              Stats.Solver_Time + (Elapsed - Profiling.Nested_Time);
+            Profiling.Nested_Time := Outer_Time + Elapsed;
+         end Stop_Solver_Timer;
+
       begin
          R := Dispatcher_Ada_Node_P_Xref_Equation
            (Node, Env, Origin, Entry_Point, E_Info);
 
+         Stats.Equations := Stats.Equations + 1;
+         if Profile then
+            Outer_Time := Profiling.Nested_Time;
+            Profiling.Nested_Time := 0.0;
+            Solve_Start := Ada.Calendar.Clock;
+         end if;
+         Solving := True;
          if Generate_Diagnostics then
             V.Return_Value := Solve_With_Diagnostics (R, Node);
          else
-            V.Return_Value.Success := Solve_Wrapper (R, Node);
+            V.Return_Value.Success := Solve_Xref_Equation (R, Node);
             V.Return_Value.Diagnostics :=
               Create_Internal_Solver_Diagnostic_Array (0);
          end if;
+         Stop_Solver_Timer;
          Dec_Ref (R);
 
          Cache.Include (Node, V);
+         End_Unit_Computation (Node.Unit);
          return V.Return_Value.Success;
       exception
          when Exc : others =>
+            End_Unit_Computation (Node.Unit);
+            if Solving then
+               Stop_Solver_Timer;
+            end if;
             if Properties_May_Raise (Exc) then
                Dec_Ref (R);
                Store_Memoized_Error (Exc, V.Exc_Id, V.Exc_Msg);
@@ -1034,14 +1619,19 @@ package body Libadalang.Implementation.Extensions is
       use Nameres_Maps;
 
       Cache : Nameres_Maps.Map renames Node.Unit.Nodes_Nameres;
-      C     : constant Cursor := Cache.Find (Node);
+      C     : Cursor;
    begin
+      if Node.Unit.Context.Nameres_Memo_Scoped then
+         Check_Nameres_Deps (Node.Unit);
+      end if;
+      C := Cache.Find (Node);
+
       if Has_Element (C) then
          declare
             use type Ada.Exceptions.Exception_Id;
             Cached : Resolution_Val renames Cache.Reference (C);
          begin
-            if Cached.Cache_Version >= Node.Unit.Context.Cache_Version
+            if Is_Fresh (Node.Unit, Cached)
                and then Cached.Rebindings = E_Info.Rebindings
                and then Cached.Has_Diagnostics
             then
@@ -1058,57 +1648,768 @@ package body Libadalang.Implementation.Extensions is
       return Create_Internal_Solver_Diagnostic_Array (0);
    end Ada_Node_P_Own_Nameres_Diagnostics;
 
-   -------------------------------
-   -- Should_Collect_Env_Caches --
-   -------------------------------
+   -----------------------------
+   -- Build_Derivation_Index --
+   -----------------------------
 
-   function Should_Collect_Env_Caches
-     (Ctx                        : Internal_Context;
-      Unit                       : Internal_Unit;
-      All_Env_Caches_Entry_Count : Long_Long_Natural) return Boolean
-   is
-      Ctx_Stats  : Context_Env_Caches_Stats renames Ctx.Env_Caches_Stats;
-      Unit_Stats : Unit_Env_Caches_Stats renames Unit.Env_Caches_Stats;
-   begin
-      --  We only consider units which hold a minimal amount of cache
-      --  entries, to avoid wasting cycles collecting the same seldom-
-      --  used units which don't take much memory.
-      if Unit_Stats.Entry_Count < 100 then
-         return False;
-      end if;
+   procedure Build_Derivation_Index (Unit : Internal_Unit) is
+      package Edge_Vectors is new Ada.Containers.Vectors
+        (Index_Type   => Positive,
+         Element_Type => Internal_Derivation_Edge);
 
-      declare
-         Hit_Ratio : constant Float :=
-           (if Unit_Stats.Lookup_Count = 0 then 1.0
-            else Float (Unit_Stats.Hit_Count)
-                 / Float (Unit_Stats.Lookup_Count));
-         --  Ratio of cache hits over total cache lookups since this unit was
-         --  last collected.
+      package Edge_Vector_Maps is new Ada.Containers.Hashed_Maps
+        (Key_Type        => Bare_Ada_Node,
+         Element_Type    => Edge_Vectors.Vector,
+         Hash            => Hash,
+         Equivalent_Keys => "=",
+         "="             => Edge_Vectors."=");
 
-         Lookup_Ratio : constant Float :=
-           Float (Unit_Stats.Lookup_Count)
-           / Float (Ctx_Stats.Lookup_Count
-                    - Unit_Stats.Last_Overall_Lookup_Count);
-         --  Ratio of lookups done on this unit over total lookups done on any
-         --  unit since this unit was last collected.
+      Index     : Derivation_Index_Type renames Unit.Derivation_Index;
+      Root_Node : constant Bare_Ada_Node := Root (Unit);
+      Groups    : Edge_Vector_Maps.Map;
+      Edges     : Internal_Derivation_Edge_Array_Access;
 
-         Recent_Lookup_Ratio : constant Float :=
-           Float (Unit_Stats.Lookup_Count
-                  - Unit_Stats.Previous_Lookup_Count)
-           / Float (Ctx_Stats.Lookup_Count
-                    - Ctx_Stats.Previous_Lookup_Count);
-         --  Ratio of lookups done on this unit over total lookups done on any
-         --  unit since last time a collection was *attempted*.
+      procedure Add_Dep (Node : Bare_Ada_Node);
+      --  Make ``Node``'s unit a dependency of the index
 
-         Entry_Ratio : constant Float :=
-           Float (Unit_Stats.Entry_Count)
-           / Float (All_Env_Caches_Entry_Count);
-         --  Ratio of cache entries stored in this unit over total number of
-         --  cache entries spread across all units.
+      -------------
+      -- Add_Dep --
+      -------------
 
-         Usefulness_Score : constant Float :=
-           Lookup_Ratio * Hit_Ratio * (2.0 + 5.0 * Recent_Lookup_Ratio);
-         --  Score to estimate how useful the cache entries in this unit are:
+      procedure Add_Dep (Node : Bare_Ada_Node) is
+         U : constant Internal_Unit := Node.Unit;
+      begin
+         if not Index.Deps.Units.Contains (Key (U)) then
+            Index.Deps.Units.Insert (Key (U), Natural (U.Unit_Version));
+         end if;
+      end Add_Dep;
+
+   begin
+      Clear_Derivation_Index (Index);
+
+      --  Just like for reference indexes, compute the dependencies of the
+      --  index *before* computing the edges.
+
+      Compute_Unit_Deps (Unit, Index.Deps);
+
+      if Root_Node /= null then
+         Edges := Ada_Node_P_Derivation_Edges
+           (Node => Root_Node, E_Info => No_Entity_Info);
+
+         --  Group edges by canonical base type, preserving the tree traversal
+         --  order in each group.
+
+         for E of Edges.Items loop
+            if E.Base /= null then
+               declare
+                  use Edge_Vector_Maps;
+
+                  Base     : constant Bare_Ada_Node := E.Base;
+                  Cur      : Cursor := Groups.Find (Base);
+                  Inserted : Boolean;
+               begin
+                  if not Has_Element (Cur) then
+                     Groups.Insert
+                       (Base, Edge_Vectors.Empty_Vector, Cur, Inserted);
+                  end if;
+                  Groups.Reference (Cur).Append (E);
+               end;
+            end if;
+         end loop;
+         Dec_Ref (Edges);
+
+         for Cur in Groups.Iterate loop
+            declare
+               Base  : constant Bare_Ada_Node := Edge_Vector_Maps.Key (Cur);
+               Group : constant Edge_Vectors.Vector :=
+                 Edge_Vector_Maps.Element (Cur);
+               Items : constant Internal_Derivation_Edge_Array_Access :=
+                 Create_Internal_Derivation_Edge_Array
+                   (Natural (Group.Length));
+            begin
+               for I in Items.Items'Range loop
+                  Items.Items (I) := Group.Element (I);
+
+                  --  Canonical types can come from other units (completion
+                  --  of incomplete types): the index keeps references to
+                  --  them, so it is stale as soon as their unit is
+                  --  reparsed.
+
+                  if Items.Items (I).Derived_Canonical /= null then
+                     Add_Dep (Items.Items (I).Derived_Canonical);
+                  end if;
+               end loop;
+               Index.Edges.Insert (Base, Items);
+
+               --  Base types usually come from the import closure of
+               --  ``Unit``, but not always (generic instantiations, ...).
+
+               Add_Dep (Base);
+            end;
+         end loop;
+      end if;
+
+      Index.Is_Built := True;
+   end Build_Derivation_Index;
+
+   ----------------------------
+   -- Clear_Derivation_Index --
+   ----------------------------
+
+   procedure Clear_Derivation_Index (Index : in out Derivation_Index_Type) is
+   begin
+      for Edges of Index.Edges loop
+         Dec_Ref (Edges);
+      end loop;
+      Index.Edges.Clear;
+      Index.Is_Built := False;
+   end Clear_Derivation_Index;
+
+   --------------------------------------------
+   -- Base_Type_Decl_P_Indexed_Derived_Types --
+   --------------------------------------------
+
+   function Base_Type_Decl_P_Indexed_Derived_Types
+     (Node    : Bare_Base_Type_Decl;
+      Units   : Internal_Unit_Array_Access;
+      Exclude : Bare_Ada_Node) return Bare_Type_Decl_Array_Access
+   is
+      package Node_Sets is new Ada.Containers.Hashed_Sets
+        (Element_Type        => Bare_Ada_Node,
+         Hash                => Hash,
+         Equivalent_Elements => "=");
+
+      package Node_Vectors is new Ada.Containers.Vectors
+        (Index_Type   => Positive,
+         Element_Type => Bare_Ada_Node);
+
+      package Unit_Position_Maps is new Ada.Containers.Hashed_Maps
+        (Key_Type        => Internal_Unit,
+         Element_Type    => Positive,
+         Hash            => Hash,
+         Equivalent_Keys => "=");
+
+      Positions : Unit_Position_Maps.Map;
+      --  Position of each unit in ``Units``, to sort the result
+
+      Visited : Node_Sets.Set;
+      --  Canonical types for which derived types were looked up
+
+      Worklist : Node_Vectors.Vector;
+      --  Canonical types for which derived types must be looked up
+
+      Found_Set : Node_Sets.Set;
+      Found     : Node_Vectors.Vector;
+      --  Derived types found so far
+
+      function Before (Left, Right : Bare_Ada_Node) return Boolean
+      is (if Left.Unit = Right.Unit
+          then Left.Token_Start_Index < Right.Token_Start_Index
+          else Positions.Element (Left.Unit)
+               < Positions.Element (Right.Unit));
+
+      package Sorting is new Node_Vectors.Generic_Sorting (Before);
+
+      Budget : Memory_Budget_Impl.Context_Budget_State renames
+        Node.Unit.Context.Memory_Budget;
+
+   begin
+      --  Building the index of a unit may check the memory budget, which
+      --  must not reset units whose indexes we are about to look up: hold
+      --  it until we are done.
+
+      Budget.Busy := Budget.Busy + 1;
+      begin
+         --  Make sure the indexes of all units are up to date before looking
+         --  them up, as building indexes may trigger the loading of new units.
+
+         for U of Units.Items loop
+            if not Positions.Contains (U) then
+               Positions.Insert (U, Natural (Positions.Length) + 1);
+               declare
+                  Index : Derivation_Index_Type renames U.Derivation_Index;
+               begin
+                  Touch_Unit (U);
+                  if not Index.Is_Built
+                     or else not Revalidate_Deps (U, Index.Deps)
+                  then
+                     Start_Unit_Computation (U);
+                     begin
+                        Build_Derivation_Index (U);
+                     exception
+                        when others =>
+                           End_Unit_Computation (U);
+                           raise;
+                     end;
+                     End_Unit_Computation (U);
+                  end if;
+               end;
+            end if;
+         end loop;
+
+         --  A type derives from itself (and from its other views, which the
+         --  edges for ``Node`` include).
+
+         if Node /= Exclude
+            and then Node.Kind in Ada_Type_Decl
+            and then Positions.Contains (Node.Unit)
+         then
+            Found_Set.Insert (Node);
+            Found.Append (Node);
+         end if;
+
+         --  Compute the transitive closure of the derivation relation,
+         --  starting from ``Node``.
+
+         Visited.Insert (Node);
+         Worklist.Append (Node);
+         while not Worklist.Is_Empty loop
+            declare
+               Base : constant Bare_Ada_Node := Worklist.Last_Element;
+            begin
+               Worklist.Delete_Last;
+               for U of Units.Items loop
+                  declare
+                     use Derivation_Index_Maps;
+
+                     Cur : constant Cursor :=
+                       U.Derivation_Index.Edges.Find (Base);
+                  begin
+                     if Has_Element (Cur) then
+                        for E of Element (Cur).Items loop
+                           if E.Derived /= Exclude
+                              and then not Found_Set.Contains (E.Derived)
+                           then
+                              Found_Set.Insert (E.Derived);
+                              Found.Append (E.Derived);
+                           end if;
+
+                           if E.Derived_Canonical /= null
+                              and then not Visited.Contains
+                                             (E.Derived_Canonical)
+                           then
+                              Visited.Insert (E.Derived_Canonical);
+                              Worklist.Append (E.Derived_Canonical);
+                           end if;
+                        end loop;
+                     end if;
+                  end;
+               end loop;
+            end;
+         end loop;
+      exception
+         when others =>
+            Budget.Busy := Budget.Busy - 1;
+            raise;
+      end;
+      Budget.Busy := Budget.Busy - 1;
+
+      Sorting.Sort (Found);
+      return Result : constant Bare_Type_Decl_Array_Access :=
+        Create_Bare_Type_Decl_Array (Natural (Found.Length))
+      do
+         for I in Result.Items'Range loop
+            Result.Items (I) := Found.Element (I);
+         end loop;
+      end return;
+   end Base_Type_Decl_P_Indexed_Derived_Types;
+
+   ----------------------------------
+   -- Ada_Node_P_Ref_Index_Enabled --
+   ----------------------------------
+
+   function Ada_Node_P_Ref_Index_Enabled (Node : Bare_Ada_Node) return Boolean
+   is
+   begin
+      return Node.Unit.Context.Ref_Index_Enabled;
+   end Ada_Node_P_Ref_Index_Enabled;
+
+   ---------------------
+   -- Clear_Ref_Index --
+   ---------------------
+
+   procedure Clear_Ref_Index (Index : in out Ref_Index_Type) is
+   begin
+      for Refs of Index.Refs loop
+         Dec_Ref (Refs);
+      end loop;
+      Index.Refs.Clear;
+      Index.Is_Built := False;
+   end Clear_Ref_Index;
+
+   ---------------------
+   -- Build_Ref_Index --
+   ---------------------
+
+   procedure Build_Ref_Index
+     (Unit : Internal_Unit; Imprecise_Fallback : Boolean)
+   is
+      package Entry_Vector_Maps is new Ada.Containers.Hashed_Maps
+        (Key_Type        => Bare_Ada_Node,
+         Element_Type    => Ref_Entry_Vectors.Vector,
+         Hash            => Hash,
+         Equivalent_Keys => "=",
+         "="             => Ref_Entry_Vectors."=");
+
+      Index     : Ref_Index_Type renames Unit.Ref_Index (Imprecise_Fallback);
+      Root_Node : constant Bare_Ada_Node := Root (Unit);
+      Groups    : Entry_Vector_Maps.Map;
+      Entries   : Internal_Ref_Index_Entry_Array_Access;
+   begin
+      Clear_Ref_Index (Index);
+      Index.Build_Count := Index.Build_Count + 1;
+
+      --  Just like for the memoization of ``resolve_own_names``, compute the
+      --  dependencies of the index *before* computing the entries: if one of
+      --  them changes while we compute the entries, the next query will see
+      --  a stale index and rebuild it.
+
+      Compute_Unit_Deps (Unit, Index.Deps);
+
+      if Root_Node /= null then
+         Entries := Ada_Node_P_Ref_Index_Entries
+           (Node               => Root_Node,
+            Imprecise_Fallback => Imprecise_Fallback,
+            E_Info             => No_Entity_Info);
+
+         --  Group entries by canonical defining name, preserving the tree
+         --  traversal order in each group.
+
+         for E of Entries.Items loop
+            declare
+               use Entry_Vector_Maps;
+
+               Key      : constant Bare_Ada_Node := E.Def_Name;
+               Cur      : Cursor := Groups.Find (Key);
+               Inserted : Boolean;
+            begin
+               if not Has_Element (Cur) then
+                  Groups.Insert
+                    (Key, Ref_Entry_Vectors.Empty_Vector, Cur, Inserted);
+               end if;
+               Groups.Reference (Cur).Append (E);
+            end;
+         end loop;
+         Dec_Ref (Entries);
+
+         for Cur in Groups.Iterate loop
+            declare
+               Def_Name : constant Bare_Ada_Node :=
+                 Entry_Vector_Maps.Key (Cur);
+               Group    : constant Ref_Entry_Vectors.Vector :=
+                 Entry_Vector_Maps.Element (Cur);
+               Refs     : constant Internal_Ref_Index_Entry_Array_Access :=
+                 Create_Internal_Ref_Index_Entry_Array
+                   (Natural (Group.Length));
+            begin
+               for I in Refs.Items'Range loop
+                  Refs.Items (I) := Group.Element (I);
+               end loop;
+               Index.Refs.Insert (Def_Name, Refs);
+
+               --  Defining names usually come from the import closure of
+               --  ``Unit``, but not always (generic instantiations, ...):
+               --  since the index keeps references to them, it is stale as
+               --  soon as one of their units is reparsed.
+
+               declare
+                  U : constant Internal_Unit := Def_Name.Unit;
+               begin
+                  if not Index.Deps.Units.Contains (Key (U)) then
+                     Index.Deps.Units.Insert
+                       (Key (U), Natural (U.Unit_Version));
+                  end if;
+               end;
+            end;
+         end loop;
+      end if;
+
+      Index.Is_Built := True;
+   end Build_Ref_Index;
+
+   -----------------------------
+   -- Ada_Node_P_Indexed_Refs --
+   -----------------------------
+
+   function Ada_Node_P_Indexed_Refs
+     (Node               : Bare_Ada_Node;
+      Def_Names          : Bare_Defining_Name_Array_Access;
+      Imprecise_Fallback : Boolean)
+      return Internal_Ref_Index_Entry_Array_Access
+   is
+      use Ref_Index_Maps;
+
+      function Before (L, R : Internal_Ref_Index_Entry) return Boolean
+      is (L.Result.Ref.Node.Token_Start_Index
+          < R.Result.Ref.Node.Token_Start_Index);
+
+      package Sorting is new Ref_Entry_Vectors.Generic_Sorting (Before);
+
+      Unit  : constant Internal_Unit := Node.Unit;
+      Index : Ref_Index_Type renames Unit.Ref_Index (Imprecise_Fallback);
+
+      Count      : Natural := 0;
+      Last_Found : Internal_Ref_Index_Entry_Array_Access := null;
+      Found      : Natural := 0;
+   begin
+      Touch_Unit (Unit);
+      if not Index.Is_Built or else not Revalidate_Deps (Unit, Index.Deps)
+      then
+         Start_Unit_Computation (Unit);
+         begin
+            Build_Ref_Index (Unit, Imprecise_Fallback);
+         exception
+            when others =>
+               End_Unit_Computation (Unit);
+               raise;
+         end;
+         End_Unit_Computation (Unit);
+      end if;
+
+      for DN of Def_Names.Items loop
+         declare
+            Cur : constant Cursor := Index.Refs.Find (DN);
+         begin
+            if Has_Element (Cur) then
+               Last_Found := Element (Cur);
+               Count := Count + Last_Found.Items'Length;
+               Found := Found + 1;
+            end if;
+         end;
+      end loop;
+
+      --  Most of the time, only one of the requested defining names has
+      --  references in this unit: in that case, just share the array we have
+      --  in the index.
+
+      if Found = 0 then
+         return Create_Internal_Ref_Index_Entry_Array (0);
+      elsif Found = 1 then
+         Inc_Ref (Last_Found);
+         return Last_Found;
+      end if;
+
+      --  Otherwise, merge all the entries and restore the tree traversal
+      --  order. There can be a lot of them: use a vector rather than an
+      --  array on the stack.
+
+      declare
+         Entries : Ref_Entry_Vectors.Vector;
+         Result  : constant Internal_Ref_Index_Entry_Array_Access :=
+           Create_Internal_Ref_Index_Entry_Array (Count);
+      begin
+         Entries.Reserve_Capacity (Ada.Containers.Count_Type (Count));
+         for DN of Def_Names.Items loop
+            declare
+               Cur : constant Cursor := Index.Refs.Find (DN);
+            begin
+               if Has_Element (Cur) then
+                  for E of Element (Cur).Items loop
+                     Entries.Append (E);
+                  end loop;
+               end if;
+            end;
+         end loop;
+
+         Sorting.Sort (Entries);
+         for I in Result.Items'Range loop
+            Result.Items (I) := Entries.Element (I);
+         end loop;
+         return Result;
+      end;
+   end Ada_Node_P_Indexed_Refs;
+
+   ----------------
+   -- Touch_Unit --
+   ----------------
+
+   procedure Touch_Unit (Unit : Internal_Unit) is
+      State : Memory_Budget_Impl.Context_Budget_State renames
+        Unit.Context.Memory_Budget;
+   begin
+      State.Clock := State.Clock + 1;
+      Unit.Memory_Budget.Last_Use := State.Clock;
+   end Touch_Unit;
+
+   ----------------------------
+   -- Start_Unit_Computation --
+   ----------------------------
+
+   procedure Start_Unit_Computation (Unit : Internal_Unit) is
+      State : Memory_Budget_Impl.Context_Budget_State renames
+        Unit.Context.Memory_Budget;
+   begin
+      if Unit.Memory_Budget.Evicted then
+         Unit.Memory_Budget.Evicted := False;
+         State.Reloads := State.Reloads + 1;
+         if Memory_Budget_Trace.Is_Active then
+            Memory_Budget_Trace.Trace ("Reloading " & Trace_Image (Unit));
+         end if;
+      end if;
+
+      State.Misses_Since_Check := State.Misses_Since_Check + 1;
+      if State.Budget > 0
+         and then State.Busy = 0
+         and then State.Misses_Since_Check >= Memory_Budget_Impl.Check_Interval
+      then
+         Enforce_Memory_Budget
+           (Unit.Context, Exclude => Unit, Keep_Working_Set => True);
+      end if;
+
+      State.Busy := State.Busy + 1;
+   end Start_Unit_Computation;
+
+   --------------------------
+   -- End_Unit_Computation --
+   --------------------------
+
+   procedure End_Unit_Computation (Unit : Internal_Unit) is
+      State : Memory_Budget_Impl.Context_Budget_State renames
+        Unit.Context.Memory_Budget;
+   begin
+      State.Busy := State.Busy - 1;
+   end End_Unit_Computation;
+
+   ---------------------------
+   -- Estimated_Memory_Size --
+   ---------------------------
+
+   function Estimated_Memory_Size (Unit : Internal_Unit)
+                                   return Long_Long_Integer
+   is
+      Link_Size : constant :=
+        2 * Standard'Address_Size / Standard'Storage_Unit;
+      --  Size (in bytes) of the links that hashed maps allocate for each
+      --  node, in addition to the key and the element: pointer to the next
+      --  node in the same bucket, and bucket slot.
+
+      Resolution_Node_Size : constant Long_Long_Integer :=
+        Long_Long_Integer
+          ((Bare_Ada_Node'Size + Resolution_Val'Size) / Standard'Storage_Unit)
+        + Link_Size;
+      --  Size (in bytes) of a node in the ``resolve_own_names`` memoization
+      --  table
+
+      Index_Node_Size : constant Long_Long_Integer :=
+        Long_Long_Integer
+          ((Bare_Ada_Node'Size + Internal_Ref_Index_Entry_Array_Access'Size)
+           / Standard'Storage_Unit)
+        + Link_Size;
+      --  Size (in bytes) of a node in reference and derivation indexes (both
+      --  map nodes to array accesses).
+
+      Result : Long_Long_Integer := 0;
+   begin
+      --  Count the storage of map nodes, plus the arrays and strings that
+      --  their elements own. The objects that these arrays reference (nodes,
+      --  rebindings, ...) are owned by the unit and by the lexical envs, so
+      --  they are not counted.
+
+      for V of Unit.Nodes_Nameres loop
+         Result := Result + Resolution_Node_Size;
+         if V.Return_Value.Diagnostics /= null then
+            Result := Result
+              + Long_Long_Integer
+                  (V.Return_Value.Diagnostics.all'Size
+                   / Standard'Storage_Unit);
+         end if;
+         if V.Exc_Msg /= null then
+            Result := Result + Long_Long_Integer (V.Exc_Msg'Length);
+         end if;
+      end loop;
+
+      for Index of Unit.Ref_Index loop
+         for Refs of Index.Refs loop
+            Result := Result + Index_Node_Size
+              + Long_Long_Integer (Refs.all'Size / Standard'Storage_Unit);
+         end loop;
+      end loop;
+
+      for Edges of Unit.Derivation_Index.Edges loop
+         Result := Result + Index_Node_Size
+           + Long_Long_Integer (Edges.all'Size / Standard'Storage_Unit);
+      end loop;
+
+      return Result;
+   end Estimated_Memory_Size;
+
+   ---------------------------
+   -- Enforce_Memory_Budget --
+   ---------------------------
+
+   procedure Enforce_Memory_Budget
+     (Context          : Internal_Context;
+      Exclude          : Internal_Unit := null;
+      Keep_Working_Set : Boolean := False)
+   is
+      State : Memory_Budget_Impl.Context_Budget_State renames
+        Context.Memory_Budget;
+
+      function Less_Recently_Used (Left, Right : Internal_Unit)
+                                   return Boolean
+      is (Left.Memory_Budget.Last_Use < Right.Memory_Budget.Last_Use);
+
+      package Sorting is new Analysis_Unit_Vectors.Generic_Sorting
+        (Less_Recently_Used);
+
+      Collection : Env_Caches_Impl.Context_Collection_State renames
+        Context.Env_Caches_Collection;
+
+      Candidates : Analysis_Unit_Vectors.Vector;
+      Total_Size : Long_Long_Integer := 0;
+      Evicted    : Natural := 0;
+   begin
+      State.Misses_Since_Check := 0;
+
+      --  Compute the size of evictable data, and consider that units that
+      --  were reparsed since the last check are recently used: they are
+      --  likely being edited.
+
+      for Unit of Context.Units loop
+         declare
+            Unit_State : Memory_Budget_Impl.Unit_Budget_State renames
+              Unit.Memory_Budget;
+            Version    : constant Natural := Natural (Unit.Unit_Version);
+         begin
+            if Unit_State.Last_Version /= Version then
+               Unit_State.Last_Version := Version;
+               State.Clock := State.Clock + 1;
+               Unit_State.Last_Use := State.Clock;
+            end if;
+
+            Unit_State.Size := Estimated_Memory_Size (Unit);
+            Total_Size := Total_Size + Unit_State.Size;
+            if Unit_State.Size > 0
+               and then Unit /= Exclude
+               and then not (Keep_Working_Set
+                             and then Unit_State.Last_Use > State.Check_Clock)
+            then
+               Candidates.Append (Unit);
+            end if;
+         end;
+      end loop;
+      State.Check_Clock := State.Clock;
+
+      if State.Budget > 0 and then Total_Size > State.Budget then
+
+         --  Reset units from the least recently used: evict all the data
+         --  that Libadalang computed for them, and have Langkit collect their
+         --  lexical env caches at the next collection attempt.
+
+         Sorting.Sort (Candidates);
+         for Unit of Candidates loop
+            exit when Total_Size <= State.Budget;
+
+            Total_Size := Total_Size - Unit.Memory_Budget.Size;
+            Evict_Nameres_Cache (Unit);
+            for Index of Unit.Ref_Index loop
+               Clear_Ref_Index (Index);
+            end loop;
+            Clear_Derivation_Index (Unit.Derivation_Index);
+
+            if not Unit.Env_Caches_Collection.Reset_Requested then
+               Unit.Env_Caches_Collection.Reset_Requested := True;
+               Collection.Reset_Requests := Collection.Reset_Requests + 1;
+            end if;
+
+            Unit.Memory_Budget.Size := 0;
+            Unit.Memory_Budget.Evicted := True;
+            Evicted := Evicted + 1;
+         end loop;
+         State.Evictions := State.Evictions + Evicted;
+
+         if Memory_Budget_Trace.Is_Active then
+            Memory_Budget_Trace.Trace
+              ("Reset" & Evicted'Image & " units, size:"
+               & Total_Size'Image & " bytes, budget:"
+               & State.Budget'Image & " bytes");
+         end if;
+      end if;
+   end Enforce_Memory_Budget;
+
+   --------------------------------
+   -- Plan_Env_Caches_Collection --
+   --------------------------------
+
+   procedure Plan_Env_Caches_Collection
+     (Ctx                        : Internal_Context;
+      All_Env_Caches_Entry_Count : Long_Long_Natural)
+   is
+      use Env_Caches_Impl;
+
+      State     : Context_Collection_State renames Ctx.Env_Caches_Collection;
+      Policy    : Collection_Policy renames State.Policy;
+      Ctx_Stats : Context_Env_Caches_Stats renames Ctx.Env_Caches_Stats;
+
+      Entry_Count : constant Long_Long_Integer :=
+        Long_Long_Integer (All_Env_Caches_Entry_Count);
+
+      Budget_Entries : constant Long_Long_Integer :=
+        (if Policy.Memory_Budget = 0
+         then Long_Long_Integer'Last
+         else Policy.Memory_Budget / Estimated_Entry_Size);
+      --  Maximum number of env cache entries that fit in the memory budget
+
+      Collected_Entries : Long_Long_Integer := 0;
+      Collected_Units   : Natural := 0;
+      --  Number of env cache entries/units planned for collection
+
+      function Recent_Lookups (Unit : Internal_Unit) return Long_Long_Integer
+      is (Long_Long_Integer'Max
+            (0,
+             Long_Long_Integer (Unit.Env_Caches_Stats.Lookup_Count)
+             - Unit.Env_Caches_Collection.Previous_Lookup_Count));
+      --  Return the number of env cache lookups for ``Unit`` since the last
+      --  considered attempt.
+
+      function Is_Useless (Unit : Internal_Unit) return Boolean;
+      --  Decide whether the env caches of ``Unit`` should be collected
+      --  according to the ``Usefulness`` policy.
+
+      procedure Plan (Unit : Internal_Unit);
+      --  Plan the collection of env caches for ``Unit``
+
+      procedure Enforce_Budget;
+      --  Plan the collection of more env caches, least recently used first,
+      --  until the remaining entries fit in the memory budget.
+
+      ----------------
+      -- Is_Useless --
+      ----------------
+
+      function Is_Useless (Unit : Internal_Unit) return Boolean is
+         Unit_Stats : Unit_Env_Caches_Stats renames Unit.Env_Caches_Stats;
+
+         Hit_Ratio : constant Float :=
+           (if Unit_Stats.Lookup_Count = 0 then 1.0
+            else Float (Unit_Stats.Hit_Count)
+                 / Float (Unit_Stats.Lookup_Count));
+         --  Ratio of cache hits over total cache lookups since this unit was
+         --  last collected.
+
+         Lookup_Ratio : constant Float :=
+           Float (Unit_Stats.Lookup_Count)
+           / Float (Ctx_Stats.Lookup_Count
+                    - Unit_Stats.Last_Overall_Lookup_Count);
+         --  Ratio of lookups done on this unit over total lookups done on any
+         --  unit since this unit was last collected.
+
+         Recent_Lookup_Ratio : constant Float :=
+           Float (Recent_Lookups (Unit))
+           / Float (Long_Long_Integer (Ctx_Stats.Lookup_Count)
+                    - State.Previous_Lookup_Count);
+         --  Ratio of lookups done on this unit over total lookups done on any
+         --  unit since the last considered collection attempt.
+
+         Entry_Ratio : constant Float :=
+           Float (Unit_Stats.Entry_Count)
+           / Float (All_Env_Caches_Entry_Count);
+         --  Ratio of cache entries stored in this unit over total number of
+         --  cache entries spread across all units.
+
+         Usefulness_Score : constant Float :=
+           Lookup_Ratio * Hit_Ratio * (2.0 + 5.0 * Recent_Lookup_Ratio);
+         --  Score to estimate how useful the cache entries in this unit are:
          --  0 means that the cache entries are useless (we want to get rid of
          --  them), and a score greater than Entry_Ratio implies that we want
          --  to keep caches entries.
@@ -1133,14 +2434,8 @@ package body Libadalang.Implementation.Extensions is
          --  to store them.
       begin
          if Cache_Invalidation_Trace.Is_Active then
-            if Result then
-               Cache_Invalidation_Trace.Trace
-                 ("Collecting " & Trace_Image (Unit));
-            else
-               Cache_Invalidation_Trace.Trace
-                 ("Leaving alone " & Trace_Image (Unit));
-            end if;
-
+            Cache_Invalidation_Trace.Trace
+              ("Usefulness of " & Trace_Image (Unit) & ":");
             Cache_Invalidation_Trace.Increase_Indent;
             Cache_Invalidation_Trace.Trace
               ("Cache entries:" & Unit_Stats.Entry_Count'Image);
@@ -1166,7 +2461,177 @@ package body Libadalang.Implementation.Extensions is
             Cache_Invalidation_Trace.Decrease_Indent;
          end if;
          return Result;
-      end;
+      end Is_Useless;
+
+      ----------
+      -- Plan --
+      ----------
+
+      procedure Plan (Unit : Internal_Unit) is
+         Unit_State : Unit_Collection_State renames
+           Unit.Env_Caches_Collection;
+         Entries    : constant Long_Long_Integer :=
+           Long_Long_Integer (Unit.Env_Caches_Stats.Entry_Count);
+      begin
+         if Recent_Lookups (Unit) > 0 then
+            Unit_State.Last_Used_Attempt := State.Attempts;
+         end if;
+
+         --  We only consider units which hold a minimal amount of cache
+         --  entries, to avoid wasting cycles collecting the same seldom-used
+         --  units which don't take much memory.
+
+         Unit_State.Collect :=
+           Entries > 0
+           and then
+             (Unit_State.Reset_Requested
+              or else
+                (Entries >= Policy.Min_Entry_Count
+                 and then
+                   (case Policy.Kind is
+                    when Usefulness => Is_Useless (Unit),
+                    when LRU        =>
+                      State.Attempts - Unit_State.Last_Used_Attempt
+                      >= Policy.LRU_Max_Age,
+                    when Never      => False)));
+
+         if Unit_State.Collect then
+            Collected_Entries := Collected_Entries + Entries;
+            Collected_Units := Collected_Units + 1;
+         end if;
+      end Plan;
+
+      --------------------
+      -- Enforce_Budget --
+      --------------------
+
+      procedure Enforce_Budget is
+         function Less_Recently_Used (Left, Right : Internal_Unit)
+                                      return Boolean
+         is (Left.Env_Caches_Collection.Last_Used_Attempt
+             < Right.Env_Caches_Collection.Last_Used_Attempt
+             or else
+               (Left.Env_Caches_Collection.Last_Used_Attempt
+                = Right.Env_Caches_Collection.Last_Used_Attempt
+                and then Left.Env_Caches_Stats.Entry_Count
+                         > Right.Env_Caches_Stats.Entry_Count));
+         --  Sort units from the least recently used, and then from the
+         --  biggest env caches.
+
+         package Sorting is new Analysis_Unit_Vectors.Generic_Sorting
+           (Less_Recently_Used);
+
+         Candidates : Analysis_Unit_Vectors.Vector;
+      begin
+         for Unit of Ctx.Units loop
+            if not Unit.Env_Caches_Collection.Collect
+               and then Unit.Env_Caches_Stats.Entry_Count > 0
+            then
+               Candidates.Append (Unit);
+            end if;
+         end loop;
+         Sorting.Sort (Candidates);
+
+         for Unit of Candidates loop
+            exit when Entry_Count - Collected_Entries <= Budget_Entries;
+            Unit.Env_Caches_Collection.Collect := True;
+            Collected_Entries :=
+              Collected_Entries
+              + Long_Long_Integer (Unit.Env_Caches_Stats.Entry_Count);
+            Collected_Units := Collected_Units + 1;
+         end loop;
+      end Enforce_Budget;
+
+   begin
+      State.Attempt_Lookup_Count := Long_Long_Integer (Ctx_Stats.Lookup_Count);
+
+      --  Consider this attempt only if the threshold of the policy is reached,
+      --  if we are over the memory budget or if the memory budget of the
+      --  context reset units (see ``Enforce_Memory_Budget``).
+
+      State.Is_Active :=
+        Entry_Count >= State.Next_Threshold
+        or else Entry_Count > Budget_Entries
+        or else State.Reset_Requests > 0;
+      if not State.Is_Active then
+         if Cache_Invalidation_Trace.Is_Active then
+            Cache_Invalidation_Trace.Trace
+              ("Skipping collection attempt:" & Entry_Count'Image
+               & " entries, threshold:" & State.Next_Threshold'Image);
+         end if;
+         return;
+      end if;
+
+      State.Attempts := State.Attempts + 1;
+      for Unit of Ctx.Units loop
+         Plan (Unit);
+      end loop;
+      if Entry_Count - Collected_Entries > Budget_Entries then
+         Enforce_Budget;
+      end if;
+
+      --  Remember lookup counts so that the next attempt knows which units
+      --  were used recently.
+
+      for Unit of Ctx.Units loop
+         Unit.Env_Caches_Collection.Previous_Lookup_Count :=
+           Long_Long_Integer (Unit.Env_Caches_Stats.Lookup_Count);
+         Unit.Env_Caches_Collection.Reset_Requested := False;
+      end loop;
+      State.Reset_Requests := 0;
+      State.Previous_Lookup_Count :=
+        Long_Long_Integer (Ctx_Stats.Lookup_Count);
+      State.Next_Threshold :=
+        Entry_Count - Collected_Entries + Policy.Threshold_Increment;
+
+      if Cache_Invalidation_Trace.Is_Active then
+         Cache_Invalidation_Trace.Trace
+           ("Collection attempt" & State.Attempts'Image & " ("
+            & Policy.Kind'Image & " policy):" & Entry_Count'Image
+            & " entries, collecting" & Collected_Entries'Image
+            & " entries from" & Collected_Units'Image & " units");
+      end if;
+   end Plan_Env_Caches_Collection;
+
+   -------------------------------
+   -- Should_Collect_Env_Caches --
+   -------------------------------
+
+   function Should_Collect_Env_Caches
+     (Ctx                        : Internal_Context;
+      Unit                       : Internal_Unit;
+      All_Env_Caches_Entry_Count : Long_Long_Natural) return Boolean
+   is
+      State      : Env_Caches_Impl.Context_Collection_State renames
+        Ctx.Env_Caches_Collection;
+      Unit_State : Env_Caches_Impl.Unit_Collection_State renames
+        Unit.Env_Caches_Collection;
+   begin
+      --  Langkit calls this function for each unit during a collection
+      --  attempt: take decisions for all units on the first call, so that
+      --  policies can compare units with each other.
+
+      if State.Attempt_Lookup_Count
+         /= Long_Long_Integer (Ctx.Env_Caches_Stats.Lookup_Count)
+      then
+         Plan_Env_Caches_Collection (Ctx, All_Env_Caches_Entry_Count);
+      end if;
+
+      if not State.Is_Active or else not Unit_State.Collect then
+         return False;
+      end if;
+
+      if Cache_Invalidation_Trace.Is_Active then
+         Cache_Invalidation_Trace.Trace ("Collecting " & Trace_Image (Unit));
+      end if;
+
+      --  Collecting env caches resets the lookup count of the unit
+
+      Unit_State.Collect := False;
+      Unit_State.Previous_Lookup_Count := 0;
+      Unit_State.Collections := Unit_State.Collections + 1;
+      State.Collections := State.Collections + 1;
+      return True;
    end Should_Collect_Env_Caches;
 
 end Libadalang.Implementation.Extensions;
@@ -0,0 +1,36 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Common;         use Libadalang.Common;
+with Libadalang.Implementation; use Libadalang.Implementation;
+with Libadalang.Import_Graph_Impl;
+with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+
+package body Libadalang.Import_Graph is
+
+   -----------
+   -- Stats --
+   -----------
+
+   function Stats (Context : Analysis_Context) return Import_Graph_Stats is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+
+      declare
+         S : constant Import_Graph_Impl.Import_Graph_Stats :=
+           C.Import_Graph.Stats;
+      begin
+         return (Queries           => S.Queries,
+                 Edge_Walks        => S.Edge_Walks,
+                 Edge_Walks_Saved  => S.Edge_Walks_Saved,
+                 Closures_Computed => S.Closures_Computed,
+                 Closures_Reused   => S.Closures_Reused);
+      end;
+   end Stats;
+
+end Libadalang.Import_Graph;
@@ -0,0 +1,19 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Implementation;
+
+package body Libadalang.Import_Graph_Impl is
+
+   ----------
+   -- Hash --
+   ----------
+
+   function Hash (Unit : Internal_Unit) return Hash_Type is
+   begin
+      return Implementation.Hash (Implementation.Internal_Unit (Unit));
+   end Hash;
+
+end Libadalang.Import_Graph_Impl;
@@ -0,0 +1,103 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Common;         use Libadalang.Common;
+with Libadalang.Implementation; use Libadalang.Implementation;
+with Libadalang.Implementation.Extensions;
+use Libadalang.Implementation.Extensions;
+with Libadalang.Memory_Budget_Impl;
+with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+
+package body Libadalang.Memory_Budget is
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context;
+   --  Return the internal context for ``Context``. Raise a
+   --  ``Precondition_Failure`` exception if it is null.
+
+   ------------
+   -- Unwrap --
+   ------------
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+      return C;
+   end Unwrap;
+
+   -----------------------
+   -- Set_Memory_Budget --
+   -----------------------
+
+   procedure Set_Memory_Budget
+     (Context : Analysis_Context; Budget : Long_Long_Integer)
+   is
+      C : constant Internal_Context := Unwrap (Context);
+   begin
+      if Budget < 0 then
+         raise Precondition_Failure with "negative memory budget";
+      end if;
+
+      C.Memory_Budget.Budget := Budget;
+      Enforce (Context);
+   end Set_Memory_Budget;
+
+   -----------------------
+   -- Get_Memory_Budget --
+   -----------------------
+
+   function Get_Memory_Budget
+     (Context : Analysis_Context) return Long_Long_Integer is
+   begin
+      return Unwrap (Context).Memory_Budget.Budget;
+   end Get_Memory_Budget;
+
+   -------------
+   -- Enforce --
+   -------------
+
+   procedure Enforce (Context : Analysis_Context) is
+      C : constant Internal_Context := Unwrap (Context);
+   begin
+      --  Evicting data while a name resolution is in progress (for instance
+      --  from an event handler) is not safe: the budget will be enforced at
+      --  the next periodic check in that case.
+
+      if C.Memory_Budget.Busy = 0 then
+         Enforce_Memory_Budget (C);
+      end if;
+   end Enforce;
+
+   -----------
+   -- Stats --
+   -----------
+
+   function Stats (Context : Analysis_Context) return Memory_Stats is
+      C     : constant Internal_Context := Unwrap (Context);
+      S     : Memory_Budget_Impl.Context_Budget_State renames C.Memory_Budget;
+      Size  : Long_Long_Integer := 0;
+      Units : Natural := 0;
+   begin
+      for U of C.Units loop
+         declare
+            Unit_Size : constant Long_Long_Integer :=
+              Estimated_Memory_Size (U);
+         begin
+            if Unit_Size > 0 then
+               Size := Size + Unit_Size;
+               Units := Units + 1;
+            end if;
+         end;
+      end loop;
+
+      return (Estimated_Size => Size,
+              Units          => Units,
+              Evictions      => S.Evictions,
+              Reloads        => S.Reloads);
+   end Stats;
+
+end Libadalang.Memory_Budget;
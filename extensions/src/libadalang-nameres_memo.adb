@@ -0,0 +1,95 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Common;         use Libadalang.Common;
+with Libadalang.Implementation; use Libadalang.Implementation;
+with Libadalang.Nameres_Memo_Impl;
+with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+
+package body Libadalang.Nameres_Memo is
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context;
+   --  Return the internal context for ``Context``. Raise a
+   --  ``Precondition_Failure`` exception if it is null.
+
+   ------------
+   -- Unwrap --
+   ------------
+
+   function Unwrap (Context : Analysis_Context) return Internal_Context is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+      return C;
+   end Unwrap;
+
+   ---------------------------
+   -- Set_Dependency_Scoped --
+   ---------------------------
+
+   procedure Set_Dependency_Scoped
+     (Context : Analysis_Context; Enabled : Boolean) is
+   begin
+      Unwrap (Context).Nameres_Memo_Scoped := Enabled;
+   end Set_Dependency_Scoped;
+
+   --------------------------
+   -- Is_Dependency_Scoped --
+   --------------------------
+
+   function Is_Dependency_Scoped (Context : Analysis_Context) return Boolean
+   is
+   begin
+      return Unwrap (Context).Nameres_Memo_Scoped;
+   end Is_Dependency_Scoped;
+
+   --------------------------
+   -- Set_Solver_Profiling --
+   --------------------------
+
+   procedure Set_Solver_Profiling
+     (Context : Analysis_Context; Enabled : Boolean) is
+   begin
+      Unwrap (Context).Solver_Profiling :=
+        (Enabled => Enabled, Nested_Time => 0.0);
+   end Set_Solver_Profiling;
+
+   -------------------------
+   -- Is_Solver_Profiling --
+   -------------------------
+
+   function Is_Solver_Profiling (Context : Analysis_Context) return Boolean is
+   begin
+      return Unwrap (Context).Solver_Profiling.Enabled;
+   end Is_Solver_Profiling;
+
+   -----------
+   -- Stats --
+   -----------
+
+   function Stats (Context : Analysis_Context) return Memo_Stats is
+      S : constant Nameres_Memo_Impl.Nameres_Memo_Stats :=
+        Unwrap (Context).Nameres_Memo_Stats;
+   begin
+      return (Hits        => S.Hits,
+              Misses      => S.Misses,
+              Evictions   => S.Evictions,
+              Equations   => S.Equations,
+              Timeouts    => S.Timeouts,
+              Solver_Time => S.Solver_Time);
+   end Stats;
+
+   -----------------
+   -- Reset_Stats --
+   -----------------
+
+   procedure Reset_Stats (Context : Analysis_Context) is
+   begin
+      Unwrap (Context).Nameres_Memo_Stats := (others => <>);
+   end Reset_Stats;
+
+end Libadalang.Nameres_Memo;
@@ -0,0 +1,70 @@
+--
+--  Copyright (C) 2014-2022, AdaCore
+--  SPDX-License-Identifier: Apache-2.0
+--
+
+with Libadalang.Common;         use Libadalang.Common;
+with Libadalang.Implementation; use Libadalang.Implementation;
+with Libadalang.Implementation.Extensions;
+use Libadalang.Implementation.Extensions;
+with Libadalang.Public_Converters; use Libadalang.Public_Converters;
+
+package body Libadalang.Reference_Index is
+
+   -----------------
+   -- Set_Enabled --
+   -----------------
+
+   procedure Set_Enabled (Context : Analysis_Context; Enabled : Boolean) is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+
+      C.Ref_Index_Enabled := Enabled;
+
+      --  Indexes are useless once disabled: release them right away
+
+      if not Enabled then
+         for Unit of C.Units loop
+            for Index of Unit.Ref_Index loop
+               Clear_Ref_Index (Index);
+            end loop;
+         end loop;
+      end if;
+   end Set_Enabled;
+
+   ----------------
+   -- Is_Enabled --
+   ----------------
+
+   function Is_Enabled (Context : Analysis_Context) return Boolean is
+      C : constant Internal_Context := Unwrap_Context (Context);
+   begin
+      if C = null then
+         raise Precondition_Failure with "null context";
+      end if;
+
+      return C.Ref_Index_Enabled;
+   end Is_Enabled;
+
+   -----------------
+   -- Build_Count --
+   -----------------
+
+   function Build_Count (Unit : Analysis_Unit) return Natural is
+      U : constant Internal_Unit := Unwrap_Unit (Unit);
+   begin
+      if U = null then
+         raise Precondition_Failure with "null unit";
+      end if;
+
+      return Result : Natural := 0 do
+         for Index of U.Ref_Index loop
+            Result := Result + Index.Build_Count;
+         end loop;
+      end return;
+   end Build_Count;
+
+end Libadalang.Reference_Index;
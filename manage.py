@@ -98,9 +98,12 @@ class Manage(ManageScript):
             default_unparsing_config="default_unparsing_config.json",
 
             # Setup a configuration of the cache collection mechanism that
-            # works well for Ada.
+            # works well for Ada. Collections are attempted often, but the
+            # policy of each analysis context decides whether to consider
+            # attempts (see Libadalang.Env_Caches): keep threshold_increment in
+            # sync with Libadalang.Env_Caches_Impl.Attempt_Granularity.
             cache_collection_conf=CacheCollectionConf(
-                threshold_increment=100000,
+                threshold_increment=10000,
                 decision_heuristic=LibraryEntity(
                     "Libadalang.Implementation.Extensions",
                     "Should_Collect_Env_Caches"
@@ -108,8 +111,10 @@ class Manage(ManageScript):
             )
         )
 
-        # Internals need to access environment hooks, the symbolizer and
-        # internal configuration pragmas file tables.
+        # Internals need to access environment hooks, the symbolizer,
+        # internal configuration pragmas file tables, the import graph, the
+        # name resolution memoization counters, the env caches collection
+        # policy and the memory budget.
         ctx.add_with_clause('Implementation',
                             AdaSourceKind.body, 'Libadalang.Env_Hooks',
                             use_clause=True)
@@ -120,6 +125,22 @@ class Manage(ManageScript):
                             AdaSourceKind.spec,
                             'Libadalang.Config_Pragmas_Impl',
                             use_clause=True)
+        ctx.add_with_clause('Implementation',
+                            AdaSourceKind.spec,
+                            'Libadalang.Import_Graph_Impl',
+                            use_clause=False)
+        ctx.add_with_clause('Implementation',
+                            AdaSourceKind.spec,
+                            'Libadalang.Nameres_Memo_Impl',
+                            use_clause=False)
+        ctx.add_with_clause('Implementation',
+                            AdaSourceKind.spec,
+                            'Libadalang.Env_Caches_Impl',
+                            use_clause=False)
+        ctx.add_with_clause('Implementation',
+                            AdaSourceKind.spec,
+                            'Libadalang.Memory_Budget_Impl',
+                            use_clause=False)
 
         # Bind Libadalang's custom iterators to the public API
         ctx.add_with_clause('Iterators',
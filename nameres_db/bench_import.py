@@ -0,0 +1,126 @@
+"""
+Benchmark ``import_data.py`` on a synthetic data file.
+
+This generates a data file with the given number of ``node_resolution``
+records (spread over files of 1000 nodes, with 10% of failures), imports it
+twice in a temporary database (the second import goes to the same run, so it
+exercises the lookup of existing nodes), and reports the time and the peak
+memory used by each import.
+"""
+
+from __future__ import absolute_import, division, print_function
+
+import argparse as A
+import json
+import os
+from os import path as P
+import resource
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+parser = A.ArgumentParser(description=__doc__)
+parser.add_argument(
+    '--records', '-n',
+    help='Number of records to generate (default: 1000000)',
+    type=int,
+    default=1000000
+)
+parser.add_argument(
+    '--batch-size',
+    help='Value for the --batch-size option of the importer',
+    type=int
+)
+parser.add_argument(
+    '--commit-every',
+    help='Value for the --commit-every option of the importer',
+    type=int
+)
+parser.add_argument(
+    '--keep',
+    help='Do not remove the temporary directory for the data file and the'
+         ' database',
+    action='store_true'
+)
+
+
+def generate(filename, count):
+    """
+    Write ``count`` records to ``filename``.
+    """
+    with open(filename, 'w') as f:
+        for i in range(count):
+            rec = {
+                'kind': 'node_resolution',
+                'file': 'src/file_{}.adb'.format(i // 1000),
+                'sloc': '{}:4-{}:20'.format(i % 1000 + 1, i % 1000 + 1),
+            }
+            if i % 10:
+                rec['success'] = True
+            else:
+                rec['success'] = False
+                rec['exception_message'] = 'error {}'.format(i % 7)
+                rec['exception_traceback'] = 'traceback {}'.format(i % 3)
+            f.write(json.dumps(rec))
+            f.write('\n')
+
+
+def run_import(args, data_file, db_file, run_id):
+    """
+    Import ``data_file`` into ``db_file`` and return the elapsed time.
+    """
+    argv = [sys.executable, P.join(P.dirname(__file__), 'import_data.py'),
+            data_file, 'bench', '--db-file', db_file]
+    if run_id is not None:
+        argv += ['--run-id', str(run_id)]
+    if args.batch_size:
+        argv += ['--batch-size', str(args.batch_size)]
+    if args.commit_every:
+        argv += ['--commit-every', str(args.commit_every)]
+
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        subprocess.check_call(argv, stdout=devnull)
+    return time.time() - start
+
+
+def main():
+    args = parser.parse_args()
+    tmp_dir = tempfile.mkdtemp(prefix='bench-nameres-db-')
+    try:
+        data_file = P.join(tmp_dir, 'data.json')
+        db_file = P.join(tmp_dir, 'nameres.db')
+
+        print('Generating {} records...'.format(args.records))
+        generate(data_file, args.records)
+
+        for label, run_id in [('new nodes', None), ('existing nodes', 1)]:
+            elapsed = run_import(args, data_file, db_file, run_id)
+
+            # ru_maxrss is the peak for all the children so far (in kB on
+            # Linux), which is the peak of the biggest import.
+            max_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            print('Import ({}): {:.2f}s ({:.0f} records/s), peak RSS so far:'
+                  ' {:.1f}MB'.format(label, elapsed, args.records / elapsed,
+                                     max_rss / 1024))
+
+        with sqlite3.connect(db_file) as conn:
+            nodes, resolutions = conn.execute(
+                'select (select count(*) from Node),'
+                ' (select count(*) from NodeResolution)'
+            ).fetchone()
+        print('Database: {} nodes, {} node resolutions'.format(
+            nodes, resolutions
+        ))
+    finally:
+        if args.keep:
+            print('Temporary files kept in {}'.format(tmp_dir))
+        else:
+            shutil.rmtree(tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
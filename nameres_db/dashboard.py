@@ -15,12 +15,11 @@ mako = MakoTemplates(app)
 @app.route("/")
 @P.db_session
 def index():
-    projects = P.select(p for p in S.Project)
-    print(list(projects))
     return render_template(
         "index.mako",
         projects=list(P.select(p for p in S.Project)),
         stats=S.stats(),
+        failures_by_exception=S.failures_by_exception(),
         S=S, F=F, json=json
     )
 
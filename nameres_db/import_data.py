@@ -1,17 +1,28 @@
 """
+Import the JSON data dumped by Libadalang's ``nameres`` executable (``--json``
+switch) into the nameres database.
+
+The data file is processed one line at a time and rows are inserted in
+batches, so that the memory used does not depend on the size of the data
+file. Node ids are resolved with an in-memory map for the files that were
+processed last, so this script assumes that nothing else writes to the
+database during the import.
 """
 
 from __future__ import absolute_import, division, print_function
 
 import argparse as A
+from collections import OrderedDict
 from datetime import date
-from funcy import memoize
 import json
 from os import path as P
+import re
+import time
+
 from pony.orm import db_session
 import schema as S
 
-parser = A.ArgumentParser()
+parser = A.ArgumentParser(description=__doc__)
 parser.add_argument(
     'data_file',
     help='File containing the JSON data to populate the database',
@@ -29,29 +40,215 @@ parser.add_argument(
     type=int,
     default=-1
 )
+parser.add_argument(
+    '--db-file',
+    help='SQLite database file to populate (nameres.db in this directory by'
+         ' default)',
+    type=str
+)
+parser.add_argument(
+    '--reuse-run',
+    help='Id of a previous run from which to copy node resolutions for the'
+         ' files of the project that are not in the data file, so that'
+         ' nameres can be run on changed files only',
+    type=int
+)
+parser.add_argument(
+    '--batch-size',
+    help='Number of rows to insert with each statement (default: 10000)',
+    type=int,
+    default=10000
+)
+parser.add_argument(
+    '--commit-every',
+    help='Number of records after which to commit the current transaction'
+         ' (default: 500000)',
+    type=int,
+    default=500000
+)
 
 
-class Obj(object):
-    def __init__(self, d):
-        self.__dict__ = d
+def parse_sloc(strn):
+    return [int(n) for n in re.split(r"\-|:", strn)]
 
 
-def parse_sloc(strn):
-    import re
-    return re.split(r"\-|:", strn)
+class Importer(object):
+    """
+    Insert node resolution records in the database in batches.
+    """
 
+    max_cached_files = 64
+    """
+    Number of files for which to keep node ids in memory. As nameres outputs
+    all records for a file in a row, a small number is enough.
+    """
 
-@memoize
-def create_or_get_file(db_project, path):
-    print("Processing file {}".format(path))
-    f, _ = S.File.get_or_create(full_path=P.abspath(path), project=db_project)
-    S.db.commit()
-    return f
+    def __init__(self, connection, project_id, run_id, batch_size):
+        self.connection = connection
+        self.cursor = connection.cursor()
+        self.project_id = project_id
+        self.run_id = run_id
+        self.batch_size = batch_size
+
+        self.file_ids = {}
+        """
+        Mapping from file paths to file ids.
+        """
+
+        self.node_ids = OrderedDict()
+        """
+        Mapping from file ids to the mapping from slocs to node ids for the
+        nodes in this file, for the files that were processed last (least
+        recently processed first).
+        """
+
+        self.next_node_id = self.cursor.execute(
+            "select coalesce(max(id), 0) + 1 from Node"
+        ).fetchone()[0]
+
+        self.pending_nodes = []
+        self.pending_node_files = set()
+        self.pending_resolutions = []
+
+    def file_id(self, path):
+        """
+        Return the id for the file at ``path``, creating it if needed.
+        """
+        try:
+            return self.file_ids[path]
+        except KeyError:
+            pass
+
+        full_path = P.abspath(path)
+        print("Processing file {}".format(path))
+        row = self.cursor.execute(
+            "select id from File where full_path = ?", [full_path]
+        ).fetchone()
+        if row:
+            result = row[0]
+        else:
+            self.cursor.execute(
+                "insert into File (full_path, project) values (?, ?)",
+                [full_path, self.project_id]
+            )
+            result = self.cursor.lastrowid
+        self.file_ids[path] = result
+        return result
+
+    def nodes_for_file(self, file_id):
+        """
+        Return the mapping from slocs to node ids for the given file.
+        """
+        try:
+            result = self.node_ids.pop(file_id)
+        except KeyError:
+            # Make sure nodes created for this file before its mapping was
+            # evicted are in the database before loading the mapping.
+            if file_id in self.pending_node_files:
+                self.flush()
+
+            result = {
+                tuple(row[1:]): row[0]
+                for row in self.cursor.execute("""
+                    select id, start_line, start_column, end_line, end_column
+                    from Node
+                    where file = ?
+                """, [file_id])
+            }
+            if len(self.node_ids) >= self.max_cached_files:
+                self.node_ids.popitem(last=False)
+
+        self.node_ids[file_id] = result
+        return result
+
+    def add(self, rec):
+        """
+        Add the given ``node_resolution`` record.
+        """
+        file_id = self.file_id(rec['file'])
+        nodes = self.nodes_for_file(file_id)
+        sloc = tuple(parse_sloc(rec['sloc']))
+
+        node_id = nodes.get(sloc)
+        if node_id is None:
+            node_id = self.next_node_id
+            self.next_node_id += 1
+            nodes[sloc] = node_id
+            self.pending_nodes.append((node_id, file_id) + sloc)
+            self.pending_node_files.add(file_id)
+
+        self.pending_resolutions.append((
+            node_id, self.run_id, rec['success'],
+            rec.get('exception_message', ''),
+            rec.get('exception_traceback', '')
+        ))
+        if len(self.pending_resolutions) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Insert all pending rows in the database.
+        """
+        # Pony runs SQLite connections in autocommit mode outside of its own
+        # transactions: start one explicitly, as committing each row is very
+        # slow.
+        if not self.connection.in_transaction:
+            self.cursor.execute("begin")
+
+        self.cursor.executemany("""
+            insert into Node (id, file, start_line, start_column,
+                              end_line, end_column)
+            values (?, ?, ?, ?, ?, ?)
+        """, self.pending_nodes)
+        self.cursor.executemany("""
+            insert or ignore into NodeResolution
+              (node, run_id, success, exception_message, traceback)
+            values (?, ?, ?, ?, ?)
+        """, self.pending_resolutions)
+        self.pending_nodes = []
+        self.pending_node_files = set()
+        self.pending_resolutions = []
+
+    def reuse_run(self, run_id):
+        """
+        Copy node resolutions from the given run for the files of the project
+        that were not imported. Return the number of copied node
+        resolutions.
+        """
+        self.flush()
+        self.cursor.execute(
+            "create temp table ImportedFile (id integer primary key)"
+        )
+        self.cursor.executemany(
+            "insert into ImportedFile (id) values (?)",
+            [(file_id, ) for file_id in self.file_ids.values()]
+        )
+        self.cursor.execute("""
+            insert or ignore into NodeResolution
+              (node, run_id, success, exception_message, traceback)
+            select nr.node, ?, nr.success, nr.exception_message, nr.traceback
+            from NodeResolution nr
+                 join Node n on n.id = nr.node
+                 join File f on f.id = n.file
+            where nr.run_id = ?
+                  and f.project = ?
+                  and f.id not in (select id from ImportedFile)
+        """, [self.run_id, run_id, self.project_id])
+        result = self.cursor.rowcount
+        self.cursor.execute("drop table ImportedFile")
+        return result
+
+    def commit(self):
+        """
+        Insert all pending rows in the database and commit the current
+        transaction.
+        """
+        self.flush()
+        self.connection.commit()
 
 
 @db_session()
-def main():
-    args = parser.parse_args()
+def main(args):
     db_project, _ = S.Project.get_or_create(name=args.project)
 
     print('Run id = ', args.run_id)
@@ -62,41 +259,45 @@ def main():
     S.db.commit()
     print(run_id, run_id.id)
 
+    importer = Importer(
+        S.db.get_connection(), db_project.id, run_id.id, args.batch_size
+    )
+    start = time.time()
+    count = 0
     with open(args.data_file) as f:
-        for line in f.readlines():
-            o = json.loads(line)
-            rec = Obj(o)
-            if rec.kind == 'node_resolution':
-                db_file = create_or_get_file(db_project, rec.file)
-                cur = S.db.get_connection().cursor()
-                bindings = [db_file.id] + parse_sloc(rec.sloc)
-                cur.execute("""
-                    insert or ignore
-                    into Node (file, start_line, start_column,
-                               end_line, end_column)
-                    values (?, ?, ?, ?, ?)
-                """, bindings)
-
-                node_id = cur.execute("""
-                    select id from Node
-                    where file=?
-                    and start_line=? and start_column=?
-                    and end_line=? and end_column=?
-                """, bindings).fetchone()[0]
-
-                cur.execute("""
-                insert or ignore into NodeResolution
-                  (node, run_id, success, exception_message, traceback)
-                values (?, ?, ?, ?, ?)
-                """, [node_id, run_id.id, rec.success,
-                      getattr(rec, 'exception_message', ''),
-                      getattr(rec, 'exception_traceback', '')])
+        for line in f:
+            rec = json.loads(line)
+            if rec['kind'] != 'node_resolution':
+                continue
+
+            importer.add(rec)
+            count += 1
+            if count % args.commit_every == 0:
+                importer.commit()
+                print("{} records imported ({:.0f} records/s)".format(
+                    count, count / (time.time() - start)
+                ))
+
+    if args.reuse_run is not None:
+        print("{} node resolutions reused from run {}".format(
+            importer.reuse_run(args.reuse_run), args.reuse_run
+        ))
 
     print("Committing...")
-    S.db.commit()
+    importer.commit()
+
+    print("Updating the summary of node resolutions...")
+    S.refresh_summary(run_id.id, db_project.id)
+
+    print("{} records imported in {:.2f}s".format(count, time.time() - start))
     if args.run_id == -1:
         print("Run id={}".format(run_id.id))
 
+
 if __name__ == '__main__':
-    S.init_db()
-    main()
+    args = parser.parse_args()
+    S.init_db(
+        P.abspath(args.db_file) if args.db_file else 'nameres.db',
+        for_bulk_import=True
+    )
+    main(args)
@@ -1,7 +1,6 @@
 from __future__ import absolute_import, division, print_function
 
 from datetime import date
-from funcy import memoize
 import pony.orm as P
 import re
 
@@ -33,14 +32,10 @@ def insert_or_ignore(entity, **args):
 class Project(db.Entity):
     name = P.Required(str, unique=True)
     files = P.Set('File')
+    summaries = P.Set('RunSummary')
 
-    @memoize
-    def stats(self):
-        print("In stats")
-        ret = stats(self)
-        print("LOL")
-        print("Ret = ", ret)
-        return ret
+    def stats(self, run_id=None):
+        return stats(self, run_id)
 
     @property
     def nb_failures(self):
@@ -60,6 +55,7 @@ class File(db.Entity):
 class RunId(db.Entity):
     date = P.Required(date)
     resolutions = P.Set('NodeResolution')
+    summaries = P.Set('RunSummary')
 
 
 class Node(db.Entity):
@@ -86,61 +82,159 @@ class NodeResolution(db.Entity):
     exception_message = P.Optional(str)
     traceback = P.Optional(str)
     P.composite_key(node, run_id)
+    P.composite_index(run_id, success)
 
 
-def init_db():
-    db.bind(provider='sqlite', filename='nameres.db', create_db=True)
+class RunSummary(db.Entity):
+    """
+    Number of node resolutions for each run, project and outcome.
+
+    This is computed from NodeResolution at import time (see
+    ``refresh_summary``), so that the dashboard does not need to go through
+    all node resolutions.
+    """
+    run_id = P.Required(RunId)
+    project = P.Required(Project)
+    success = P.Required(bool)
+    exception_message = P.Optional(str)
+    traceback = P.Optional(str)
+    count = P.Required(int)
+    P.composite_key(run_id, project, success, exception_message, traceback)
+
+
+bulk_import = False
+"""
+Whether the database is opened to import data. If so, trade durability for
+speed: if the import is interrupted, it has to be restarted anyway.
+"""
+
+
+@db.on_connect(provider='sqlite')
+def sqlite_pragmas(db, connection):
+    cursor = connection.cursor()
+    # Write-ahead logging lets the dashboard read the database while data is
+    # being imported, and makes bulk imports faster.
+    cursor.execute('pragma journal_mode = wal')
+    if bulk_import:
+        cursor.execute('pragma synchronous = off')
+
+
+def init_db(filename='nameres.db', for_bulk_import=False):
+    global bulk_import
+    bulk_import = for_bulk_import
+    db.bind(provider='sqlite', filename=filename, create_db=True)
     db.generate_mapping(create_tables=True)
 
+    # Databases created before the introduction of RunSummary have node
+    # resolutions but no summary: compute it once and for all.
+    with P.db_session:
+        cur = db.get_connection().cursor()
+        needs_summary = cur.execute("""
+            select exists (select 1 from NodeResolution)
+                   and not exists (select 1 from RunSummary)
+        """).fetchone()[0]
+    if needs_summary:
+        print("Computing the summary of node resolutions...")
+        refresh_summary()
+
+
+def refresh_summary(run_id=None, project_id=None):
+    """
+    Recompute the RunSummary rows for the given run and project (for all
+    runs/projects if they are None) from NodeResolution, and commit.
+    """
+    conditions = []
+    args = []
+    if run_id is not None:
+        conditions.append('run_id = ?')
+        args.append(run_id)
+    if project_id is not None:
+        conditions.append('project = ?')
+        args.append(project_id)
+    where = 'where {}'.format(' and '.join(conditions)) if conditions else ''
+
+    with P.db_session:
+        connection = db.get_connection()
+        cur = connection.cursor()
+        if not connection.in_transaction:
+            cur.execute('begin')
+        cur.execute('delete from RunSummary {}'.format(where), args)
+        cur.execute("""
+            insert into RunSummary (run_id, project, success,
+                                    exception_message, traceback, count)
+            select run_id, project, success, exception_message, traceback,
+                   count(*)
+            from (
+                select nr.run_id as run_id,
+                       f.project as project,
+                       nr.success as success,
+                       coalesce(nr.exception_message, '')
+                         as exception_message,
+                       coalesce(nr.traceback, '') as traceback
+                from NodeResolution nr
+                     join Node n on n.id = nr.node
+                     join File f on f.id = n.file
+            )
+            {}
+            group by run_id, project, success, exception_message, traceback
+        """.format(where), args)
+        connection.commit()
+
+
+def last_run_id():
+    return P.max(r.id for r in RunId)
+
 
 def stats(project=None, run_id=None):
     if not run_id:
-        run_id = P.max(r.id for r in RunId)
-
-    fail = P.select(n for n in NodeResolution
-                    if not n.success and n.run_id.id == run_id)
-    success = P.select(n for n in NodeResolution
-                       if n.success and n.run_id.id == run_id)
-
+        run_id = last_run_id()
+
+    query = """
+        select success, sum(count)
+        from RunSummary
+        where run_id = ?
+    """
+    args = [run_id]
     if project:
-        fail = fail.filter(lambda n: n.node.file.project == project)
-        success = success.filter(lambda n: n.node.file.project == project)
+        query += " and project = ?"
+        args.append(project.id)
+    query += " group by success"
 
-    nb_failures, nb_successes = P.count(fail), P.count(success),
+    cur = db.get_connection().cursor()
+    counts = dict(cur.execute(query, args).fetchall())
+    nb_failures = counts.get(0, 0)
+    nb_successes = counts.get(1, 0)
     nb_total = nb_failures + nb_successes
 
     return {
         'nb_failures': nb_failures,
         'nb_successes': nb_successes,
-        'failures_pct': nb_failures / float(nb_total) * 100,
-        'successes_pct': nb_successes / float(nb_total) * 100
+        'failures_pct': nb_failures / float(nb_total or 1) * 100,
+        'successes_pct': nb_successes / float(nb_total or 1) * 100
     }
 
 
 def failures_by_exception(run_id=None):
     if not run_id:
-        run_id = P.max(r.id for r in RunId)
+        run_id = last_run_id()
     cur = db.get_connection().cursor()
     return cur.execute("""
-        select exception_message, count(*)
-        from NodeResolution
+        select exception_message, sum(count)
+        from RunSummary
         where success = 0
               and run_id = ?
-        group by exception_message order by count(*) desc
+        group by exception_message order by sum(count) desc
     """, [run_id]).fetchall()
 
 
 def failures_by_traceback(run_id=None):
     if not run_id:
-        run_id = P.max(r for r in RunId)
+        run_id = last_run_id()
     cur = db.get_connection().cursor()
-    return P.select(n for n in NodeResolution
-                    if not n.success
-                    and run_id == run_id)
     return cur.execute("""
-        select traceback, exception_message, count(*)
-        from NodeResolution
+        select traceback, exception_message, sum(count)
+        from RunSummary
         where success = 0
               and run_id = ?
-        group by traceback order by count(*) desc
+        group by traceback, exception_message order by sum(count) desc
     """, [run_id]).fetchall()
@@ -98,16 +98,15 @@
               <div class="col">
                   <div class="card">
                       <div class="card-body">
-                        <h5 class="card-title"> Node resolutions for all projects </h5>
-                        <% 
-                            fbt = S.failures_by_traceback()
+                        <h5 class="card-title"> Failures by exception for all projects </h5>
+                        <%
+                            top = failures_by_exception[:10]
                             data = [
-                                [range(len(fbt))],
-                                []
+                                [msg[:80] for msg, _ in top],
+                                [count for _, count in top]
                             ]
                         %>
-                        ${donut("Failures by traceback", "failures-bytb", data)}
-                        <canvas id="all-projects-donut"></canvas>
+                        ${donut("Failures by exception", "failures-byexc", data)}
                       </div>
                   </div>
               </div>
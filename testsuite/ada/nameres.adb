@@ -8,6 +8,8 @@ with Ada.Strings.Wide_Wide_Unbounded; use Ada.Strings.Wide_Wide_Unbounded;
 with Ada.Text_IO;
 with Ada.Unchecked_Deallocation;
 
+with System;
+
 with GNAT.Traceback.Symbolic;
 
 with GNATCOLL.JSON;
@@ -20,12 +22,17 @@ with Langkit_Support.Diagnostics;
 with Langkit_Support.Diagnostics.Output;
 with Langkit_Support.Lexical_Envs;
 with Langkit_Support.Slocs;        use Langkit_Support.Slocs;
+with Langkit_Support.Symbols;
 with Langkit_Support.Text;         use Langkit_Support.Text;
+with Langkit_Support.Token_Data_Handlers;
 
 with Libadalang.Analysis;             use Libadalang.Analysis;
 with Libadalang.Common;               use Libadalang.Common;
+with Libadalang.Env_Caches;
 with Libadalang.Helpers;              use Libadalang.Helpers;
 with Libadalang.Iterators;            use Libadalang.Iterators;
+with Libadalang.Lexer_Implementation;
+with Libadalang.Nameres_Memo;
 with Libadalang.Semantic_Diagnostics; use Libadalang.Semantic_Diagnostics;
 
 with Put_Title;
@@ -34,6 +41,36 @@ procedure Nameres is
 
    package J renames GNATCOLL.JSON;
 
+   type Profile_Record is record
+      Lexing : Duration := 0.0;
+      --  Time to lex the source file
+
+      Parsing : Duration := 0.0;
+      --  Time to load the analysis unit, minus lexing time
+
+      PLE : Duration := 0.0;
+      --  Time to populate lexical envs (including loading dependencies)
+
+      Resolution : Duration := 0.0;
+      --  Time to run name resolution and pragma actions
+
+      Env_Cache_Lookups     : Long_Long_Integer := 0;
+      Env_Cache_Hits        : Long_Long_Integer := 0;
+      Env_Cache_Collections : Natural := 0;
+      --  Lexical env caches counters (see ``Libadalang.Env_Caches``). Note
+      --  that lookups and hits are not counted for caches collected while
+      --  processing the file.
+
+      Memo_Hits        : Long_Long_Integer := 0;
+      Memo_Misses      : Long_Long_Integer := 0;
+      Solver_Equations : Long_Long_Integer := 0;
+      Solver_Timeouts  : Long_Long_Integer := 0;
+      Solver_Time      : Duration := 0.0;
+      --  Name resolution memoization and solver counters (see
+      --  ``Libadalang.Nameres_Memo``).
+   end record;
+   --  Breakdown of the processing of files, for ``--profile``
+
    type File_Stats_Record is record
       Filename           : Unbounded_String;
       Nb_Successes       : Natural  := 0;
@@ -42,6 +79,7 @@ procedure Nameres is
       Nb_Total           : Natural  := 0;
       Processing_Time    : Duration := 0.0;
       Resolution_Speed   : Float    := 0.0;
+      Profile            : Profile_Record;
    end record;
 
    package File_Stats_Vectors is new Ada.Containers.Vectors
@@ -105,6 +143,10 @@ procedure Nameres is
 
    procedure Print_Stats (Jobs : App_Job_Context_Array);
 
+   procedure Print_Profile (Jobs : App_Job_Context_Array);
+   --  Print the JSON breakdown of the processing of all files, for
+   --  ``--profile``.
+
    package App is new Libadalang.Helpers.App
      (Name               => "nameres",
       Description        =>
@@ -177,6 +219,13 @@ procedure Nameres is
          Short => "-M",
          Help  => "Show the global memory footprint on exit");
 
+      package Profile is new Parse_Flag
+        (App.Args.Parser,
+         Long => "--profile",
+         Help => "Output a JSON breakdown of the processing time and of"
+                 & " name resolution counters for each file, and for all"
+                 & " files at the end of analysis");
+
       package Timeout is new Parse_Option
         (App.Args.Parser, "-t", "--timeout",
          "Timeout equation solving after N steps",
@@ -236,9 +285,22 @@ procedure Nameres is
    --  to the standard output after that.
 
    procedure Process_File
-     (Job_Data : in out Job_Data_Record;
-      Unit     : Analysis_Unit;
-      Filename : String);
+     (Job_Data  : in out Job_Data_Record;
+      Unit      : Analysis_Unit;
+      Filename  : String;
+      Load_Time : Duration);
+   --  Process the analysis unit for ``Filename``. ``Load_Time`` is the time
+   --  it took to get ``Unit`` from its analysis context, for ``--profile``.
+
+   function Lexing_Time (Unit : Analysis_Unit) return Duration;
+   --  Return the time it takes to lex the source buffer of ``Unit``. This
+   --  runs the lexer again on the already decoded buffer, so reading and
+   --  decoding the source file is not included.
+
+   function To_JSON
+     (Profile : Profile_Record; Kind, Filename : String) return J.JSON_Value;
+   --  Return a JSON object with the given ``kind`` and ``file`` fields for
+   --  ``Profile``.
 
    function Do_Pragma_Test (Arg : Expr) return Ada_Node_Array is
      (P_Matching_Nodes (Arg));
@@ -749,6 +811,7 @@ procedure Nameres is
       Ctx.Discard_Errors_In_Populate_Lexical_Env
         (Args.Discard_Errors_In_PLE.Get);
       Ctx.Set_Logic_Resolution_Timeout (Args.Timeout.Get);
+      Libadalang.Nameres_Memo.Set_Solver_Profiling (Ctx, Args.Profile.Get);
    end Job_Setup;
 
    ------------------
@@ -764,7 +827,8 @@ procedure Nameres is
       end if;
 
       begin
-         Process_File (Job_Data, Unit, Unit.Get_Filename);
+         Process_File
+           (Job_Data, Unit, Unit.Get_Filename, Context.Unit_Load_Time);
       exception
          when E : others =>
             Put_Line ("PLE failed with exception for file " & Basename);
@@ -780,6 +844,66 @@ procedure Nameres is
       end if;
    end Process_Unit;
 
+   -----------------
+   -- Lexing_Time --
+   -----------------
+
+   function Lexing_Time (Unit : Analysis_Unit) return Duration is
+      use Langkit_Support.Symbols;
+      use Langkit_Support.Token_Data_Handlers;
+      use Libadalang.Lexer_Implementation;
+
+      Buffer : constant Text_Type := Unit.Text;
+      Syms   : Symbol_Table := Create_Symbol_Table;
+      TDH    : Token_Data_Handler;
+      Diags  : Langkit_Support.Diagnostics.Diagnostics_Vectors.Vector;
+      Start  : Time;
+      Result : Duration;
+   begin
+      Initialize (TDH, Syms, System.Null_Address);
+      Start := Clock;
+      Extract_Tokens
+        (Input       => (Text_Buffer, Buffer'Address, Buffer'Length),
+         With_Trivia => True,
+         File_Reader => null,
+         TDH         => TDH,
+         Diagnostics => Diags);
+      Result := Clock - Start;
+
+      Free (TDH);
+      Destroy (Syms);
+      return Result;
+   end Lexing_Time;
+
+   -------------
+   -- To_JSON --
+   -------------
+
+   function To_JSON
+     (Profile : Profile_Record; Kind, Filename : String) return J.JSON_Value
+   is
+      Result : constant J.JSON_Value := J.Create_Object;
+   begin
+      Result.Set_Field ("kind", Kind);
+      if Filename /= "" then
+         Result.Set_Field ("file", Filename);
+      end if;
+      Result.Set_Field ("lexing", Float (Profile.Lexing));
+      Result.Set_Field ("parsing", Float (Profile.Parsing));
+      Result.Set_Field ("ple", Float (Profile.PLE));
+      Result.Set_Field ("resolution", Float (Profile.Resolution));
+      Result.Set_Field ("env_cache_lookups", Profile.Env_Cache_Lookups);
+      Result.Set_Field ("env_cache_hits", Profile.Env_Cache_Hits);
+      Result.Set_Field
+        ("env_cache_collections", Profile.Env_Cache_Collections);
+      Result.Set_Field ("memo_hits", Profile.Memo_Hits);
+      Result.Set_Field ("memo_misses", Profile.Memo_Misses);
+      Result.Set_Field ("solver_equations", Profile.Solver_Equations);
+      Result.Set_Field ("solver_timeouts", Profile.Solver_Timeouts);
+      Result.Set_Field ("solver_time", Float (Profile.Solver_Time));
+      return Result;
+   end To_JSON;
+
    ----------------------
    -- Emit_Diagnostics --
    ----------------------
@@ -835,13 +959,22 @@ procedure Nameres is
    ------------------
 
    procedure Process_File
-     (Job_Data : in out Job_Data_Record;
-      Unit     : Analysis_Unit;
-      Filename : String)
+     (Job_Data  : in out Job_Data_Record;
+      Unit      : Analysis_Unit;
+      Filename  : String;
+      Load_Time : Duration)
    is
       Start : constant Time := Clock;
       --  Time before processing the file
 
+      Profiling : constant Boolean := Args.Profile.Get;
+
+      Env_Caches_Before : Libadalang.Env_Caches.Env_Caches_Stats;
+      Memo_Before       : Libadalang.Nameres_Memo.Memo_Stats;
+      Phase_Start       : Time := Start;
+      --  Counters and time at the beginning of the current phase, for
+      --  ``--profile``.
+
       Stats : File_Stats_Record := (Filename => +Filename, others => <>);
       --  Stats for this file, to be added to ``Job_Data`` at the end if
       --  successfully returning.
@@ -1199,6 +1332,15 @@ procedure Nameres is
          return;
       end if;
 
+      if Profiling then
+         Stats.Profile.Lexing := Lexing_Time (Unit);
+         Stats.Profile.Parsing :=
+           Duration'Max (0.0, Load_Time - Stats.Profile.Lexing);
+         Env_Caches_Before := Libadalang.Env_Caches.Get_Stats (Unit.Context);
+         Memo_Before := Libadalang.Nameres_Memo.Stats (Unit.Context);
+         Phase_Start := Clock;
+      end if;
+
       --  Manually trigger PLE first, and if requested reparse the unit, to
       --  make sure that rebuilding lexical envs works correctly.
 
@@ -1210,6 +1352,11 @@ procedure Nameres is
          end loop;
       end if;
 
+      if Profiling then
+         Stats.Profile.PLE := Clock - Phase_Start;
+         Phase_Start := Clock;
+      end if;
+
       Job_Data.Config := (others => <>);
 
       if Args.Dump_Envs.Get then
@@ -1233,6 +1380,40 @@ procedure Nameres is
          New_Line;
       end if;
 
+      if Profiling then
+         declare
+            use Libadalang.Env_Caches;
+            use Libadalang.Nameres_Memo;
+
+            P                : Profile_Record renames Stats.Profile;
+            Env_Caches_After : constant Env_Caches_Stats :=
+              Get_Stats (Unit.Context);
+            Memo_After       : constant Memo_Stats :=
+              Libadalang.Nameres_Memo.Stats (Unit.Context);
+         begin
+            P.Resolution := Clock - Phase_Start;
+
+            --  Lookup and hit counters are reset when caches are collected,
+            --  so they may decrease.
+
+            P.Env_Cache_Lookups := Long_Long_Integer'Max
+              (0, Env_Caches_After.Lookups - Env_Caches_Before.Lookups);
+            P.Env_Cache_Hits := Long_Long_Integer'Max
+              (0, Env_Caches_After.Hits - Env_Caches_Before.Hits);
+            P.Env_Cache_Collections :=
+              Env_Caches_After.Collections - Env_Caches_Before.Collections;
+
+            P.Memo_Hits := Memo_After.Hits - Memo_Before.Hits;
+            P.Memo_Misses := Memo_After.Misses - Memo_Before.Misses;
+            P.Solver_Equations := Memo_After.Equations - Memo_Before.Equations;
+            P.Solver_Timeouts := Memo_After.Timeouts - Memo_Before.Timeouts;
+            P.Solver_Time := Memo_After.Solver_Time - Memo_Before.Solver_Time;
+
+            Ada.Text_IO.Put_Line
+              (To_JSON (P, "file_profile", Filename).Write);
+         end;
+      end if;
+
       --  Store the total number of nodes to avoid recomputing it each time
       --  it is needed.
       Stats.Nb_Total := Stats.Nb_Successes + Stats.Nb_Fails + Stats.Nb_Xfails;
@@ -1458,6 +1639,10 @@ procedure Nameres is
          Print_Stats (Jobs);
       end if;
 
+      if Args.Profile.Get then
+         Print_Profile (Jobs);
+      end if;
+
       if Args.Memory.Get then
          declare
             Watermark_Mb : constant Byte_Count :=
@@ -1473,6 +1658,47 @@ procedure Nameres is
       Put_Line ("Done.");
    end App_Post_Process;
 
+   -------------------
+   -- Print_Profile --
+   -------------------
+
+   procedure Print_Profile (Jobs : App_Job_Context_Array) is
+      Total  : Profile_Record;
+      Files  : Natural := 0;
+      Result : J.JSON_Value;
+   begin
+      for Job of Jobs loop
+         for File_Stats of Job_Data (Job.ID).Stats.File_Stats loop
+            declare
+               P : Profile_Record renames File_Stats.Profile;
+            begin
+               Files := Files + 1;
+               Total.Lexing := Total.Lexing + P.Lexing;
+               Total.Parsing := Total.Parsing + P.Parsing;
+               Total.PLE := Total.PLE + P.PLE;
+               Total.Resolution := Total.Resolution + P.Resolution;
+               Total.Env_Cache_Lookups :=
+                 Total.Env_Cache_Lookups + P.Env_Cache_Lookups;
+               Total.Env_Cache_Hits := Total.Env_Cache_Hits + P.Env_Cache_Hits;
+               Total.Env_Cache_Collections :=
+                 Total.Env_Cache_Collections + P.Env_Cache_Collections;
+               Total.Memo_Hits := Total.Memo_Hits + P.Memo_Hits;
+               Total.Memo_Misses := Total.Memo_Misses + P.Memo_Misses;
+               Total.Solver_Equations :=
+                 Total.Solver_Equations + P.Solver_Equations;
+               Total.Solver_Timeouts :=
+                 Total.Solver_Timeouts + P.Solver_Timeouts;
+               Total.Solver_Time := Total.Solver_Time + P.Solver_Time;
+            end;
+         end loop;
+      end loop;
+
+      Result := To_JSON (Total, "profile", "");
+      Result.Set_Field ("files", Files);
+      Result.Set_Field ("total_time", Float (Clock - Time_Start));
+      Ada.Text_IO.Put_Line (Result.Write);
+   end Print_Profile;
+
    -----------------
    -- Print_Stats --
    -----------------
@@ -13,6 +13,7 @@ from e3.testsuite.driver.diff import (
     Substitute,
 )
 
+from drivers import perf_corpus
 from drivers.valgrind import Valgrind
 
 
@@ -56,6 +57,12 @@ class BaseDriver(DiffTestDriver):
                 delete=False,
             )
 
+        # If requested, generate synthetic sources in the working dir
+        self.generated_sources: List[str] = []
+        generate_sources = self.test_env.get("generate_sources")
+        if generate_sources is not None:
+            self.generated_sources = self.generate_sources(generate_sources)
+
         # If requested, skip internal testcases
         if (
             self.env.options.skip_internal_tests and
@@ -94,6 +101,45 @@ class BaseDriver(DiffTestDriver):
         if self.env.build.os.name == "windows" and windows_baseline_file:
             self.test_env.setdefault("baseline_file", windows_baseline_file)
 
+    def generate_sources(self, params: object) -> List[str]:
+        """
+        Generate synthetic sources in the working directory according to the
+        ``generate_sources`` key in ``test.yaml`` and return the list of
+        generated files.
+
+        ``params`` must be a mapping with the following keys:
+
+        * ``kind``: the kind of sources to generate (see
+          ``drivers.perf_corpus.GENERATORS``).
+
+        * ``size``: the size of the sources to generate (meaning depends on
+          the kind).
+
+        * ``perf_size``: optional size to use instead of ``size`` in perf
+          mode, so that sources are small enough for the testsuite to run
+          quickly in normal mode, but big enough to get significant
+          measurements in perf mode.
+        """
+        if not isinstance(params, dict) or not all(
+            isinstance(params.get(key), t)
+            for key, t in [("kind", str), ("size", int)]
+        ):
+            raise TestAbortWithError(
+                'Invalid "generate_sources" key in test.yaml: it must be a'
+                ' mapping with a "kind" string and a "size" integer'
+            )
+
+        size = params["size"]
+        if self.perf_mode:
+            size = params.get("perf_size", size)
+
+        try:
+            return perf_corpus.generate(
+                params["kind"], size, self.working_dir()
+            )
+        except ValueError as exc:
+            raise TestAbortWithError(str(exc))
+
     @property
     def baseline(self) -> Tuple[Optional[str], Union[str, bytes], bool]:
         # In perf mode, our purpose is to measure performance, not to check
@@ -273,6 +319,11 @@ class BaseDriver(DiffTestDriver):
           the approximative number of bytes each instance of the subprocess
           allocated.
 
+        * For each phase that the subprocess measured itself (see the
+          ``perf`` module in ``python_support``), the "phase-NAME" entry
+          contains a space-separated list of floats for the time in seconds
+          it spent in the NAME phase in each instance of the subprocess.
+
         When created, files for time and memory profiles go to the "perf"
         working directory and the corresponding file names are stored in the
         "time-profile" and "memory-profile" entries in the ``TestResult.info``
@@ -280,8 +331,11 @@ class BaseDriver(DiffTestDriver):
         """
         perf_dir = self.env.perf_dir
 
-        # Common arguments for "self.shell"
+        # Common arguments for "self.shell". Let the subprocess know where to
+        # record the time spent in its phases.
+        phases_file = self.working_dir("perf-phases.txt")
         subp_env = self.subp_env(env)
+        subp_env["LIBADALANG_PERF_PHASES"] = phases_file
         cwd = self.working_dir()
 
         def run(*prefix: str) -> str:
@@ -310,13 +364,27 @@ class BaseDriver(DiffTestDriver):
                 # execution time + maximum resident set size (memory occupied).
                 time_list: List[str] = []
                 memory_list: List[str] = []
+                phases: Dict[str, List[str]] = {}
                 for i in range(param):
+                    if os.path.exists(phases_file):
+                        os.remove(phases_file)
+
+                    # "time" writes its report after the subprocess has
+                    # completed, so it is on the last line of the output.
                     result = run("time", "-f", "%M %e")
-                    memory, time = result.split()
+                    memory, time = result.splitlines()[-1].split()
                     time_list.append(time)
                     memory_list.append(str(int(memory) * 1024))
+
+                    for name, seconds in self.read_perf_phases(
+                        phases_file
+                    ).items():
+                        phases.setdefault(name, []).append(f"{seconds:.6f}")
+
                 self.result.info["time"] = " ".join(time_list)
                 self.result.info["memory"] = " ".join(memory_list)
+                for name, times in phases.items():
+                    self.result.info[f"phase-{name}"] = " ".join(times)
 
             elif mode == "callgrind":
                 result = run("valgrind", "--tool=callgrind")
@@ -360,6 +428,29 @@ class BaseDriver(DiffTestDriver):
             else:
                 raise TestAbortWithError(f"invalid perf mode: {mode}")
 
+    @staticmethod
+    def read_perf_phases(filename: str) -> Dict[str, float]:
+        """
+        Read the file in which a subprocess recorded the time spent in its
+        phases and return the total time (in seconds) for each phase, in the
+        order in which phases first appear. Return an empty dict if the
+        subprocess recorded no phase.
+        """
+        result: Dict[str, float] = {}
+        if not os.path.exists(filename):
+            return result
+
+        with open(filename) as f:
+            for line in f:
+                try:
+                    name, seconds = line.split()
+                    result[name] = result.get(name, 0.0) + float(seconds)
+                except ValueError:
+                    raise TestAbortWithError(
+                        f"invalid line in perf phases file: {line!r}"
+                    )
+        return result
+
     @property
     def gpr_scenario_vars(self):
         """
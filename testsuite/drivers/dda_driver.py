@@ -32,6 +32,8 @@ class DDADriver(BaseDriver):
       variables.
     """
 
+    perf_supported = True
+
     def run(self):
         # List of source files to process and unit provider
         input_sources = self.test_env.get("input_sources", [])
@@ -88,4 +90,7 @@ class DDADriver(BaseDriver):
         for f in sorted(glob.glob(self.test_dir("*.json"))):
             args += ["-i", f]
 
-        self.run_and_check(argv=args, memcheck=True, env=env)
+        if self.perf_mode:
+            self.run_for_perf(argv=args, env=env)
+        else:
+            self.run_and_check(argv=args, memcheck=True, env=env)
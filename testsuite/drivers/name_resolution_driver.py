@@ -12,6 +12,8 @@ class NameResolutionDriver(BaseDriver):
     are assumed to be optional unless told otherwise.
 
     * ``input_sources``: A list of filenames for the source files to process.
+      If not passed, use the sources generated for the ``generate_sources``
+      key, if any (see ``BaseDriver.generate_sources``).
 
     * ``charset``: The name of a string encoding to use when processing files.
 
@@ -86,7 +88,9 @@ class NameResolutionDriver(BaseDriver):
         args.append("-k")
 
         # List of source files to process and unit provider
-        input_sources = self.test_env.get("input_sources", [])
+        input_sources = self.test_env.get(
+            "input_sources", self.generated_sources
+        )
 
         project_file = self.test_env.get("project_file", None)
         if project_file:
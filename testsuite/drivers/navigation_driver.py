@@ -5,6 +5,8 @@ from drivers.base_driver import BaseDriver
 
 class NavigationDriver(BaseDriver):
 
+    perf_supported = True
+
     def run(self):
         try:
             input_sources = self.test_env['input_sources']
@@ -30,8 +32,8 @@ class NavigationDriver(BaseDriver):
 
         # Some tests intentionally exercize cases with missing source files:
         # let "navigate" warn about them, but keep it going (-k).
-        self.run_and_check(
-            ['navigate', '-k', '-K', ','.join(kinds)]
-            + input_sources,
-            memcheck=True,
-        )
+        argv = ['navigate', '-k', '-K', ','.join(kinds)] + input_sources
+        if self.perf_mode:
+            self.run_for_perf(argv=argv)
+        else:
+            self.run_and_check(argv, memcheck=True)
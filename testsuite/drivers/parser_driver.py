@@ -5,6 +5,8 @@ from drivers.base_driver import BaseDriver
 
 class ParserDriver(BaseDriver):
 
+    perf_supported = True
+
     ACTIONS = ('pretty-print', 'pretty-print-file',
                'pp-file-with-trivia', 'pp-file-with-lexical-envs')
 
@@ -91,6 +93,12 @@ class ParserDriver(BaseDriver):
                 '{}:{}'.format(lookup['line'], lookup['column'])
             ]
 
+        # In perf mode, just measure the parsing of the input file: the other
+        # steps only check the consistency of outputs.
+        if self.perf_mode:
+            self.run_for_perf(argv=base_argv + file_args + misc_argv)
+            return
+
         self.outputs = {}
 
         def run(name, argv, append_output=False, encoding=None):
@@ -152,7 +160,7 @@ class ParserDriver(BaseDriver):
 
     def compute_failures(self):
         failures = super(ParserDriver, self).compute_failures()
-        if not self.test_unparsing:
+        if not self.test_unparsing or self.perf_mode:
             return failures
 
         # Compare the output of the second tree dump with the output of the
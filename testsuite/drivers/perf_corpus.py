@@ -0,0 +1,244 @@
+"""
+Generators for the synthetic Ada sources of the performance benchmarks.
+
+Each generator creates, in a given directory, a set of Ada sources that
+stresses a specific part of Libadalang (parsing, lexical env population, name
+resolution) and returns the list of the created files, in the order in which
+they must be processed. Generated sources are deterministic: for a given size,
+they are always the same, so that metrics from different runs are comparable.
+
+This module is used by the testsuite drivers for tests that have a
+``generate_sources`` key, and can be run as a script to inspect the generated
+sources::
+
+    python perf_corpus.py deep_generics 10 -o /tmp/corpus
+"""
+
+import argparse
+import os.path
+from typing import Callable, Dict, List, Tuple
+
+
+Sources = List[Tuple[str, str]]
+"""
+List of (filename, content) pairs for generated sources.
+"""
+
+
+def deep_generics(size: int) -> Sources:
+    """
+    Chain of ``size`` generic packages, each one instantiating the previous
+    one twice, and a main that instantiates the last one. Note that the
+    number of generic instantiations grows exponentially with ``size``.
+    """
+    result: Sources = []
+    for i in range(size + 1):
+        lines = []
+        if i > 0:
+            lines.append(f"with Level_{i - 1};")
+        lines += [
+            "generic",
+            "   type T is private;",
+            "   with function Combine (L, R : T) return T;",
+            f"package Level_{i} is",
+        ]
+        if i > 0:
+            lines += [
+                f"   package Inner is new Level_{i - 1} (T, Combine);",
+                f"   package Other is new Level_{i - 1}"
+                " (T => T, Combine => Combine);",
+                "   function Apply (X : T) return T is",
+                "     (Combine (Inner.Apply (X), Other.Apply (X)));",
+            ]
+        else:
+            lines.append("   function Apply (X : T) return T is"
+                         " (Combine (X, X));")
+        lines.append(f"end Level_{i};")
+        result.append((f"level_{i}.ads", "\n".join(lines) + "\n"))
+
+    result.append(("deep_generics_main.adb", f"""\
+with Level_{size};
+
+procedure Deep_Generics_Main is
+   function Add (L, R : Integer) return Integer is (L + R);
+   package Inst is new Level_{size} (Integer, Add);
+   X : Integer := Inst.Apply (1);
+begin
+   X := Inst.Apply (Inst.Apply (X));
+   X := Inst.Inner.Apply (X) + Inst.Other.Apply (X);
+end Deep_Generics_Main;
+"""))
+    return result
+
+
+def big_aggregates(size: int) -> Sources:
+    """
+    Package with aggregates of ``size`` components, mixing positional and
+    named associations, nested aggregates and enumeration literals.
+    """
+    colors = ["Red", "Green", "Blue"]
+
+    points = []
+    for i in range(1, size + 1):
+        color = colors[i % len(colors)]
+        if i % 2:
+            points.append(f"{i} => (X => {i}, Y => {i * 2}, C => {color})")
+        else:
+            points.append(f"{i} => ({i}, -{i}, {color})")
+
+    matrices = []
+    for i in range(1, max(size // 10, 1) + 1):
+        rows = ", ".join(
+            "(" + ", ".join(
+                "1.0" if r == c else f"{float(i)}" for c in range(1, 5)
+            ) + ")"
+            for r in range(1, 5)
+        )
+        matrices.append(f"{i} => ({rows})")
+
+    sep = ",\n      "
+    return [("big_aggregates.ads", f"""\
+package Big_Aggregates is
+   type Color is (Red, Green, Blue);
+
+   type Point is record
+      X, Y : Integer;
+      C    : Color;
+   end record;
+
+   type Point_Array is array (Positive range <>) of Point;
+   type Matrix is array (1 .. 4, 1 .. 4) of Float;
+   type Matrix_Array is array (Positive range <>) of Matrix;
+
+   Points : constant Point_Array :=
+     ({sep.join(points)});
+
+   Matrices : constant Matrix_Array :=
+     ({sep.join(matrices)});
+
+   Last : constant Point := Points (Points'Last);
+end Big_Aggregates;
+""")]
+
+
+def overload_chains(size: int) -> Sources:
+    """
+    Package with ``size`` derived types and overloaded functions on each of
+    them, and a main that calls them in nested chains of length ``size``.
+    """
+    decls = []
+    for i in range(1, size + 1):
+        decls += [
+            f"   type T_{i} is new Integer;",
+            f"   function G (X : T_{i}; Y : Integer) return T_{i} is"
+            f" (X + T_{i} (Y));",
+        ]
+    for i in range(1, size):
+        decls.append(
+            f"   function F (X : T_{i}) return T_{i + 1} is"
+            f" (T_{i + 1} (X) + 1);"
+        )
+
+    chain = "T_1 (0)"
+    for _ in range(1, size):
+        chain = f"F ({chain})"
+
+    g_chain = "X"
+    for i in range(1, min(size, 20) + 1):
+        g_chain = f"G ({g_chain}, {i})"
+
+    sum_expr = " + ".join(str(i) for i in range(1, size + 1))
+
+    return [
+        ("overloads.ads", "package Overloads is\n"
+                          + "\n".join(decls)
+                          + "\nend Overloads;\n"),
+        ("overloads_main.adb", f"""\
+with Overloads; use Overloads;
+
+procedure Overloads_Main is
+   X : T_{size} := {chain};
+   Y : Integer := {sum_expr};
+begin
+   X := {g_chain};
+   Y := Y + Integer (X);
+end Overloads_Main;
+"""),
+    ]
+
+
+def wide_packages(size: int) -> Sources:
+    """
+    Package with ``size`` groups of declarations (record type, constant,
+    function), and a main that references all of them through a use clause.
+    """
+    decls = []
+    uses = []
+    objects = []
+    for i in range(1, size + 1):
+        decls += [
+            f"   type Rec_{i} is record",
+            "      V : Integer;",
+            "   end record;",
+            f"   C_{i} : constant Integer := {i};",
+            f"   function Get_{i} (R : Rec_{i}) return Integer is"
+            f" (R.V + C_{i});",
+        ]
+        objects.append(f"   R_{i} : Rec_{i} := (V => C_{i});")
+        uses.append(f"   Total := Total + Get_{i} (R_{i});")
+
+    return [
+        ("wide.ads", "package Wide is\n" + "\n".join(decls)
+                     + "\nend Wide;\n"),
+        ("wide_main.adb", "with Wide; use Wide;\n\n"
+                          "procedure Wide_Main is\n"
+                          + "\n".join(objects)
+                          + "\n   Total : Integer := 0;\nbegin\n"
+                          + "\n".join(uses)
+                          + "\nend Wide_Main;\n"),
+    ]
+
+
+GENERATORS: Dict[str, Callable[[int], Sources]] = {
+    "deep_generics": deep_generics,
+    "big_aggregates": big_aggregates,
+    "overload_chains": overload_chains,
+    "wide_packages": wide_packages,
+}
+
+
+def generate(kind: str, size: int, output_dir: str) -> List[str]:
+    """
+    Generate sources of the given kind and size in ``output_dir``. Return the
+    list of generated filenames (relative to ``output_dir``).
+
+    :raises ValueError: If ``kind`` is not a known kind of sources.
+    """
+    try:
+        generator = GENERATORS[kind]
+    except KeyError:
+        raise ValueError(
+            f"invalid kind of generated sources: {kind} (valid ones are:"
+            f" {', '.join(sorted(GENERATORS))})"
+        )
+
+    result = []
+    for filename, content in generator(size):
+        with open(os.path.join(output_dir, filename), "w") as f:
+            f.write(content)
+        result.append(filename)
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("kind", choices=sorted(GENERATORS))
+    parser.add_argument("size", type=int)
+    parser.add_argument(
+        "--output-dir", "-o", default=".",
+        help="Directory in which to generate sources (current directory by"
+             " default)."
+    )
+    args = parser.parse_args()
+    for f in generate(args.kind, args.size, args.output_dir):
+        print(f)
@@ -9,6 +9,8 @@ from drivers.base_driver import BaseDriver
 
 class PythonDriver(BaseDriver):
 
+    perf_supported = True
+
     py_file = 'test.py'
 
     def run(self):
@@ -20,10 +22,12 @@ class PythonDriver(BaseDriver):
         if self.disable_python:
             raise TestSkip('Python API testing disabled')
 
-        input_sources = self.test_env.get('input_sources', [])
+        input_sources = self.test_env.get('input_sources',
+                                          self.generated_sources)
         project_file = self.test_env.get('project_file', None)
         self.check_file(self.py_file)
-        self.check_file_list('"input_sources"', input_sources)
+        if 'input_sources' in self.test_env:
+            self.check_file_list('"input_sources"', input_sources)
 
         args = list(input_sources)
 
@@ -67,25 +71,36 @@ class PythonRunner(object):
     def run(self, py_file, py_args):
         """
         Run the given Python scripts with given arguments.
+
+        In perf mode, collect performance data from the script instead (see
+        ``BaseDriver.run_for_perf``) and return an empty string.
+        """
+        argv = [self.interpreter, py_file] + py_args
+        if self.driver.perf_mode:
+            self.driver.run_for_perf(argv=argv, env=self.env)
+            return ""
+        return self.driver.run_and_check(argv, env=self.env)
+
+    @property
+    def env(self):
+        """
+        Return the additional environment variables for Python scripts.
         """
-        return self.driver.run_and_check(
-            [self.interpreter, py_file] + py_args,
-            env={
-                'PYTHONPATH': self.add_paths(
-                    os.environ.get('PYTHONPATH'),
-                    self.support_dir,
-                    self.internal_support_dir
-                ),
-                'LIBADALANG_ROOTDIR': os.path.join(
-                    os.path.dirname(os.path.abspath(__file__)),
-                    '..', '..',
-                ),
-                'LIBADALANG_DISABLE_SHARED': str(
-                    int(self.driver.disable_shared)
-                ),
-                'LIBADALANG_BUILD_MODE': self.driver.build_mode,
-            }
-        )
+        return {
+            'PYTHONPATH': self.add_paths(
+                os.environ.get('PYTHONPATH'),
+                self.support_dir,
+                self.internal_support_dir
+            ),
+            'LIBADALANG_ROOTDIR': os.path.join(
+                os.path.dirname(os.path.abspath(__file__)),
+                '..', '..',
+            ),
+            'LIBADALANG_DISABLE_SHARED': str(
+                int(self.driver.disable_shared)
+            ),
+            'LIBADALANG_BUILD_MODE': self.driver.build_mode,
+        }
 
     @property
     def interpreter(self):
@@ -12,6 +12,8 @@ class UnparserDriver(BaseDriver):
     formatted source code against baselines.
     """
 
+    perf_supported = True
+
     input_filename = "input.ada"
 
     @property
@@ -37,4 +39,7 @@ class UnparserDriver(BaseDriver):
 
         argv += [self.unparsing_config_filename, self.input_filename]
 
-        self.run_and_check(argv, memcheck=True)
+        if self.perf_mode:
+            self.run_for_perf(argv=argv)
+        else:
+            self.run_and_check(argv, memcheck=True)
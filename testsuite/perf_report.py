@@ -0,0 +1,312 @@
+#! /usr/bin/env python
+
+"""
+Usage::
+
+    perf_report.py [OPTIONS] BASE_REPORT NEW_REPORT
+
+Compare two performance reports created by the testsuite in perf mode (see
+the ``perf-report.json`` file in the ``--perf-mode`` directory) and exit with
+a non-zero status code if the new report shows significant regressions.
+
+A metric is considered to have regressed when its median increased by more
+than the given threshold and, if both reports have enough samples for it,
+when the Mann-Whitney U test says that the increase is statistically
+significant. With too few samples (for instance 3 against 3 at the default
+significance level), the test can never be significant: only the threshold
+is used then, and the p-value is reported as "n/a".
+"""
+
+import argparse
+import csv
+import datetime
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+
+REPORT_VERSION = 1
+"""
+Version of the format for JSON reports. To be incremented for each
+incompatible change.
+"""
+
+Metrics = Dict[str, List[float]]
+"""
+Samples for each metric of a testcase. The metric names are "time" (seconds),
+"memory" (bytes), "callgrind" (number of executed instructions) and
+"phase-NAME" (seconds spent in the NAME phase).
+"""
+
+Report = Dict[str, object]
+"""
+Performance report, as stored in JSON files. Keys are:
+
+* "version": ``REPORT_VERSION``.
+* "machine": mapping of information about the machine that ran the testsuite
+  (see ``machine_info``).
+* "tests": mapping from test names to their ``Metrics``.
+* "profiles": mapping from test names to the mapping of the profile files
+  ("time-profile" and "memory-profile") created for them.
+"""
+
+
+def machine_info(root_dir: str) -> Dict[str, object]:
+    """
+    Return information about the current machine and the Libadalang source
+    tree in ``root_dir``, so that reports from different runs can be checked
+    to be comparable.
+    """
+    try:
+        commit: Optional[str] = subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=root_dir, stderr=subprocess.DEVNULL, encoding="ascii",
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "hostname": platform.node(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "python": platform.python_version(),
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(
+            timespec="seconds"
+        ),
+    }
+
+
+def metrics_from_info(info: Dict[str, str]) -> Metrics:
+    """
+    Extract metrics from the ``TestResult.info`` table of a testcase run in
+    perf mode (see ``BaseDriver.run_for_perf``).
+    """
+    result: Metrics = {}
+    for key, value in info.items():
+        if key in ("time", "memory", "callgrind") or key.startswith("phase-"):
+            result[key] = [float(v) for v in value.split()]
+    return result
+
+
+def write_json(report: Report, filename: str) -> None:
+    """
+    Write ``report`` to the ``filename`` JSON file.
+    """
+    with open(filename, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def write_csv(report: Report, filename: str) -> None:
+    """
+    Write the metrics in ``report`` to the ``filename`` CSV file, one row per
+    sample.
+    """
+    tests: Dict[str, Metrics] = report["tests"]  # type: ignore
+    with open(filename, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["test", "metric", "sample", "value"])
+        for test_name, metrics in sorted(tests.items()):
+            for metric, samples in sorted(metrics.items()):
+                for i, value in enumerate(samples):
+                    writer.writerow([test_name, metric, i, value])
+
+
+def load_json(filename: str) -> Report:
+    """
+    Load a report from the ``filename`` JSON file.
+
+    :raises ValueError: If the file does not contain a valid report.
+    """
+    with open(filename) as f:
+        try:
+            report = json.load(f)
+        except json.JSONDecodeError as exc:
+            raise ValueError(f"{filename}: invalid JSON: {exc}")
+    if (
+        not isinstance(report, dict)
+        or report.get("version") != REPORT_VERSION
+        or not isinstance(report.get("tests"), dict)
+    ):
+        raise ValueError(
+            f"{filename}: not a version {REPORT_VERSION} performance report"
+        )
+    return report
+
+
+def mann_whitney_p_value(base: List[float], new: List[float]) -> float:
+    """
+    Return the p-value of the one-sided Mann-Whitney U test for the
+    hypothesis that values in ``new`` tend to be greater than values in
+    ``base``.
+
+    The exact distribution of the U statistic is used, so this is meant for
+    the small number of samples that the testsuite collects. Ties are counted
+    as half a win, which makes the test slightly conservative.
+    """
+    n, m = len(base), len(new)
+
+    # Twice the U statistic for "new", so that it is an integer even with
+    # ties.
+    u2 = sum(
+        2 if y > x else 1 if y == x else 0
+        for x in base
+        for y in new
+    )
+
+    # When processing i "base" samples, row[j][u] is the number of
+    # arrangements of i "base" and j "new" samples for which "new" gets u
+    # wins (without ties). Only the previous row is kept in memory.
+    prev = [[1] for _ in range(m + 1)]
+    for i in range(1, n + 1):
+        row = [[1]]
+        for j in range(1, m + 1):
+            # The greatest sample is either from "new" (it wins over the i
+            # "base" samples) or from "base" (it brings no win).
+            from_new = [0] * i + row[j - 1]
+            from_base = prev[j]
+            size = max(len(from_new), len(from_base))
+            row.append([
+                (from_new[u] if u < len(from_new) else 0)
+                + (from_base[u] if u < len(from_base) else 0)
+                for u in range(size)
+            ])
+        prev = row
+    dist = prev[m]
+
+    total = sum(dist)
+    # Probability that U is at least as great as the observed one. For ties,
+    # round the observed U down.
+    u_min = u2 // 2
+    return sum(dist[u_min:]) / total
+
+
+def min_p_value(n: int, m: int) -> float:
+    """
+    Return the smallest p-value that ``mann_whitney_p_value`` can return for
+    ``n`` "base" samples and ``m`` "new" samples, i.e. the probability that
+    all "new" samples are greater than all "base" samples by chance.
+    """
+    return 1 / math.comb(n + m, n)
+
+
+def compare(
+    base: Report,
+    new: Report,
+    threshold: float,
+    alpha: float,
+) -> List[Tuple[str, str, float, float, Optional[float], bool]]:
+    """
+    Compare metrics that are present in both reports.
+
+    Return a list of (test name, metric, base median, new median, p-value,
+    regression) tuples. The p-value is None when the reports have too few
+    samples for the test to be significant at ``alpha`` (this includes a
+    single sample, for deterministic metrics such as "callgrind"):
+    regressions are then detected only with the threshold.
+
+    :param threshold: Relative increase of the median (0.05 for 5%) above
+        which a metric is considered to have regressed.
+    :param alpha: Significance level for the statistical test.
+    """
+    result = []
+    base_tests: Dict[str, Metrics] = base["tests"]  # type: ignore
+    new_tests: Dict[str, Metrics] = new["tests"]  # type: ignore
+    for test_name in sorted(set(base_tests) & set(new_tests)):
+        base_metrics = base_tests[test_name]
+        new_metrics = new_tests[test_name]
+        for metric in sorted(set(base_metrics) & set(new_metrics)):
+            base_samples = base_metrics[metric]
+            new_samples = new_metrics[metric]
+            if not base_samples or not new_samples:
+                continue
+
+            base_median = statistics.median(base_samples)
+            new_median = statistics.median(new_samples)
+            increased = new_median > base_median * (1 + threshold)
+
+            p_value: Optional[float] = None
+            if (
+                len(base_samples) >= 2
+                and len(new_samples) >= 2
+                and min_p_value(len(base_samples), len(new_samples)) < alpha
+            ):
+                p_value = mann_whitney_p_value(base_samples, new_samples)
+                regression = increased and p_value < alpha
+            else:
+                regression = increased
+
+            result.append((test_name, metric, base_median, new_median,
+                           p_value, regression))
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("base", help="JSON report for the reference run.")
+    parser.add_argument("new", help="JSON report for the run to check.")
+    parser.add_argument(
+        "--threshold", type=float, default=5.0,
+        help="Increase (in percent) of the median of a metric above which it"
+             " is considered to have regressed. 5 by default."
+    )
+    parser.add_argument(
+        "--alpha", type=float, default=0.05,
+        help="Significance level for the statistical test. 0.05 by default."
+    )
+    parser.add_argument(
+        "--all", action="store_true",
+        help="Show all metrics, not only the ones that regressed."
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        base = load_json(args.base)
+        new = load_json(args.new)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+
+    base_machine = base.get("machine", {})
+    new_machine = new.get("machine", {})
+    for key in ("hostname", "platform", "cpu_count"):
+        if base_machine.get(key) != new_machine.get(key):
+            print(f"warning: reports come from different machines ({key}:"
+                  f" {base_machine.get(key)} vs {new_machine.get(key)})")
+
+    rows = compare(base, new, args.threshold / 100, args.alpha)
+    regressions = 0
+    for test_name, metric, base_median, new_median, p_value, regression in (
+        rows
+    ):
+        if regression:
+            regressions += 1
+        elif not args.all:
+            continue
+
+        change = (
+            (new_median - base_median) / base_median * 100
+            if base_median else 0.0
+        )
+        p = "n/a" if p_value is None else f"{p_value:.3f}"
+        print(f"{'REGRESSION' if regression else 'ok':<10} {test_name}"
+              f" {metric}: {base_median:g} -> {new_median:g}"
+              f" ({change:+.1f}%, p={p})")
+
+    print(f"{len(rows)} metrics compared, {regressions} regressions")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+"""
+Helpers to measure the time spent in the phases of Python testcases.
+
+When the testsuite runs in perf mode, it sets the ``LIBADALANG_PERF_PHASES``
+environment variable to the name of a file. Each call to ``phase`` then
+appends one line to that file with the name of the phase and the time (in
+seconds) it took. The driver reads this file after the run. Outside of perf
+mode, ``phase`` only runs the wrapped code, so testcases can use it
+unconditionally::
+
+    with phase("parse"):
+        units = [ctx.get_from_file(f) for f in files]
+
+    with phase("populate_lexical_env"):
+        for u in units:
+            u.populate_lexical_env()
+"""
+
+from contextlib import contextmanager
+import os
+import time
+from typing import Iterator
+
+
+PHASES_FILE = os.environ.get("LIBADALANG_PERF_PHASES")
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Measure the time it takes to run the wrapped code and record it as the
+    ``name`` phase. Several measures for the same phase in a single run are
+    added up.
+    """
+    if PHASES_FILE is None:
+        yield
+        return
+
+    assert name and " " not in name, f"invalid phase name: {name!r}"
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        with open(PHASES_FILE, "a") as f:
+            f.write(f"{name} {elapsed:.6f}\n")
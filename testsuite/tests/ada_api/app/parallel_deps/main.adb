@@ -0,0 +1,116 @@
+with Ada.Containers.Indefinite_Ordered_Maps;
+with Ada.Strings.Unbounded; use Ada.Strings.Unbounded;
+with Ada.Text_IO;           use Ada.Text_IO;
+with Ada.Unchecked_Deallocation;
+
+with GNATCOLL.VFS; use GNATCOLL.VFS;
+
+with Libadalang.Analysis; use Libadalang.Analysis;
+with Libadalang.Common;   use Libadalang.Common;
+with Libadalang.Helpers;  use Libadalang.Helpers;
+
+--  Check that all source files are processed exactly once when they are
+--  scheduled by dependencies, and that name resolution works in all jobs.
+
+procedure Main is
+
+   package Resolution_Maps is new Ada.Containers.Indefinite_Ordered_Maps
+     (Key_Type     => String,
+      Element_Type => String);
+   --  For each source file, image of the declarations that dotted names in
+   --  default expressions of object declarations resolve to.
+
+   type Resolution_Map_Array is
+     array (Job_ID range <>) of Resolution_Maps.Map;
+   type Resolution_Map_Array_Access is access Resolution_Map_Array;
+   procedure Free is new Ada.Unchecked_Deallocation
+     (Resolution_Map_Array, Resolution_Map_Array_Access);
+
+   Maps : Resolution_Map_Array_Access;
+
+   procedure App_Setup (Context : App_Context; Jobs : App_Job_Context_Array);
+   procedure Process_Unit (Context : App_Job_Context; Unit : Analysis_Unit);
+   procedure App_Post_Process
+     (Context : App_Context; Jobs : App_Job_Context_Array);
+
+   package App is new Libadalang.Helpers.App
+     (Name               => "test",
+      Description        => "Resolve object declarations in source files",
+      Enable_Parallelism => True,
+      App_Setup          => App_Setup,
+      Process_Unit       => Process_Unit,
+      App_Post_Process   => App_Post_Process);
+
+   ---------------
+   -- App_Setup --
+   ---------------
+
+   procedure App_Setup (Context : App_Context; Jobs : App_Job_Context_Array) is
+      pragma Unreferenced (Context);
+   begin
+      Maps := new Resolution_Map_Array (Jobs'Range);
+   end App_Setup;
+
+   ------------------
+   -- Process_Unit --
+   ------------------
+
+   procedure Process_Unit (Context : App_Job_Context; Unit : Analysis_Unit) is
+
+      function Visit (Node : Ada_Node'Class) return Visit_Status;
+
+      Map    : Resolution_Maps.Map renames Maps.all (Context.ID);
+      File   : constant String := +Create (+Unit.Get_Filename).Base_Name;
+      Result : Unbounded_String;
+
+      -----------
+      -- Visit --
+      -----------
+
+      function Visit (Node : Ada_Node'Class) return Visit_Status is
+      begin
+         if Node.Kind = Ada_Object_Decl
+            and then Node.As_Object_Decl.F_Default_Expr.Kind = Ada_Dotted_Name
+         then
+            Append
+              (Result,
+               Node.As_Object_Decl.F_Default_Expr.As_Name
+               .P_Referenced_Decl.Image);
+         end if;
+         return Into;
+      end Visit;
+   begin
+      Unit.Root.Traverse (Visit'Access);
+      Map.Insert
+        (File, (if Length (Result) = 0 then "<none>" else To_String (Result)));
+   end Process_Unit;
+
+   ----------------------
+   -- App_Post_Process --
+   ----------------------
+
+   procedure App_Post_Process
+     (Context : App_Context; Jobs : App_Job_Context_Array)
+   is
+      pragma Unreferenced (Context, Jobs);
+      use Resolution_Maps;
+      Merged_Map : Map;
+   begin
+      --  Merge all job-specific maps into Merged_Map. Inserting a file twice
+      --  would raise a Constraint_Error.
+
+      for M of Maps.all loop
+         for Pos in M.Iterate loop
+            Merged_Map.Insert (Key (Pos), Element (Pos));
+         end loop;
+      end loop;
+      Free (Maps);
+
+      for Pos in Merged_Map.Iterate loop
+         Put_Line (Key (Pos) & ": " & Element (Pos));
+      end loop;
+   end App_Post_Process;
+begin
+   App.Run;
+   Put_Line ("Done");
+end Main;
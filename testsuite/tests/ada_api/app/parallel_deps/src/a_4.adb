@@ -0,0 +1,7 @@
+with A_Base.Child;
+
+procedure A_4 is
+   Z : Integer := A_Base.Child.Y;
+begin
+   null;
+end A_4;
@@ -0,0 +1,7 @@
+with B_Base.Child;
+
+procedure B_3 is
+   Z : Integer := B_Base.Child.Y;
+begin
+   null;
+end B_3;
@@ -0,0 +1,81 @@
+--  Check that the import graph used by ``P_Filter_Is_Imported_By`` is updated
+--  when a unit is reparsed and when a unit that could not be found is loaded,
+--  and that edges are walked again only in these cases.
+
+with Ada.Directories; use Ada.Directories;
+with Ada.Text_IO;     use Ada.Text_IO;
+
+with Libadalang.Analysis;     use Libadalang.Analysis;
+with Libadalang.Import_Graph; use Libadalang.Import_Graph;
+
+procedure Main is
+
+   Ctx        : constant Analysis_Context := Create_Context;
+   Base_Unit  : constant Analysis_Unit := Get_From_File (Ctx, "base.ads");
+   Other_Unit : constant Analysis_Unit := Get_From_File (Ctx, "other.ads");
+   User_Unit  : constant Analysis_Unit := Get_From_File (Ctx, "user.adb");
+
+   Last : Import_Graph_Stats := Stats (Ctx);
+
+   procedure Query (Title : String; Target : Analysis_Unit);
+   --  Print the units that transitively import ``Target`` among base.ads,
+   --  other.ads, user.adb and helper.ads, and whether the import graph
+   --  walked or reused edges since the last query.
+
+   -----------
+   -- Query --
+   -----------
+
+   procedure Query (Title : String; Target : Analysis_Unit) is
+      Helper : constant Analysis_Unit := Get_From_File (Ctx, "helper.ads");
+      Result : constant Analysis_Unit_Array :=
+        Target.Root.P_Filter_Is_Imported_By
+          ((Base_Unit, Other_Unit, User_Unit, Helper), Transitive => True);
+      S      : constant Import_Graph_Stats := Stats (Ctx);
+   begin
+      Put_Line ("== " & Title & " ==");
+      Put ("Importers of " & Simple_Name (Target.Get_Filename) & ":");
+      for U of Result loop
+         Put (" " & Simple_Name (U.Get_Filename));
+      end loop;
+      New_Line;
+      Put_Line
+        ("Edges walked: " & Boolean'Image (S.Edge_Walks > Last.Edge_Walks));
+      Put_Line
+        ("Edges reused: "
+         & Boolean'Image (S.Edge_Walks_Saved > Last.Edge_Walks_Saved));
+      New_Line;
+      Last := S;
+   end Query;
+
+begin
+   --  helper.ads does not exist yet: user.adb has a missing import
+
+   Query ("Initial", Other_Unit);
+   Query ("No change", Other_Unit);
+
+   --  Once helper.ads is loaded, the imports of user.adb must be computed
+   --  again even though user.adb was not reparsed.
+
+   declare
+      Helper : constant Analysis_Unit := Get_From_Buffer
+        (Ctx, "helper.ads", Buffer => "package Helper is end Helper;");
+   begin
+      Query ("Load helper.ads", Helper);
+   end;
+
+   --  Remove the dependency on Other: only the imports of user.adb must be
+   --  walked again.
+
+   User_Unit.Reparse
+     (Buffer =>
+        "with Helper;" & ASCII.LF
+        & ASCII.LF
+        & "procedure User is" & ASCII.LF
+        & "begin" & ASCII.LF
+        & "   null;" & ASCII.LF
+        & "end User;" & ASCII.LF);
+   Query ("Reparse user.adb", Other_Unit);
+
+   Put_Line ("Done.");
+end Main;
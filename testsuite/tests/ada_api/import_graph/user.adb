@@ -0,0 +1,7 @@
+with Helper;
+with Other;
+
+procedure User is
+begin
+   null;
+end User;
@@ -0,0 +1,79 @@
+--  Check that the reference index of a unit is rebuilt only when one of its
+--  dependencies is reparsed.
+
+with Ada.Directories; use Ada.Directories;
+with Ada.Text_IO;     use Ada.Text_IO;
+
+with Libadalang.Analysis;        use Libadalang.Analysis;
+with Libadalang.Common;          use Libadalang.Common;
+with Libadalang.Iterators;       use Libadalang.Iterators;
+with Libadalang.Reference_Index;
+
+procedure Main is
+
+   Ctx   : constant Analysis_Context := Create_Context;
+   Units : constant Analysis_Unit_Array :=
+     (Get_From_File (Ctx, "shapes.ads"),
+      Get_From_File (Ctx, "shapes.adb"),
+      Get_From_File (Ctx, "user.adb"));
+
+   procedure Query (Title : String);
+   --  Look for all references to all defining names in ``Units`` and print
+   --  how many times the reference index of each unit was built.
+
+   -----------
+   -- Query --
+   -----------
+
+   procedure Query (Title : String) is
+   begin
+      for U of Units loop
+         for N of Find (U.Root, Kind_Is (Ada_Defining_Name)).Consume loop
+            declare
+               Refs : constant Ref_Result_Array :=
+                 N.As_Defining_Name.P_Find_All_References (Units);
+            begin
+               pragma Unreferenced (Refs);
+            end;
+         end loop;
+      end loop;
+
+      Put_Line ("== " & Title & " ==");
+      for U of Units loop
+         Put_Line
+           (Simple_Name (U.Get_Filename) & ":"
+            & Natural'Image (Libadalang.Reference_Index.Build_Count (U)));
+      end loop;
+      New_Line;
+   end Query;
+
+begin
+   Libadalang.Reference_Index.Set_Enabled (Ctx, True);
+   Query ("Initial");
+   Query ("No change");
+
+   --  user.adb imports shapes.ads, but nothing imports user.adb: only its
+   --  index must be rebuilt.
+
+   Units (3).Reparse
+     (Buffer =>
+        "with Shapes; use Shapes;" & ASCII.LF
+        & ASCII.LF
+        & "procedure User is" & ASCII.LF
+        & "   Sq : constant Square := (Side => 2);" & ASCII.LF
+        & "   S  : constant Shape'Class := Sq;" & ASCII.LF
+        & "   X  : Integer;" & ASCII.LF
+        & "begin" & ASCII.LF
+        & "   X := Area (S);" & ASCII.LF
+        & "   X := Area (Sq);" & ASCII.LF
+        & "   X := Area (S) + X;" & ASCII.LF
+        & "end User;" & ASCII.LF);
+   Query ("Reparse user.adb");
+
+   --  All units depend on shapes.ads
+
+   Units (1).Reparse;
+   Query ("Reparse shapes.ads");
+
+   Put_Line ("Done.");
+end Main;
@@ -0,0 +1,10 @@
+with Shapes; use Shapes;
+
+procedure User is
+   Sq : constant Square := (Side => 2);
+   S  : constant Shape'Class := Sq;
+   X  : Integer;
+begin
+   X := Area (S);
+   X := Area (Sq);
+end User;
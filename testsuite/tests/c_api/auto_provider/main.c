@@ -32,9 +32,22 @@ const struct unit_ref foo_unit[] = {
 const char *all_inputs[] = {"foo-utf8.ada", "foo-utf16.ada", NULL};
 const char *single_input[] = {"foo-utf8.ada", NULL};
 
+const ada_auto_provider_options scan_options = {
+  /* scan_headers= */ 1,
+  /* cache_file= */ NULL,
+  /* jobs= */ 2
+};
+
+const ada_auto_provider_options invalid_options = {
+  /* scan_headers= */ 0,
+  /* cache_file= */ NULL,
+  /* jobs= */ -1
+};
+
 static void
 check (const char *label, const struct unit_ref *refs,
-       const char **input_files, const char *charset)
+       const char **input_files, const char *charset,
+       const ada_auto_provider_options *options)
 {
   ada_unit_provider up;
   ada_analysis_context ctx;
@@ -42,7 +55,11 @@ check (const char *label, const struct unit_ref *refs,
   printf ("== %s ==\n", label);
   puts ("");
 
-  up = ada_create_auto_provider (input_files, charset);
+  if (options == NULL)
+    up = ada_create_auto_provider (input_files, charset);
+  else
+    up = ada_create_auto_provider_with_options (input_files, charset,
+						options);
   abort_on_exception ();
 
   ctx = ada_allocate_analysis_context ();
@@ -114,12 +131,39 @@ check (const char *label, const struct unit_ref *refs,
   abort_on_exception ();
 }
 
+static void
+check_invalid_jobs (void)
+{
+  ada_unit_provider up;
+  const ada_exception *exc;
+
+  puts ("== negative jobs ==");
+  puts ("");
+
+  up = ada_create_auto_provider_with_options (&single_input[0], NULL,
+					      &invalid_options);
+  exc = ada_get_last_exception ();
+  if (exc == NULL)
+    {
+      puts ("No exception raised");
+      if (up != NULL)
+	ada_dec_ref_unit_provider (up);
+    }
+  else
+    printf ("Got an exception (%s), null provider: %s\n",
+	    exc->information, up == NULL ? "yes" : "no");
+  puts ("");
+}
+
 int
 main(void)
 {
-  check ("default charset", &all_units[0], &single_input[0], NULL);
-  check ("utf-8", &foo_unit[0], &all_inputs[0], "utf-8");
-  check ("utf-16", &foo_unit[0], &all_inputs[0], "utf-16");
+  check ("default charset", &all_units[0], &single_input[0], NULL, NULL);
+  check ("utf-8", &foo_unit[0], &all_inputs[0], "utf-8", NULL);
+  check ("utf-16", &foo_unit[0], &all_inputs[0], "utf-16", NULL);
+  check ("utf-8, scan headers", &foo_unit[0], &all_inputs[0], "utf-8",
+	 &scan_options);
+  check_invalid_jobs ();
   puts("Done.");
   return 0;
 }
@@ -0,0 +1,129 @@
+"""
+Karkkainen-Sanders skew algorithm for suffix array construction, as it used to
+be implemented in detect_copy_paste_sa.py. This is used as a reference for the
+current implementation.
+
+Note that the original version had two bugs, which gave wrong suffix arrays
+for most inputs with repeated substrings. They are fixed here:
+
+* after the recursive call, the ranks of the sample suffixes were not stored
+  back in ``s12``;
+* in the merge step, the comparison for suffixes starting at positions
+  ``i % 3 == 2`` was also used for positions ``i % 3 == 1`` when the first
+  comparison failed.
+"""
+
+
+# Suffix array computation in linear time using Karkkainen Sanders skew
+# algorithm. This is the exact implementation found at the end of the
+# original paper (in C++ in the paper).
+# Original paper can be found at:
+# <https://pdfs.semanticscholar.org/8dfc/1a49894632a27a88490db18441180a215fe2.pdf>.
+#
+# For note this algorithm was the first to propose linear time SA
+# construction. A faster one has been discovered since:
+# Nong, Ge; Zhang, Sen; Chan, Wai Hong (2009). Linear Suffix Array Construction
+# by Almost Pure Induced-Sorting. 2009 Data Compression Conference.
+#
+# Also in 2009 a new algorithm was found to handle in linear time dynamic
+# suffix array (compute a suffix array after insertion/deletion of part of
+# the input).
+
+def radix_pass(a, b, r, n, k):
+    c = [0] * (k + 1)
+    for i in range(n):
+        c[r[a[i]]] += 1
+    s = 0
+    for i in range(k + 1):
+        t = c[i]
+        c[i] = s
+        s += t
+    for i in range(n):
+        b[c[r[a[i]]]] = a[i]
+        c[r[a[i]]] += 1
+
+
+def suffix_array(s, k=256, n=None):
+    SA = []
+    if n is None:
+        n = len(s)
+        s += [0, 0, 0]
+
+    n0 = (n + 2) // 3
+    n1 = (n + 1) // 3
+    n2 = n // 3
+    n02 = n0 + n2
+
+    s12 = [0] * (n02 + 3)
+    SA12 = [0] * (n02 + 3)
+    s0 = [0] * n0
+    SA0 = [0] * n0
+    j = 0
+    for i in range(n + (n0 - n1)):
+        if i % 3 != 0:
+            s12[j] = i
+            j += 1
+
+    # radix sort of s12 triples
+    radix_pass(s12, SA12, s[2:], n02, k)
+    radix_pass(SA12, s12, s[1:], n02, k)
+    radix_pass(s12, SA12, s, n02, k)
+
+    name = 0
+    c0 = c1 = c2 = -1
+    for i in range(n02):
+        if s[SA12[i]] != c0 or s[SA12[i] + 1] != c1 or s[SA12[i] + 2] != c2:
+            name += 1
+            c0 = s[SA12[i]]
+            c1 = s[SA12[i] + 1]
+            c2 = s[SA12[i] + 2]
+        if SA12[i] % 3 == 1:
+            s12[SA12[i] // 3] = name
+        else:
+            s12[SA12[i] // 3 + n0] = name
+
+    if name < n02:
+        SA12 = suffix_array(s12, name, n02)
+        for i in range(n02):
+            s12[SA12[i]] = i + 1
+    else:
+        for i in range(n02):
+            SA12[s12[i] - 1] = i
+
+    j = 0
+    for i in range(n02):
+        if SA12[i] < n0:
+            s0[j] = 3 * SA12[i]
+            j += 1
+    radix_pass(s0, SA0, s, n0, k)
+    p = 0
+    t = n0 - n1
+    for k in range(n):
+        i = SA12[t] * 3 + 1 \
+            if SA12[t] < n0 else (SA12[t] - n0) * 3 + 2
+        j = SA0[p]
+        if (
+            (s[i], s12[SA12[t] + n0]) <= (s[j], s12[j // 3])
+            if SA12[t] < n0 else
+            (s[i], s[i + 1], s12[SA12[t] - n0 + 1])
+            <= (s[j], s[j + 1], s12[j // 3 + n0])
+        ):
+            SA.append(i)
+            t += 1
+            if t == n02:
+                k += 1
+                while p < n0:
+                    SA.append(SA0[p])
+                    p += 1
+                break
+        else:
+            SA.append(j)
+            p += 1
+            if p == n0:
+                while t < n02:
+                    SA.append(SA12[t] * 3 + 1 if SA12[t] < n0
+                              else (SA12[t] - n0) * 3 + 2)
+                    t += 1
+                break
+
+    return SA
@@ -0,0 +1,91 @@
+"""
+Check the suffix array and LCP array computations in detect_copy_paste_sa.py
+against naive computations and against the skew algorithm it used to
+implement (see skew.py).
+
+This also compares the time both suffix array implementations take on an
+input that looks like the hash stream of a code base with copy-pastes: in
+perf mode, these are recorded as the "sa_is" and "skew" phases.
+"""
+
+from array import array
+import random
+import sys
+
+from perf import phase
+from utils import in_contrib
+
+
+sys.path.append(in_contrib())
+import detect_copy_paste_sa
+import skew
+
+
+def naive_suffix_array(s):
+    return sorted(range(len(s)), key=lambda i: s[i:])
+
+
+def naive_lcp(s, i, j):
+    result = 0
+    while i + result < len(s) and j + result < len(s) \
+            and s[i + result] == s[j + result]:
+        result += 1
+    return result
+
+
+def code_stream(rng, size):
+    """
+    Return a list of ``size`` integers that looks like the hash stream
+    computed for a code base: small symbols, copy-pasted blocks and unique
+    markers at the end of each file.
+    """
+    result = []
+    marker = 1000
+    while len(result) < size:
+        for _ in range(rng.randint(50, 500)):
+            if result and rng.random() < 0.02:
+                start = rng.randrange(len(result))
+                result += result[start:start + rng.randint(10, 100)]
+            else:
+                result.append(rng.randint(1, 200))
+        result.append(marker)
+        marker += 1
+    return result[:size], marker
+
+
+rng = random.Random(1)
+
+# Small inputs with small alphabets have many repeated substrings, which
+# exercise the recursion of SA-IS.
+nb_checks = 0
+for _ in range(2000):
+    upper = rng.randint(1, 4)
+    s = [rng.randint(1, upper) for _ in range(rng.randint(0, 60))]
+    sa = detect_copy_paste_sa.suffix_array(array('i', s), upper)
+    lcp = detect_copy_paste_sa.lcp_array(array('i', s), sa)
+
+    expected_sa = naive_suffix_array(s)
+    assert list(sa) == expected_sa, (s, list(sa), expected_sa)
+    assert list(lcp) == [naive_lcp(s, sa[i], sa[i + 1])
+                         for i in range(len(s) - 1)], (s, list(lcp))
+    if len(s) > 2:
+        assert list(sa) == skew.suffix_array(list(s), k=upper), s
+    nb_checks += 1
+print("Small inputs: {} checks passed".format(nb_checks))
+
+s, upper = code_stream(rng, 50000)
+with phase("sa_is"):
+    sa = detect_copy_paste_sa.suffix_array(array('i', s), upper)
+with phase("lcp"):
+    lcp = detect_copy_paste_sa.lcp_array(array('i', s), sa)
+with phase("skew"):
+    expected_sa = skew.suffix_array(list(s), k=upper)
+print("Big input: same suffix array as skew: {}".format(
+    list(sa) == expected_sa
+))
+print("Big input: LCP array matches: {}".format(all(
+    lcp[i] == naive_lcp(s, sa[i], sa[i + 1])
+    for i in range(0, len(s) - 1, 97)
+)))
+
+print("Done")
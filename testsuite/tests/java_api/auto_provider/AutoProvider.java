@@ -9,7 +9,12 @@ import com.adacore.libadalang.Libadalang;
  * Test that auto providers work as expected
  */
 public class AutoProvider {
-    private static void doTest(String[] args, String charset) {
+    private static void doTest(
+        String[] args,
+        String charset,
+        boolean scanHeaders,
+        int jobs
+    ) {
         final String projectPath = args[0];
         final String sourceA = Paths.get(projectPath, "a.ads").toString();
         final String sourceC = Paths.get(projectPath, "c.ads").toString();
@@ -24,7 +29,10 @@ public class AutoProvider {
             final Libadalang.UnitProvider unitProvider =
                 Libadalang.createAutoProvider(
                     new String[] {sourceA, sourceC, sourceD},
-                    charset
+                    charset,
+                    scanHeaders,
+                    null,
+                    jobs
                 );
             final Libadalang.AnalysisContext context =
                 Libadalang.AnalysisContext.create(
@@ -62,9 +70,11 @@ public class AutoProvider {
 
     public static void main(String[] args) {
         System.out.println("Using null charset:");
-        doTest(args, null);
+        doTest(args, null, false, 1);
         System.out.println("Using utf-8 charset:");
-        doTest(args, "utf-8");
+        doTest(args, "utf-8", false, 1);
+        System.out.println("Using header scanning and 2 jobs:");
+        doTest(args, null, true, 2);
     }
 }
 
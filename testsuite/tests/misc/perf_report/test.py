@@ -0,0 +1,41 @@
+"""
+Check how the perf_report.py script decides that metrics regressed,
+especially with too few samples for the statistical test to be significant.
+"""
+
+import os.path
+import sys
+
+from utils import LAL_ROOTDIR
+
+
+sys.path.append(os.path.join(LAL_ROOTDIR, "testsuite"))
+import perf_report
+
+
+def report(samples):
+    return {"version": perf_report.REPORT_VERSION,
+            "tests": {"t": {"time": samples}}}
+
+
+for n in (3, 4):
+    print(f"min p-value for {n} vs {n} samples:"
+          f" {perf_report.min_p_value(n, n):.4f}")
+print("")
+
+for label, base, new in [
+    ("1 vs 1, increased", [1.0], [2.0]),
+    ("3 vs 3, increased", [1.0, 1.1, 1.2], [2.0, 2.1, 2.2]),
+    ("3 vs 3, stable", [1.0, 1.1, 1.2], [1.0, 1.1, 1.2]),
+    ("5 vs 5, increased", [1.0, 1.1, 1.2, 1.0, 1.1],
+     [2.0, 2.1, 2.2, 2.0, 2.1]),
+    ("5 vs 5, noisy", [1.0, 3.0, 1.2, 3.1, 1.1],
+     [1.0, 3.0, 1.5, 3.2, 1.4]),
+]:
+    [(_, _, _, _, p_value, regression)] = perf_report.compare(
+        report(base), report(new), threshold=0.05, alpha=0.05
+    )
+    p = "n/a" if p_value is None else f"{p_value:.3f}"
+    print(f"{label}: p={p}, regression={regression}")
+
+print("Done")
@@ -3,8 +3,7 @@ open Libadalang
 (* Test that the auto unit provider correclty works and Libadalang is able to
  * get the reference of a node that is declared in another unit *)
 
-let () =
-  let unit_provider = UnitProvider.auto ["src1/p1.ads"; "p2.ads"] in
+let test unit_provider =
   let ctx = AnalysisContext.create ~unit_provider () in
   let filename = "p2.ads" in
   let u = AnalysisContext.get_from_file ctx filename in
@@ -27,3 +26,7 @@ let () =
     subtype_indication
     (Format.pp_print_list pp_node)
     matching_nodes
+
+let () =
+  test (UnitProvider.auto ["src1/p1.ads"; "p2.ads"]) ;
+  test (UnitProvider.auto ~scan_headers:true ~jobs:2 ["src1/p1.ads"; "p2.ads"])
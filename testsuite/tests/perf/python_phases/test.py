@@ -0,0 +1,37 @@
+"""
+Parse the sources given on the command line, populate their lexical
+environments and resolve names in them, measuring each phase separately in
+perf mode.
+"""
+
+import sys
+
+import libadalang as lal
+from perf import phase
+
+
+ctx = lal.AnalysisContext()
+
+with phase("parse"):
+    units = [ctx.get_from_file(f) for f in sys.argv[1:]]
+for u in units:
+    assert not u.diagnostics, u.diagnostics
+
+with phase("populate_lexical_env"):
+    for u in units:
+        u.populate_lexical_env()
+
+with phase("properties"):
+    failures = 0
+    for u in units:
+        for node in u.root.findall(lal.AdaNode):
+            if node.p_xref_entry_point:
+                try:
+                    if not node.p_resolve_names:
+                        failures += 1
+                except lal.PropertyError:
+                    failures += 1
+
+print("Units:", len(units))
+print("Failures:", failures)
+print("Done")
@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure A is
+begin
+   Pkg.P;
+end A;
@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure B is
+begin
+   Pkg.P;
+end B;
@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure C is
+begin
+   Pkg.Q;
+end C;
@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure D is
+begin
+   Pkg.P;
+end D;
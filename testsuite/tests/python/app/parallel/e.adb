@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure E is
+begin
+   Pkg.P;
+end E;
@@ -0,0 +1,6 @@
+with Pkg;
+
+procedure F is
+begin
+   Pkg.Q;
+end F;
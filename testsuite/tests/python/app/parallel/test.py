@@ -0,0 +1,48 @@
+"""
+Check that lal.App can process units in parallel jobs, and that the results of
+all jobs are sent back to the main process. Also check that jobs use the unit
+provider of the application when it is not created from a project.
+"""
+
+import glob
+import os.path
+
+import libadalang as lal
+
+
+class App(lal.App):
+    def job_setup(self):
+        self.resolved = []
+
+    def process_unit(self, unit):
+        for call in unit.root.findall(lal.CallStmt):
+            decl = call.f_call.p_referenced_decl()
+            self.resolved.append(
+                (os.path.basename(unit.filename), decl.p_fully_qualified_name)
+            )
+
+    def job_post_process(self):
+        return (self.job_id, self.resolved)
+
+    def app_post_process(self, results):
+        print(f"{len(results)} jobs")
+        print(f"{len(self.units)} units parsed in the main process")
+        for i, (job_id, _) in enumerate(results):
+            assert i == job_id
+        for filename, name in sorted(
+            r for _, resolved in results for r in resolved
+        ):
+            print(f"{filename}: {name}")
+        print("")
+
+
+class AutoApp(App):
+    def create_unit_provider(self):
+        self.project = None
+        return lal.UnitProvider.auto(sorted(glob.glob("*.ad?")))
+
+
+App.run(["-Pp.gpr", "-j3"])
+App.run(["-Pp.gpr", "-j1"])
+AutoApp.run(["-j3"] + sorted(glob.glob("?.adb")))
+print("Done.")
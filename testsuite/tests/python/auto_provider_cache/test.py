@@ -0,0 +1,112 @@
+"""
+Check that the auto provider cache file is used for unchanged source files
+only.
+"""
+
+import os
+import os.path
+import shutil
+import threading
+
+import libadalang as lal
+
+
+SPEC = lal.AnalysisUnitKind.unit_specification
+BODY = lal.AnalysisUnitKind.unit_body
+
+CACHE_FILE = os.path.abspath("auto_provider.cache")
+
+os.mkdir("src")
+
+
+def write_source(filename, content, mtime=None):
+    path = os.path.join("src", filename)
+    with open(path, "w") as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+def check(label, tests, **kwargs):
+    print(f"== {label} ==")
+    print("")
+    files = sorted(
+        os.path.join("src", f) for f in os.listdir("src")
+    )
+    up = lal.UnitProvider.auto(files, cache_file=CACHE_FILE, **kwargs)
+    ctx = lal.AnalysisContext(unit_provider=up)
+    for unit_name, unit_kind in tests:
+        unit = ctx.get_from_provider(unit_name, unit_kind)
+        if unit.diagnostics and unit.diagnostics[0].message.startswith(
+            "Could not find source file"
+        ):
+            result = "<not found>"
+        else:
+            result = os.path.basename(unit.filename)
+        print(f"{unit_name}/{unit_kind}: {result}")
+    print("")
+
+
+TESTS = [("pkg", SPEC), ("abc", BODY), ("xyz", BODY), ("new_unit", SPEC)]
+
+write_source("pkg.ads", "package Pkg is\nend Pkg;\n", mtime=1000000000)
+write_source(
+    "main.adb", "procedure Abc is\nbegin\n   null;\nend Abc;\n",
+    mtime=1000000000,
+)
+
+# The first run creates the cache file
+check("No cache file", TESTS)
+assert os.path.exists(CACHE_FILE)
+
+# Change the content of main.adb without changing its size nor its
+# modification time: the content digest shows that the cache entry is
+# outdated, so the file must be parsed again. Also add a new source file: it
+# must be parsed.
+write_source(
+    "main.adb", "procedure Xyz is\nbegin\n   null;\nend Xyz;\n",
+    mtime=1000000000,
+)
+write_source("new_unit.ads", "package New_Unit is\nend New_Unit;\n")
+check("Same size and modification time", TESTS)
+
+# Touch main.adb without changing its content: the cache entry is still valid
+os.utime(os.path.join("src", "main.adb"), (1000000010, 1000000010))
+check("Updated modification time", TESTS)
+
+# The cache must be ignored when the discovery settings change
+write_source(
+    "main.adb", "procedure Abc is\nbegin\n   null;\nend Abc;\n",
+    mtime=1000000010,
+)
+check("Different settings", TESTS, scan_headers=True)
+
+# Invalid cache files must be ignored (and then overwritten)
+with open(CACHE_FILE, "w") as f:
+    f.write("garbage\n")
+check("Invalid cache file", TESTS)
+with open(CACHE_FILE) as f:
+    print("Cache file rewritten:", f.readline() != "garbage\n")
+
+# Several writers updating the same cache file concurrently must leave a
+# valid cache file and no temporary file behind.
+write_source("main.adb", "procedure Abc is\nbegin\n   null;\nend Abc;\n")
+files = sorted(os.path.join("src", f) for f in os.listdir("src"))
+threads = [
+    threading.Thread(
+        target=lambda: lal.UnitProvider.auto(files, cache_file=CACHE_FILE)
+    )
+    for _ in range(4)
+]
+for t in threads:
+    t.start()
+for t in threads:
+    t.join()
+print("Temporary files left:", sorted(
+    f for f in os.listdir(".") if f.startswith("auto_provider.cache.")
+))
+check("Concurrent writers", TESTS)
+
+shutil.rmtree("src")
+os.remove(CACHE_FILE)
+print("Done.")
@@ -0,0 +1,101 @@
+"""
+Check that creating an auto provider with several jobs gives the same results
+as with a single job, in particular when the same compilation unit is found in
+several source files: the first one must always win.
+"""
+
+import os
+import os.path
+import shutil
+
+import libadalang as lal
+
+
+SPEC = lal.AnalysisUnitKind.unit_specification
+BODY = lal.AnalysisUnitKind.unit_body
+
+os.mkdir("src")
+
+
+def write_source(filename, content):
+    with open(os.path.join("src", filename), "w") as f:
+        f.write(content)
+
+
+# Generate enough source files so that all jobs get some work
+for i in range(50):
+    write_source(
+        f"pkg_{i:02}.ads", f"package Pkg_{i:02} is\nend Pkg_{i:02};\n"
+    )
+    write_source(
+        f"pkg_{i:02}.adb", f"package body Pkg_{i:02} is\nend Pkg_{i:02};\n"
+    )
+
+# Several source files contain the same compilation unit: the first one in the
+# list of input files is expected to win.
+for name in ("dup_1.ads", "dup_2.ads", "dup_3.ads"):
+    write_source(name, "package Dup is\nend Dup;\n")
+
+# Files with syntax errors are discarded
+write_source("broken.adb", "package body Broken is\n")
+
+FILES = sorted(os.path.join("src", f) for f in os.listdir("src"))
+
+TESTS = [
+    ("pkg_00", SPEC),
+    ("pkg_00", BODY),
+    ("pkg_49", SPEC),
+    ("pkg_49", BODY),
+    ("dup", SPEC),
+    ("broken", BODY),
+]
+
+
+def resolve(jobs, **kwargs):
+    """
+    Create an auto provider for FILES with the given number of jobs and return
+    the list of source files it associates to each unit in TESTS.
+    """
+    up = lal.UnitProvider.auto(FILES, jobs=jobs, **kwargs)
+    ctx = lal.AnalysisContext(unit_provider=up)
+    result = []
+    for unit_name, unit_kind in TESTS:
+        unit = ctx.get_from_provider(unit_name, unit_kind)
+        if unit.diagnostics and unit.diagnostics[0].message.startswith(
+            "Could not find source file"
+        ):
+            result.append("<not found>")
+        else:
+            result.append(os.path.basename(unit.filename))
+    return result
+
+
+for label, kwargs in [
+    ("Full parsing", {}),
+    ("Header scanning", {"scan_headers": True}),
+]:
+    print(f"== {label} ==")
+    print("")
+    expected = resolve(1, **kwargs)
+    for (unit_name, unit_kind), filename in zip(TESTS, expected):
+        print(f"{unit_name}/{unit_kind}: {filename}")
+    print("")
+
+    for jobs in (2, 8, 0):
+        result = resolve(jobs, **kwargs)
+        if result != expected:
+            print(f"Mismatch with jobs={jobs}: {result}")
+        else:
+            print(f"Same results with jobs={jobs}")
+    print("")
+
+try:
+    lal.UnitProvider.auto(FILES, jobs=-1)
+except ValueError as exc:
+    print(f"Negative jobs: ValueError: {exc}")
+else:
+    print("Negative jobs: no error")
+print("")
+
+shutil.rmtree("src")
+print("Done.")
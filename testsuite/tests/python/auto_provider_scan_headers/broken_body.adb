@@ -0,0 +1,6 @@
+package body Broken is
+   procedure P is
+   begin
+      null
+   end P;
+end Broken;
@@ -0,0 +1 @@
+pragma No_Body;
@@ -0,0 +1,5 @@
+separate (Pkg)
+procedure Sub is
+begin
+   null;
+end Sub;
@@ -0,0 +1,3 @@
+package body Pkg is
+   procedure Sub is separate;
+end;
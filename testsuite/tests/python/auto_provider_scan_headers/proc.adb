@@ -0,0 +1,5 @@
+procedure Proc (X : Integer) is
+begin
+   null;
+end Proc;
+pragma Annotate (Foo, Proc);
@@ -0,0 +1,51 @@
+"""
+Check that the auto provider finds the same compilation units whether it
+parses source files or only scans their headers.
+"""
+
+import glob
+import os.path
+
+import libadalang as lal
+
+
+SPEC = lal.AnalysisUnitKind.unit_specification
+BODY = lal.AnalysisUnitKind.unit_body
+
+UNITS = [
+    ("pkg", SPEC),
+    ("pkg", BODY),
+    ("pkg.sub", BODY),
+    ("pkg.child", SPEC),
+    ("gen", SPEC),
+    ("inst", SPEC),
+    ("ren", SPEC),
+    ("proc", SPEC),
+    ("proc", BODY),
+    ("multi", SPEC),
+    ("multi", BODY),
+    ("no_body", BODY),
+    ("broken", BODY),
+]
+
+input_files = sorted(glob.glob("*.ad?"))
+
+for scan_headers in (False, True):
+    print(f"== scan_headers={scan_headers} ==")
+    print("")
+    up = lal.UnitProvider.auto(input_files, scan_headers=scan_headers)
+    ctx = lal.AnalysisContext(unit_provider=up)
+    for unit_name, unit_kind in UNITS:
+        unit = ctx.get_from_provider(unit_name, unit_kind)
+        if unit.diagnostics and unit.diagnostics[0].message.startswith(
+            "Could not find source file"
+        ):
+            result = "<not found>"
+        else:
+            result = os.path.basename(unit.filename)
+            if unit.diagnostics:
+                result += " (with parsing errors)"
+        print(f"{unit_name}/{unit_kind}: {result}")
+    print("")
+
+print("Done.")
@@ -0,0 +1,52 @@
+"""
+Check that ``find_all_derived_types`` stays correct when one of the units it
+looks at is reparsed.
+"""
+
+import libadalang as lal
+
+
+ctx = lal.AnalysisContext()
+pkg = ctx.get_from_file("pkg.ads")
+other = ctx.get_from_file("other.ads")
+units = [pkg, other]
+
+
+def check(label):
+    print(f"== {label} ==")
+    for u in units:
+        assert not u.diagnostics, u.diagnostics
+
+    root = pkg.root.find(
+        lambda n: n.is_a(lal.TypeDecl) and n.p_defining_name.text == "Root"
+    )
+    for td in root.p_find_all_derived_types(units):
+        print(f"{td.p_defining_name.text} ({td.unit.filename.split('/')[-1]})")
+    print("")
+
+
+check("Initial sources")
+
+other.reparse(
+    buffer=other.text.replace(
+        "end Other;",
+        "   type Other_Child is new Pkg.Root with null record;\nend Other;",
+    )
+)
+check("New derived type in other.ads")
+
+other.reparse(
+    buffer=other.text.replace(
+        "   type Grand_Child is new Pkg.Child with null record;\n", ""
+    )
+)
+check("Removed derived type in other.ads")
+
+pkg.reparse(
+    buffer=pkg.text.replace(
+        "type Child is new Root", "type Child is tagged null record; --"
+    )
+)
+check("Child no longer derives from Root")
+
+print("Done")
@@ -0,0 +1,45 @@
+"""
+Check that ``find_all_derived_types`` returns the same types as
+``is_derived_type`` would for queries on classwide types, on private and full
+views of types, and for derivations through subtypes.
+"""
+
+import libadalang as lal
+
+
+ctx = lal.AnalysisContext()
+shapes = ctx.get_from_file("shapes.ads")
+other = ctx.get_from_file("other.ads")
+units = [shapes, other]
+for u in units:
+    assert not u.diagnostics, u.diagnostics
+
+
+def decl(name, line):
+    """
+    Return the type declaration for ``name`` at the given line in shapes.ads.
+    """
+    return shapes.root.find(
+        lambda n: n.is_a(lal.BaseTypeDecl)
+        and n.p_defining_name.text == name
+        and n.sloc_range.start.line == line
+    )
+
+
+def check(label, query):
+    print(f"== {label} ==")
+    for td in query.p_find_all_derived_types(units):
+        filename = td.unit.filename.split("/")[-1]
+        print(
+            f"{td.p_defining_name.text}"
+            f" ({filename}:{td.sloc_range.start.line})"
+        )
+    print("")
+
+
+check("Shape (private view)", decl("Shape", 2))
+check("Shape (full view)", decl("Shape", 6))
+check("Shape'Class", decl("Shape", 2).p_classwide_type)
+check("Any_Shape", decl("Any_Shape", 3))
+check("Circle (private view)", decl("Circle", 4))
+print("Done")
@@ -0,0 +1,9 @@
+with Ada.Text_IO; use Ada.Text_IO;
+with Pkg; use Pkg;
+
+procedure Main is
+   S : Square := (X => 2, Y => 2);
+begin
+   Put_Line (Integer'Image (Area (S)));
+   Put_Line (Integer'Image (Area (Shape (S)) + S.X));
+end Main;
@@ -0,0 +1,141 @@
+"""
+Check the API to configure the collection of lexical env caches and to get
+statistics about them.
+"""
+
+import libadalang as lal
+
+
+ctx = lal.AnalysisContext()
+ctx.set_env_caches_collection_policy(
+    kind="lru", threshold_increment=50000, lru_max_age=2, memory_budget=2**32
+)
+ctx.set_env_caches_collection_policy(kind="never")
+
+u = ctx.get_from_file("main.adb")
+assert not u.diagnostics, u.diagnostics
+for n in u.root.findall(lal.Name):
+    if n.p_is_xref_entry_point:
+        n.p_resolve_names
+
+unit_stats = ctx.env_caches_stats(u)
+ctx_stats = ctx.env_caches_stats()
+print("context lookups > 0:", ctx_stats.lookups > 0)
+print("context hits <= lookups:", ctx_stats.hits <= ctx_stats.lookups)
+print("unit lookups <= context lookups:",
+      unit_stats.lookups <= ctx_stats.lookups)
+print("unit entries <= context entries:",
+      unit_stats.entries <= ctx_stats.entries)
+print("collections:", ctx_stats.collections, unit_stats.collections)
+print("")
+
+
+# Check which units get their caches collected. Each group of units is made of
+# a package with many declarations and of a procedure that references all of
+# them: resolving the procedure creates cache entries mostly for these two
+# units.
+
+DECL_COUNT = 1000
+MAX_GROUPS = 40
+
+
+def resolve_group(ctx, i):
+    """
+    Create the units for the ``i``th group in ``ctx``, resolve all names in
+    its procedure, and return its package unit.
+    """
+    decls = "".join(
+        f"   V_{j} : Integer := {j};\n" for j in range(DECL_COUNT)
+    )
+    stmts = "".join(f"   X := X + V_{j};\n" for j in range(DECL_COUNT))
+    pkg = ctx.get_from_buffer(
+        f"pkg_{i}.ads", f"package Pkg_{i} is\n{decls}end Pkg_{i};\n"
+    )
+    main = ctx.get_from_buffer(
+        f"main_{i}.adb",
+        f"with Pkg_{i}; use Pkg_{i};\n"
+        f"procedure Main_{i} is\n"
+        f"   X : Integer := 0;\n"
+        f"begin\n{stmts}end Main_{i};\n",
+    )
+    for u in (pkg, main):
+        assert not u.diagnostics, u.diagnostics
+    for n in main.root.findall(lal.Name):
+        if n.p_is_xref_entry_point:
+            n.p_resolve_names
+    return pkg
+
+
+def collected(ctx, pkgs):
+    """
+    Return whether caches were collected for each unit in ``pkgs``.
+    """
+    return [ctx.env_caches_stats(u).collections > 0 for u in pkgs]
+
+
+def first_collected(ctx, pkgs):
+    """
+    Return whether caches were collected for the first unit in ``pkgs``.
+    """
+    return bool(pkgs) and ctx.env_caches_stats(pkgs[0]).collections > 0
+
+
+def resolve_groups(ctx, pkgs):
+    """
+    Resolve new groups until the caches of the first package are collected.
+    """
+    while len(pkgs) < MAX_GROUPS and not first_collected(ctx, pkgs):
+        pkgs.append(resolve_group(ctx, len(pkgs)))
+
+
+def report(label, flags):
+    print(f"{label}: first package collected: {flags[0]}")
+    print(f"{label}: last package collected: {flags[-1]}")
+
+
+# With the LRU policy, caches for packages that were not used since the
+# previous collection attempt are collected: the collected packages must be
+# the oldest ones. Setting the threshold alone must keep the LRU kind.
+
+ctx = lal.AnalysisContext()
+ctx.set_env_caches_collection_policy(kind="lru", lru_max_age=1)
+ctx.set_env_caches_collection_policy(threshold_increment=10000)
+pkgs = []
+resolve_groups(ctx, pkgs)
+flags = collected(ctx, pkgs)
+report("LRU", flags)
+print("LRU: least recently used packages collected:",
+      flags == sorted(flags, reverse=True))
+print("")
+
+# With the "never" policy, caches are collected only to honor the memory
+# budget, least recently used units first.
+
+ctx = lal.AnalysisContext()
+ctx.set_env_caches_collection_policy(kind="never", threshold_increment=10000)
+pkgs = [resolve_group(ctx, 0)]
+print("Budget: collections without budget:",
+      ctx.env_caches_stats().collections)
+entries = ctx.env_caches_stats().entries
+ctx.set_env_caches_collection_policy(memory_budget=256 * (entries + 25000))
+resolve_groups(ctx, pkgs)
+report("Budget", collected(ctx, pkgs))
+print("")
+
+# Invalid policies must be rejected
+
+for kwargs in [
+    {"kind": "fifo"},
+    {"threshold_increment": 0},
+    {"min_entry_count": -1},
+    {"lru_max_age": 0},
+    {"memory_budget": -1},
+]:
+    try:
+        ctx.set_env_caches_collection_policy(**kwargs)
+    except (ValueError, lal.PreconditionFailure) as exc:
+        print(f"{kwargs}: {type(exc).__name__}: {exc}")
+    else:
+        print(f"{kwargs}: no error")
+
+print("Done")
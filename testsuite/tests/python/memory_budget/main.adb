@@ -0,0 +1,8 @@
+with Pkg; use Pkg;
+
+procedure Main is
+   C : Count := 0;
+begin
+   C := Next (C);
+   C := Next (Next (C));
+end Main;
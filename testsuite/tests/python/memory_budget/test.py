@@ -0,0 +1,87 @@
+"""
+Check that the memory budget of an analysis context resets units, least
+recently queried first, that reset units are resolved again transparently,
+and that node references remain valid.
+"""
+
+import libadalang as lal
+
+
+def resolve(unit):
+    """
+    Return the declaration that each identifier in ``unit`` references.
+    """
+    return [
+        (str(id), str(id.p_referenced_decl()))
+        for id in unit.root.findall(lal.Identifier)
+    ]
+
+
+ctx = lal.AnalysisContext()
+u = ctx.get_from_file("main.adb")
+assert not u.diagnostics, u.diagnostics
+ids = u.root.findall(lal.Identifier)
+
+expected = resolve(u)
+stats = ctx.memory_budget_stats()
+print("estimated size > 0:", stats.estimated_size > 0)
+print("evictions:", stats.evictions, "reloads:", stats.reloads)
+
+# A budget that nothing fits in evicts all units
+ctx.set_memory_budget(1)
+stats = ctx.memory_budget_stats()
+print("after eviction: size:", stats.estimated_size,
+      "evictions > 0:", stats.evictions > 0)
+
+# Node references must still be valid, and resolution must give the same
+# results.
+print("same nodes:", [str(id) for id in ids] == [e[0] for e in expected])
+print("same results:", resolve(u) == expected)
+stats = ctx.memory_budget_stats()
+print("reloads > 0:", stats.reloads > 0)
+
+# Explicitly enforcing the budget evicts again
+evictions = stats.evictions
+ctx.enforce_memory_budget()
+stats = ctx.memory_budget_stats()
+print("evicted again:", stats.evictions > evictions)
+
+# Without budget, nothing is evicted
+ctx.set_memory_budget(0)
+resolve(u)
+evictions = ctx.memory_budget_stats().evictions
+ctx.enforce_memory_budget()
+print("no eviction without budget:",
+      ctx.memory_budget_stats().evictions == evictions)
+
+try:
+    ctx.set_memory_budget(-1)
+except lal.PreconditionFailure as exc:
+    print(f"PreconditionFailure: {exc}")
+
+# Resetting the least recently queried units makes the memory size and the
+# number of units holding data go down, and keeps the data of the most
+# recently queried unit.
+ctx = lal.AnalysisContext()
+main = ctx.get_from_file("main.adb")
+pkg = ctx.get_from_file("pkg.ads")
+resolve(pkg)
+expected = resolve(main)
+
+# Query main.adb again so that it is the most recently used unit (memoized
+# resolutions do not query other units).
+resolve(main)
+before = ctx.memory_budget_stats()
+print("several units hold data:", before.units > 1)
+
+ctx.set_memory_budget(before.estimated_size - 1)
+after = ctx.memory_budget_stats()
+print("unit count went down:", after.units < before.units)
+print("size went down:", after.estimated_size < before.estimated_size)
+print("fits in budget:", after.estimated_size <= before.estimated_size - 1)
+
+ctx.reset_nameres_memo_stats()
+print("main.adb kept:", resolve(main) == expected,
+      ctx.nameres_memo_stats().misses == 0)
+
+print("Done")
@@ -0,0 +1,8 @@
+with A; use A;
+
+procedure Main_A is
+   C : Count := 0;
+begin
+   C := Next (C);
+   C := Next (Next (C));
+end Main_A;
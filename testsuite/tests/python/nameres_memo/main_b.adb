@@ -0,0 +1,8 @@
+with B; use B;
+
+procedure Main_B is
+   F : Flag := Off;
+begin
+   F := Toggle (F);
+   F := Toggle (Toggle (F));
+end Main_B;
@@ -0,0 +1,79 @@
+"""
+Check that with dependency-scoped invalidation, reparsing a unit discards
+only the memoized resolutions of the units that depend on it, and that the
+memoization counters reflect it. Also check that the solver time is
+measured only when solver profiling is enabled.
+"""
+
+import libadalang as lal
+
+
+def resolve(unit):
+    """
+    Return the declaration that each identifier in ``unit`` references.
+    """
+    result = []
+    for id in unit.root.findall(lal.Identifier):
+        try:
+            result.append((str(id), str(id.p_referenced_decl())))
+        except lal.PropertyError as exc:
+            result.append((str(id), f"<{exc}>"))
+    return result
+
+
+def run(scoped):
+    print(f"== dependency-scoped: {scoped} ==")
+    ctx = lal.AnalysisContext()
+    ctx.set_nameres_memo_dependency_scoped(scoped)
+    units = {
+        f: ctx.get_from_file(f)
+        for f in ("a.ads", "b.ads", "main_a.adb", "main_b.adb")
+    }
+    for u in units.values():
+        assert not u.diagnostics, u.diagnostics
+
+    expected = {f: resolve(units[f]) for f in ("main_a.adb", "main_b.adb")}
+    stats = ctx.nameres_memo_stats()
+    print(f"first resolution: misses > 0: {stats.misses > 0}")
+    print(
+        f"first resolution: equations > 0: {stats.equations > 0},"
+        f" timeouts: {stats.timeouts}"
+    )
+
+    # Change B, then resolve both main units again: only resolutions for
+    # main_b.adb (and b.ads) depend on B.
+    units["b.ads"].reparse(
+        buffer=units["b.ads"].text.replace("end B;", "   --  Edited\nend B;")
+    )
+    assert not units["b.ads"].diagnostics, units["b.ads"].diagnostics
+
+    for f in ("main_a.adb", "main_b.adb"):
+        ctx.reset_nameres_memo_stats()
+        actual = resolve(units[f])
+        stats = ctx.nameres_memo_stats()
+        print(
+            f"{f}: same results: {actual == expected[f]},"
+            f" all from memo: {stats.hits > 0 and stats.misses == 0},"
+            f" evictions: {stats.evictions > 0}"
+        )
+    print("")
+
+
+def run_profiling():
+    print("== solver profiling ==")
+    for enabled in (False, True):
+        ctx = lal.AnalysisContext()
+        ctx.set_nameres_memo_solver_profiling(enabled)
+        resolve(ctx.get_from_file("main_b.adb"))
+        stats = ctx.nameres_memo_stats()
+        print(
+            f"profiling: {enabled}, equations > 0: {stats.equations > 0},"
+            f" solver time > 0: {stats.solver_time > 0}"
+        )
+    print("")
+
+
+run(scoped=False)
+run(scoped=True)
+run_profiling()
+print("Done")
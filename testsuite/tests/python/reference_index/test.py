@@ -0,0 +1,66 @@
+"""
+Check that ``find_all_references`` returns the same results whether the
+reference index is enabled or not, including after a unit is reparsed.
+"""
+
+import libadalang as lal
+
+
+ctx = lal.AnalysisContext()
+units = [
+    ctx.get_from_file(f) for f in ("shapes.ads", "shapes.adb", "main.adb")
+]
+for u in units:
+    assert not u.diagnostics, u.diagnostics
+
+
+def all_references():
+    """
+    Return a mapping from each (defining name, imprecise fallback) pair in
+    the test units to the references that ``find_all_references`` finds for
+    it.
+    """
+    result = {}
+    for u in units:
+        for dn in u.root.findall(lal.DefiningName):
+            for imprecise in (False, True):
+                refs = dn.p_find_all_references(
+                    units, imprecise_fallback=imprecise
+                )
+                result[(str(dn), imprecise)] = [
+                    (str(r.ref), r.kind) for r in refs
+                ]
+    return result
+
+
+def check(label):
+    ctx.set_reference_index_enabled(False)
+    expected = all_references()
+    ctx.set_reference_index_enabled(True)
+    actual = all_references()
+    # Run queries twice, so that the second run uses the index built during
+    # the first one.
+    actual_again = all_references()
+
+    print(f"== {label} ==")
+    for key, refs in sorted(expected.items()):
+        if actual[key] != refs or actual_again[key] != refs:
+            print(f"Mismatch for {key[0]} (imprecise={key[1]}):")
+            print(f"  without index: {refs}")
+            print(f"  with index:    {actual[key]}")
+    print(f"{len(expected)} queries checked")
+    print("")
+
+
+check("Initial sources")
+
+# Add a dispatching call and reparse the unit: indexes must be rebuilt
+units[2].reparse(
+    buffer=units[2].text.replace(
+        "X := Area (Sq);", "X := Area (Sq);\n   X := Area (S) + X;"
+    )
+)
+assert not units[2].diagnostics, units[2].diagnostics
+check("After reparse")
+
+print("Done")
@@ -0,0 +1,9 @@
+with Pkg; use Pkg;
+
+procedure Main is
+   C : Count := 0;
+begin
+   C := Next (C);
+   C := Next (Next (C));
+   C := Unknown (C);
+end Main;
@@ -0,0 +1,69 @@
+"""
+Check that ``AdaNode.p_resolve_xrefs`` returns the same results as calling
+name resolution properties node by node.
+"""
+
+import libadalang as lal
+
+
+def node_by_node(root, imprecise_fallback):
+    """
+    Compute the expected result of ``root.p_resolve_xrefs``.
+    """
+    result = []
+    for n in root.findall(lal.Name):
+        if n.p_is_defining:
+            continue
+        ep = n
+        while ep is not None and not ep.p_xref_entry_point:
+            ep = ep.parent
+        try:
+            success = ep is not None and ep.p_resolve_names
+        except lal.PropertyError:
+            success = False
+        try:
+            typ = n.p_expression_type
+        except lal.PropertyError:
+            typ = None
+        result.append((
+            n,
+            n.p_failsafe_referenced_def_name(imprecise_fallback),
+            typ,
+            success,
+        ))
+    return result
+
+
+def image(entries):
+    return [
+        (str(ref), str(dn.def_name), str(dn.kind), str(typ), success)
+        for ref, dn, typ, success in entries
+    ]
+
+
+ctx = lal.AnalysisContext()
+u = ctx.get_from_file("main.adb")
+assert not u.diagnostics, u.diagnostics
+
+body = u.root.find(lal.HandledStmts)
+for imprecise_fallback in (False, True):
+    print(f"== imprecise_fallback={imprecise_fallback} ==")
+    for label, root in (("unit", u.root), ("body", body)):
+        actual = image(
+            (e.ref, e.def_name, e.expr_type, e.success)
+            for e in root.p_resolve_xrefs(imprecise_fallback)
+        )
+        expected = image(node_by_node(root, imprecise_fallback))
+        print(f"{label}: same results: {actual == expected}")
+        if actual != expected:
+            print("  actual:  ", actual)
+            print("  expected:", expected)
+    print("")
+
+# Name resolution fails only for the last statement
+for stmt in body.f_stmts:
+    entries = stmt.p_resolve_xrefs()
+    print(f"line {stmt.sloc_range.start.line}: {len(entries) > 0},"
+          f" {all(e.success for e in entries)}")
+
+print("Done")
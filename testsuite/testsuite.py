@@ -14,7 +14,7 @@ import shutil
 import statistics
 import subprocess
 import sys
-from typing import Any, Callable
+from typing import Any, Callable, Dict
 
 from e3.collection.dag import DAG
 from e3.testsuite import Testsuite, logger
@@ -27,6 +27,7 @@ from drivers import (
     inline_pg_driver, java_driver, name_resolution_driver, navigation_driver,
     ocaml_driver, parser_driver, prep_driver, python_driver, unparser_driver,
 )
+import perf_report
 
 
 class PerfTestFinder(YAMLTestFinder):
@@ -156,6 +157,13 @@ class LALTestsuite(Testsuite):
                  ' the default perf measurements (no profile). This is useful'
                  ' to get feedback quickly during development.'
         )
+        parser.add_argument(
+            '--perf-report-name', default='perf-report',
+            help='When running the testsuite in performance mode, base name'
+                 ' for the JSON and CSV reports created in the performance'
+                 ' mode directory ("perf-report" by default). Use the'
+                 ' perf_report.py script to compare JSON reports.'
+        )
 
         # Convenience options for developers
         parser.add_argument(
@@ -186,6 +194,7 @@ class LALTestsuite(Testsuite):
             for enabled, option in [
                 (opts.coverage, "--coverage"),
                 (opts.valgrind, "--valgrind"),
+                (opts.dda_compile, "--dda-compile"),
             ]:
                 if enabled:
                     logger.error(f"--perf-mode incompatible with {option}")
@@ -304,7 +313,8 @@ class LALTestsuite(Testsuite):
 
     def perf_report(self) -> None:
         """
-        Print a summary of performance metrics on the standard output.
+        Print a summary of performance metrics on the standard output and
+        write them to JSON and CSV reports in the performance mode directory.
         """
         print("Performance metrics:")
 
@@ -339,6 +349,40 @@ class LALTestsuite(Testsuite):
                   + compute_stats(entry.info["memory"], int, format_memory))
             if "callgrind" in entry.info:
                 print("  callgrind's Ir: " + entry.info["callgrind"])
+            for key, value in entry.info.items():
+                if key.startswith("phase-"):
+                    print(f"  {key[len('phase-'):]}: "
+                          + compute_stats(value, float, format_time))
+
+        # Write machine-readable reports
+        tests: Dict[str, perf_report.Metrics] = {}
+        profiles: Dict[str, Dict[str, str]] = {}
+        for test_name, entry in sorted(self.report_index.entries.items()):
+            metrics = perf_report.metrics_from_info(entry.info)
+            if metrics:
+                tests[test_name] = metrics
+            test_profiles = {
+                key: entry.info[key]
+                for key in ("time-profile", "memory-profile")
+                if key in entry.info
+            }
+            if test_profiles:
+                profiles[test_name] = test_profiles
+
+        report: perf_report.Report = {
+            "version": perf_report.REPORT_VERSION,
+            "machine": perf_report.machine_info(
+                os.path.dirname(self.root_dir)
+            ),
+            "tests": tests,
+            "profiles": profiles,
+        }
+        base = os.path.join(
+            self.env.perf_dir, self.env.options.perf_report_name
+        )
+        perf_report.write_json(report, base + ".json")
+        perf_report.write_csv(report, base + ".csv")
+        print(f"Reports written to {base}.json and {base}.csv")
 
 
 if __name__ == '__main__':
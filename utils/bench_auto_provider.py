@@ -0,0 +1,209 @@
+#! /usr/bin/env python
+
+"""
+Benchmark the creation of auto unit providers, with and without header
+scanning.
+
+This generates a directory of Ada sources (package specs and bodies with
+realistic context clauses and subprogram bodies, plus some subunits, generic
+packages and instantiations), and then times ``UnitProvider.auto`` on all of
+them, first with full parsing of source files, then with header scanning. It
+finally checks that both providers find the same compilation units.
+"""
+
+import argparse
+import os
+import os.path
+import shutil
+import tempfile
+import time
+
+import libadalang as lal
+
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument(
+    "-n", "--units", type=int, default=2000,
+    help="Number of library packages to generate (default: 2000). Each"
+         " package comes with a spec and a body, so the number of source"
+         " files is a bit more than twice this number."
+)
+parser.add_argument(
+    "-s", "--subprograms", type=int, default=20,
+    help="Number of subprograms per package (default: 20)"
+)
+parser.add_argument(
+    "-r", "--rounds", type=int, default=3,
+    help="Number of provider creations to run in each mode (default: 3)"
+)
+parser.add_argument(
+    "-j", "--jobs", type=int, default=1,
+    help="Number of jobs to use to create providers (default: 1). If zero,"
+         " use one job per CPU."
+)
+parser.add_argument(
+    "-o", "--output-dir",
+    help="Directory in which to generate sources. If it already contains"
+         " sources, they are reused. By default, use a temporary directory"
+         " that is removed at the end."
+)
+
+
+def unit_name(i):
+    return f"Bench_{i:05}"
+
+
+def write_file(dirname, filename, content):
+    with open(os.path.join(dirname, filename), "w") as f:
+        f.write(content)
+
+
+def generate_sources(dirname, units, subprograms):
+    """
+    Generate sources for ``units`` packages with ``subprograms`` subprograms
+    each in ``dirname``.
+    """
+    for i in range(units):
+        name = unit_name(i)
+        filename = name.lower()
+
+        withed = [unit_name(j) for j in range(max(0, i - 3), i)]
+        context = "".join(f"with {w}; use {w};\n" for w in withed)
+        decls = "".join(
+            f"   function F{j} (X : Integer) return Integer;\n"
+            for j in range(subprograms)
+        )
+        write_file(
+            dirname, f"{filename}.ads",
+            f"{context}\n"
+            f"package {name} is\n"
+            f"   --  Generated package for auto provider benchmarks\n\n"
+            f"   type Rec is record\n"
+            f"      A, B : Integer;\n"
+            f"   end record;\n\n"
+            f"{decls}"
+            f"   procedure Sub;\n"
+            f"end {name};\n"
+        )
+
+        bodies = "".join(
+            f"   function F{j} (X : Integer) return Integer is\n"
+            f"      R : Rec := (A => X, B => {j});\n"
+            f"   begin\n"
+            f"      for I in 1 .. X loop\n"
+            f"         if R.A > I then\n"
+            f"            R.B := R.B + I * 2;\n"
+            f"         else\n"
+            f"            R.A := R.A - 1;\n"
+            f"         end if;\n"
+            f"      end loop;\n"
+            f"      return R.A + R.B;\n"
+            f"   end F{j};\n\n"
+            for j in range(subprograms)
+        )
+        write_file(
+            dirname, f"{filename}.adb",
+            f"with Ada.Text_IO;\n\n"
+            f"package body {name} is\n\n"
+            f"{bodies}"
+            f"   procedure Sub is separate;\n"
+            f"end {name};\n"
+        )
+        write_file(
+            dirname, f"{filename}-sub.adb",
+            f"separate ({name})\n"
+            f"procedure Sub is\n"
+            f"begin\n"
+            f"   Ada.Text_IO.Put_Line (\"{name}\");\n"
+            f"end Sub;\n"
+        )
+
+        # Also add one generic package and one instantiation every 10 units
+        if i % 10 == 0:
+            write_file(
+                dirname, f"gen_{filename}.ads",
+                f"generic\n"
+                f"   type T is private;\n"
+                f"   with function Convert (X : T) return Integer;\n"
+                f"package Gen_{name} is\n"
+                f"   function Get (X : T) return Integer is (Convert (X));\n"
+                f"end Gen_{name};\n"
+            )
+            write_file(
+                dirname, f"inst_{filename}.ads",
+                f"with Gen_{name};\n"
+                f"with {name};\n"
+                f"package Inst_{name} is new Gen_{name}\n"
+                f"  (Integer, {name}.F0);\n"
+            )
+
+
+def run_mode(label, files, scan_headers, rounds, jobs):
+    """
+    Create ``rounds`` auto providers for ``files`` and return the last one.
+    """
+    print(f"== {label} ==")
+    times = []
+    for i in range(rounds):
+        start = time.perf_counter()
+        up = lal.UnitProvider.auto(
+            files, scan_headers=scan_headers, jobs=jobs
+        )
+        times.append(time.perf_counter() - start)
+        print(f"round {i + 1}: {times[-1]:.3f}s")
+    print(f"best: {min(times):.3f}s")
+    print("")
+    return up, min(times)
+
+
+def check_same_units(units, full_provider, scan_provider):
+    """
+    Check that both providers find the same source files for all units.
+    """
+    mismatches = 0
+    full_ctx = lal.AnalysisContext(unit_provider=full_provider)
+    scan_ctx = lal.AnalysisContext(unit_provider=scan_provider)
+    for i in range(units):
+        for name in (unit_name(i), f"{unit_name(i)}.Sub"):
+            for kind in lal.AnalysisUnitKind:
+                full_unit = full_ctx.get_from_provider(name, kind)
+                scan_unit = scan_ctx.get_from_provider(name, kind)
+                if full_unit.filename != scan_unit.filename:
+                    mismatches += 1
+                    print(
+                        f"mismatch for {name} ({kind}):"
+                        f" {full_unit.filename} vs. {scan_unit.filename}"
+                    )
+    return mismatches
+
+
+def main(args):
+    dirname = args.output_dir or tempfile.mkdtemp(prefix="bench_auto_")
+    try:
+        os.makedirs(dirname, exist_ok=True)
+        if not os.listdir(dirname):
+            print(f"Generating sources in {dirname}...")
+            generate_sources(dirname, args.units, args.subprograms)
+        files = sorted(os.path.join(dirname, f) for f in os.listdir(dirname))
+        print(f"{len(files)} source files")
+        print("")
+
+        full_provider, full_time = run_mode(
+            "Full parsing", files, False, args.rounds, args.jobs
+        )
+        scan_provider, scan_time = run_mode(
+            "Header scanning", files, True, args.rounds, args.jobs
+        )
+        if scan_time:
+            print(f"speedup: {full_time / scan_time:.2f}x")
+
+        mismatches = check_same_units(args.units, full_provider, scan_provider)
+        print(f"{mismatches} mismatches")
+
+    finally:
+        if not args.output_dir:
+            shutil.rmtree(dirname)
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
@@ -0,0 +1,130 @@
+#! /usr/bin/env python
+
+"""
+Benchmark ``DefiningName.p_find_all_references`` with and without the
+reference index.
+
+This loads the given Ada sources (or all the sources of the given project),
+picks a set of defining names in them, and then runs N rounds of
+``p_find_all_references`` queries for all of them over all the loaded units:
+first with the regular tree traversal, then with the reference index enabled.
+The first round with the index includes the time needed to build it.
+"""
+
+import argparse
+import time
+
+import libadalang as lal
+
+
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument("files", nargs="*", help="Ada source files to load")
+parser.add_argument("-P", "--project", help="Project file to use")
+parser.add_argument(
+    "-X", action="append", default=[], metavar="NAME=VALUE",
+    help="Scenario variable to pass to the project file"
+)
+parser.add_argument(
+    "-n", "--rounds", type=int, default=5,
+    help="Number of query rounds to run in each mode (default: 5)"
+)
+parser.add_argument(
+    "-q", "--queries", type=int, default=20,
+    help="Maximum number of defining names to query in each round"
+         " (default: 20)"
+)
+parser.add_argument(
+    "--imprecise-fallback", action="store_true",
+    help="Enable the imprecise fallback for queries"
+)
+
+
+def create_context(args):
+    if not args.project:
+        return lal.AnalysisContext(), args.files
+
+    scenario_vars = dict(x.split("=", 1) for x in args.X)
+    project = lal.GPRProject(args.project, scenario_vars=scenario_vars)
+    files = args.files or project.source_files()
+    return project.create_context(), files
+
+
+def pick_names(units, count):
+    """
+    Return up to ``count`` defining names for subprogram and type
+    declarations in ``units``: these are the typical targets of "find
+    references" queries.
+    """
+    result = []
+    for u in units:
+        for decl in u.root.findall(
+            lambda n: n.is_a(lal.BasicSubpDecl, lal.BaseTypeDecl)
+        ):
+            result.append(decl.p_defining_name)
+            if len(result) == count:
+                return result
+    return result
+
+
+def run_round(names, units, imprecise_fallback):
+    """
+    Run one round of queries and return the elapsed time (in seconds) and the
+    total number of references found.
+    """
+    start = time.perf_counter()
+    ref_count = 0
+    for dn in names:
+        ref_count += len(dn.p_find_all_references(
+            units, imprecise_fallback=imprecise_fallback
+        ))
+    return time.perf_counter() - start, ref_count
+
+
+def run_mode(label, ctx, names, units, args):
+    print(f"== {label} ==")
+    times = []
+    for i in range(args.rounds):
+        elapsed, ref_count = run_round(names, units, args.imprecise_fallback)
+        times.append(elapsed)
+        print(f"round {i + 1}: {elapsed:.3f}s ({ref_count} references)")
+    print(f"total: {sum(times):.3f}s")
+    print("")
+    return times
+
+
+def main(args):
+    ctx, files = create_context(args)
+    units = []
+    for f in files:
+        u = ctx.get_from_file(f)
+        if u.diagnostics:
+            print(f"Skipping {f}: parsing errors")
+        else:
+            units.append(u)
+
+    names = pick_names(units, args.queries)
+    print(f"{len(units)} units loaded, {len(names)} names to query")
+    print("")
+
+    # Resolve all names once beforehand, so that the first scan round does
+    # not pay for the loading of dependencies while the index rounds do not.
+    for dn in names:
+        dn.p_find_all_references(
+            units, imprecise_fallback=args.imprecise_fallback
+        )
+
+    ctx.set_reference_index_enabled(False)
+    scan_times = run_mode("Tree traversal", ctx, names, units, args)
+
+    ctx.set_reference_index_enabled(True)
+    index_times = run_mode("Reference index", ctx, names, units, args)
+
+    if sum(index_times):
+        print(
+            f"speedup: {sum(scan_times) / sum(index_times):.2f}x overall,"
+            f" {min(scan_times) / min(index_times):.2f}x best round"
+        )
+
+
+if __name__ == "__main__":
+    main(parser.parse_args())
@@ -3,18 +3,38 @@
 """
 Utility script to run name resolution on a bunch of Ada files, and help analyze
 the results.
+
+Files are split in chunks, and a pool of worker processes runs ``nameres
+--json`` on each chunk. Results are written to a JSON Lines file as they come
+(one line per source file, sorted by file path at the end of the run), so that
+the memory used does not depend on the number of files. If this file already
+exists when the run starts, it is considered as the result of a previous run:
+the time it took to process each file is used to balance chunks, both files
+are compared by merging them, then the new results replace the old ones.
+
+When nameres crashes on a chunk, the chunk is split in two and both halves are
+run again, until the crash is isolated in a single-file chunk, so that a crash
+only affects the file that caused it.
+
+The results file also acts as a cache: each result records a key computed
+from the nameres executable and Libadalang libraries, the nameres arguments,
+the content of the source file and the content of the source files it depends
+on (see ``cache_keys``). Files whose key did not change since the previous run
+are not analyzed again: their previous results are reused.
 """
 
 import argparse
-from collections import defaultdict
-import cPickle
-from funcy import cat, chunks, memoize, partition_by, split_by
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from glob import glob
+import hashlib
+import itertools
+import json
 import os
-import Queue
 import re
+import shutil
+import statistics
 import subprocess
-from threading import Event, Thread
 import time
 
 from langkit.utils import Colors, col
@@ -24,423 +44,582 @@ try:
     from progressbar import ProgressBar
 except ImportError:
     class ProgressBar(object):
-        def __init__(self, *args):
+        def __init__(self, *args, **kwargs):
             pass
 
         def update(self, *args):
             pass
 
-try:
-    from IPython import embed
-except ImportError:
-    def embed():
-        print("WARNING: calling embed but IPython is not present !")
-
-
-def load_or_create(file_name, constructor):
-    if os.path.isfile(file_name):
-        with open(file_name) as f:
-            return cPickle.load(f)
-    else:
-        return constructor()
+        def finish(self):
+            pass
 
 
-def dump_to(obj, file_name):
-    with open(file_name, "w") as f:
-        cPickle.dump(obj, f)
+parser = argparse.ArgumentParser(description=__doc__)
+parser.add_argument('dirs', help='The dirs to analyze',
+                    type=str, nargs='*')
+parser.add_argument('--pattern', '-p', type=str, default="",
+                    help='Pattern to filter the files')
+parser.add_argument('--jobs', '-j', type=int, default=1,
+                    help='Number of nameres processes to run in parallel')
+parser.add_argument('--chunk-size', '-c', type=int, default=100,
+                    help='Maximum number of files to process in each nameres'
+                         ' run')
+parser.add_argument('--project', '-P', type=str, default="")
+parser.add_argument('--results-file', '-o', type=str,
+                    default="results.jsonl",
+                    help='File in which to write results (default:'
+                         ' results.jsonl). If it exists, it is compared to'
+                         ' the new results before being replaced.')
+parser.add_argument('--no-resolution', '-N', action='store_true',
+                    help='Do not run name resolution, just print the report'
+                         ' for the existing results file')
+parser.add_argument('--automated', '-A', action='store_true',
+                    help='Just print the list of passing files, and do not'
+                         ' save results')
+parser.add_argument('--no-cache', action='store_true',
+                    help='Analyze all files, even the ones that did not'
+                         ' change since the previous run')
+
+
+def file_result(path):
+    """
+    Return an empty result for the source file at ``path``.
+
+    Results are dicts with the following keys, which are written as is to
+    results files:
+
+    * ``file``: absolute path of the source file;
+    * ``successes``: number of nodes for which name resolution succeeded;
+    * ``failures``: list of ``[sloc, exception message]`` pairs for nodes for
+      which name resolution failed (the message is None if it did not raise
+      an exception);
+    * ``crashed``: whether nameres crashed while processing this file;
+    * ``time``: time (in seconds) it took to load, analyze and resolve this
+      file, or None if unknown;
+    * ``key``: cache key for this result (see ``cache_keys``), or None if
+      this result must not be reused.
+    """
+    return {'file': path, 'successes': 0, 'failures': [], 'crashed': False,
+            'time': None, 'key': None}
 
 
-def pmap(fn, collection, nb_threads=10):
+def status(result):
     """
-    Apply fn to each item in collection, returns a collection containing the
-    results. Uses threads to do the processing.
-
-    NOTES:
-    - Since python uses a GIL, you won't get real parallelism except if your
-      underlying function spawns processes (which is our case in the test
-      driver).
-    - Order is not preserved by that algorithm, so it is not strictly a
-      parallel map.
-    - Items from collection are all consumed at once at the beginning to
-      simplify the algorithm.
+    Return "crash", "success" or "failure" for the given file result.
     """
+    if result['crashed']:
+        return 'crash'
+    elif result['failures']:
+        return 'failure'
+    else:
+        return 'success'
 
-    # Create an in queue and an out queue. The in queue will contain all the
-    # data to be processed by the worker threads. The out queue will contain
-    # the results.
-    in_queue, out_queue = Queue.Queue(), Queue.Queue()
 
-    # Fill in the in queue with the items to process
-    map(in_queue.put, collection)
+def nameres_args(project, extra_args, files):
+    project_flag = (
+        "-P{}".format(project) if project else "--with-default-project"
+    )
+    return (["nameres", project_flag, '--all', '--json', '--profile']
+            + extra_args + files)
 
-    e = Event()
-    e.set()
 
-    def consume():
-        """
-        Consumer function to be executed by all threads. Consume one item,
-        process it with fn, and put it in the out queue. Stop the thread when
-        the queue is empty.
-        """
-        while e.is_set():
-            try:
-                out_queue.put(fn(in_queue.get_nowait()))
-            except Queue.Empty:
-                return
-
-    # Create the worker threads and start them
-    threads = [Thread(target=consume) for _ in range(nb_threads)]
-    map(Thread.start, threads)
+def nameres_files(dir, files, project, extra_args):
+    """
+    Run nameres on ``files`` (base names of source files in ``dir``). Return
+    whether nameres crashed and the list of results for the files (see
+    ``file_result``), in the same order.
 
-    try:
-        while True:
-            # If there is no item left in the in queue, wait for the threads to
-            # end and return the elements remaining in the out queue.
-            if in_queue.empty():
-                while any(t.is_alive() for t in threads):
-                    if not out_queue.empty():
-                        yield out_queue.get()
-                while not out_queue.empty():
-                    yield out_queue.get()
-                return
-            # If the in queue still contains elements, just return the results
-            # as they come.
+    This runs in worker processes: only the results are sent back to the main
+    process, not nameres' output.
+    """
+    results = {f: file_result(os.path.join(dir, f)) for f in files}
+
+    with subprocess.Popen(
+        nameres_args(project, extra_args, files),
+        cwd=dir, stdout=subprocess.PIPE, universal_newlines=True
+    ) as p:
+        for line in p.stdout:
+            # Libadalang.Helpers can print exceptions on stdout, so skip lines
+            # that are not JSON records.
+            if not line.startswith('{'):
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue
+            if rec.get('kind') not in ('node_resolution', 'file_profile'):
+                continue
+
+            result = results.get(os.path.basename(rec['file']))
+            if result is None:
+                continue
+            if rec['kind'] == 'file_profile':
+                result['time'] = (rec['lexing'] + rec['parsing'] + rec['ple']
+                                  + rec['resolution'])
+            elif rec['success']:
+                result['successes'] += 1
             else:
-                yield out_queue.get()
-    except KeyboardInterrupt:
-        print("Terminating threads")
-        e.clear()
-        map(Thread.join, threads)
-
-
-def memoized_property(f):
-    return property(memoize(f))
-
-
-class Result(object):
-    def __init__(self, lines, text):
-        import re
-        self.lines = lines
-        self.text = text
-        self.node = re.findall(
-            "for node (.*?)$", text, re.MULTILINE
-        )[0]
-
-    @memoized_property
-    def lineno(self):
-        return self.node.split(" ")[-1].split(":")[0]
-
-    @staticmethod
-    def construct(file_result, lines):
-        text = "\n".join(lines)
-        if "Resolution failed" in text:
-            result = Failure(lines, text)
-        else:
-            result = Success(lines, text)
-        result.file_result = file_result
-        return result
-
-    def __repr__(self):
-        return "<{} {} {}>".format(
-            self.__class__.__name__,
-            self.file_result.file_name,
-            self.node
-        )
+                result['failures'].append(
+                    [rec['sloc'], rec.get('exception_message')]
+                )
 
+    crashed = p.returncode != 0
+    if crashed and len(files) == 1:
+        results[files[0]]['crashed'] = True
 
-class Success(Result):
-    pass
+    return crashed, [results[f] for f in files]
 
 
-class Failure(Result):
-    def __init__(self, lines, text):
-        super(Failure, self).__init__(lines, text)
-        self.exception = None
+def list_files(dirs, pattern):
+    """
+    Return the sorted list of absolute paths for the source files to analyze.
+    """
+    paths = []
+    for dir in dirs:
+        dir_files = glob(os.path.join(os.path.abspath(dir), '*.ad?'))
+        if pattern:
+            dir_files = [f for f in dir_files if re.findall(pattern, f)]
+        paths += dir_files
+    return sorted(paths)
 
-        if "exception" in self.text:
-            self.exception = [l for l in lines if l.startswith('>')][0]
-            self.traceback = split_by(lambda l: l != "Traceback:", lines)[1]
 
-    def open_failure(self, editor=None):
-        print(self.text)
-        editor = editor or os.environ.get('EDITOR', 'vim')
-        subprocess.check_call([
-            editor, "+{}".format(self.lineno), self.file_result.file_path
-        ])
+WITH_RE = re.compile(
+    r'^\s*(?:limited\s+)?(?:private\s+)?with\s+([\w.]+(?:\s*,\s*[\w.]+)*)\s*;',
+    re.MULTILINE | re.IGNORECASE
+)
+SEPARATE_RE = re.compile(r'^\s*separate\s*\(\s*([\w.]+)\s*\)',
+                         re.MULTILINE | re.IGNORECASE)
+UNIT_RE = re.compile(
+    r'^(?:private\s+)?(?:package|procedure|function)\s+(?:body\s+)?([\w.]+)',
+    re.MULTILINE | re.IGNORECASE
+)
+COMMENT_RE = re.compile(r'--[^\n]*')
 
-    def debug_nameres(self):
-        self.file_result.rerun_nameres(True, ["-L{}".format(self.lineno)])
 
+def file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
 
-class FileResult(object):
-    def __init__(self, file_name, dir):
-        self.file_name = file_name
-        self.dir = dir
-        self.successes = []
-        self.failures = []
-        self.has_crashed = False
 
-    def add(self, result):
-        if isinstance(result, Success):
-            self.successes.append(result)
-        else:
-            print("Adding failure {}".format(result))
-            self.failures.append(result)
+def build_id():
+    """
+    Return a hash for the nameres executable and the Libadalang shared
+    libraries it uses, if any.
+    """
+    exe = shutil.which('nameres')
+    if exe is None:
+        return None
+    files = [exe]
+    try:
+        ldd = subprocess.check_output(['ldd', exe], universal_newlines=True,
+                                      stderr=subprocess.DEVNULL)
+    except (OSError, subprocess.CalledProcessError):
+        ldd = ''
+    for line in ldd.splitlines():
+        # Lines look like "libadalang.so => /path/to/libadalang.so (0x...)"
+        words = line.split()
+        if len(words) >= 3 and words[1] == '=>' and 'adalang' in words[0]:
+            files.append(words[2])
+
+    h = hashlib.sha256()
+    for f in files:
+        h.update(file_hash(f).encode())
+    return h.hexdigest()
+
+
+def source_dependencies(paths):
+    """
+    Return a mapping from each file in ``paths`` to the set of files in
+    ``paths`` it directly depends on: specs of withed units, spec of the
+    parent unit, spec of the unit for bodies and parent body for subunits.
 
-    @memoized_property
-    def is_success(self):
-        return len(self.failures) == 0
+    This is an approximation computed with regular expressions, which may
+    find too many dependencies but should not miss any among ``paths``.
+    """
+    units = {}
+    for path in paths:
+        with open(path, errors='replace') as f:
+            text = COMMENT_RE.sub('', f.read())
+        units[path] = (
+            {name.lower() for name in UNIT_RE.findall(text)},
+            {name.strip().lower()
+             for names in WITH_RE.findall(text)
+             for name in names.split(',')},
+            {name.lower() for name in SEPARATE_RE.findall(text)},
+        )
 
-    @memoized_property
-    def exceptions(self):
-        return [f for f in self.failures if f.exception]
+    unit_files = {}
+    for path, (declared, _, _) in units.items():
+        for name in declared:
+            unit_files.setdefault(name, []).append(path)
+
+    def specs(name):
+        return [p for p in unit_files.get(name, []) if not p.endswith('.adb')]
+
+    result = {}
+    for path, (declared, withed, separate) in units.items():
+        deps = set()
+        for name in withed:
+            deps.update(specs(name))
+        for name in declared:
+            if '.' in name:
+                deps.update(specs(name.rsplit('.', 1)[0]))
+            if path.endswith('.adb'):
+                deps.update(specs(name))
+        for name in separate:
+            deps.update(unit_files.get(name, []))
+        deps.discard(path)
+        result[path] = deps
+    return result
+
+
+def cache_keys(paths, project, extra_args):
+    """
+    Return a mapping from each file in ``paths`` to the key for its results:
+    a hash of the nameres build (see ``build_id``), nameres arguments, the
+    file content and the content of the files in its dependency closure (see
+    ``source_dependencies``).
 
-    def __repr__(self):
-        return "<FileResult {} failures:{}>".format(
-            self.file_name, len(self.failures)
-        )
+    Note that dependencies that are not in ``paths`` (runtime units, units
+    in other source directories of the project) are not taken into account.
+    """
+    hashes = {path: file_hash(path) for path in paths}
+    deps = source_dependencies(paths)
+    common = [build_id(), nameres_args(project, extra_args, [])]
+    if project:
+        common.append(file_hash(project))
+
+    result = {}
+    for path in paths:
+        closure = set()
+        stack = [path]
+        while stack:
+            for dep in deps[stack.pop()]:
+                if dep not in closure:
+                    closure.add(dep)
+                    stack.append(dep)
+        closure.discard(path)
+
+        closure_hash = hashlib.sha256()
+        for dep in sorted(closure):
+            closure_hash.update(dep.encode())
+            closure_hash.update(hashes[dep].encode())
+
+        result[path] = hashlib.sha256(json.dumps(
+            common + [hashes[path], closure_hash.hexdigest()]
+        ).encode()).hexdigest()
+    return result
+
+
+def load_previous_results(file_name, keys):
+    """
+    Return information from the given results file (if it exists): a
+    mapping from file paths to the time it took to process them, and the set
+    of files whose results can be reused according to ``keys``.
+    """
+    timings = {}
+    reusable = set()
+    if not os.path.isfile(file_name):
+        return timings, reusable
 
-    @memoized_property
-    def file_path(self):
-        return os.path.join(self.dir, self.file_name)
+    for result in read_results(file_name):
+        path = result['file']
+        if result.get('time') is not None:
+            timings[path] = result['time']
+        if result.get('key') is not None and result['key'] == keys.get(path):
+            reusable.add(path)
+    return timings, reusable
 
-    @staticmethod
-    def nameres_files(dir, files, debug=False, project="", extra_args=[]):
 
-        if len(files) == 1:
-            print("Analyzing file {}".format(files[0]))
+def make_chunks(paths, chunk_size, jobs, timings):
+    """
+    Split ``paths`` into (dir, files) chunks, sorted by decreasing estimated
+    cost.
+
+    The cost of a file is the time it took in the previous run (the median
+    time for files that were not processed then). Chunks contain at most
+    ``chunk_size`` files, and are small enough for the total cost to be
+    split in about 4 chunks per job, so that a slow file does not delay a
+    whole chunk of other files and so that workers that are done with cheap
+    chunks can take the remaining ones.
+    """
+    known_times = [timings[p] for p in paths if p in timings]
+    default_time = statistics.median(known_times) if known_times else 1.0
+    costs = {p: timings.get(p, default_time) for p in paths}
+    max_cost = sum(costs.values()) / (4 * jobs)
+
+    result = []
+    for dir, dir_paths in itertools.groupby(paths, os.path.dirname):
+        files = []
+        cost = 0.0
+        for path in dir_paths:
+            if files and (
+                len(files) >= chunk_size or cost + costs[path] > max_cost
+            ):
+                result.append((cost, dir, files))
+                files = []
+                cost = 0.0
+            files.append(os.path.basename(path))
+            cost += costs[path]
+        if files:
+            result.append((cost, dir, files))
+
+    result.sort(key=lambda chunk: chunk[0], reverse=True)
+    return [(dir, files) for _, dir, files in result]
+
+
+def run_chunks(file_chunks, jobs, project, extra_args):
+    """
+    Run nameres on all chunks with ``jobs`` worker processes, and yield file
+    results as they come.
 
-        project_flag = (
-            "-P{}".format(project) if project else "--with-default-project"
-        )
-        extra_args = list(extra_args)
+    Chunks are submitted in order, at most ``2 * jobs`` at a time. Chunks on
+    which nameres crashes are split in two, and both halves are run before
+    the other chunks.
+    """
+    todo = deque(file_chunks)
+    running = {}
+    with ProcessPoolExecutor(jobs) as executor:
         try:
-            args = (
-                ["nameres", project_flag, '--all']
-                + (['--debug'] if debug else [])
-                + list(extra_args) + files
-            )
-            out = (subprocess.check_call
-                   if debug else subprocess.check_output)(args, cwd=dir)
-            if debug:
-                return
-            results = []
-            for res in out.split("Analyzing ")[1:]:
-                file_name, _, _, content = res.split("\n", 3)
-                content = content.strip()
-                file_result = FileResult(file_name, dir)
-                file_result.extra_args = extra_args
-                file_result.project = project
-                pb = iter(partition_by(lambda l: 'Resolving xrefs' in l,
-                                       content.splitlines()))
-                ct = list(zip(pb, pb))
-                for header, res_lines in ct:
-                    file_result.add(
-                        Result.construct(file_result, header + res_lines)
+            while todo or running:
+                while todo and len(running) < 2 * jobs:
+                    dir, files = todo.popleft()
+                    future = executor.submit(
+                        nameres_files, dir, files, project, extra_args
                     )
+                    running[future] = (dir, files)
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    dir, files = running.pop(future)
+                    crashed, results = future.result()
+                    if crashed and len(files) > 1:
+                        middle = len(files) // 2
+                        todo.appendleft((dir, files[middle:]))
+                        todo.appendleft((dir, files[:middle]))
+                        continue
+                    elif crashed:
+                        print("Resolution crashed.")
+                        print("Command line: {}".format(" ".join(
+                            nameres_args(project, extra_args, files)
+                        )))
+                    yield from results
+        except KeyboardInterrupt:
+            print("Terminating workers")
+            executor.shutdown(wait=True, cancel_futures=True)
+            raise
+
+
+def sort_results(file_name):
+    """
+    Sort the results in the given file by file path. Only file paths and
+    offsets are kept in memory.
+    """
+    index = []
+    with open(file_name, 'rb') as f:
+        offset = 0
+        for line in f:
+            index.append((json.loads(line)['file'], offset))
+            offset += len(line)
+        index.sort()
+
+        with open(file_name + '.sorted', 'wb') as out:
+            for _, offset in index:
+                f.seek(offset)
+                out.write(f.readline())
+    os.replace(file_name + '.sorted', file_name)
+
+
+def read_results(file_name):
+    """
+    Yield results from the given results file, checking that they are sorted
+    by file path.
+    """
+    last_file = None
+    with open(file_name) as f:
+        for line in f:
+            result = json.loads(line)
+            if last_file is not None and result['file'] <= last_file:
+                raise ValueError(
+                    "{}: results are not sorted by file ({})".format(
+                        file_name, result['file']
+                    )
+                )
+            last_file = result['file']
+            yield result
 
-                results.append(file_result)
-            return results
-        except subprocess.CalledProcessError:
-            print("Resolution crashed.")
-            print("Command line: {}".format(" ".join(args)))
-            return []
-        except Exception as e:
-            print("Exception : {}".format(e))
-            return []
-        finally:
-            if debug:
-                print("Command line: {}".format(" ".join(args)))
-                print("Dir: {}".format(dir))
-
-    def rerun_nameres(self, debug=False, extra_args=[]):
-        extra_args = list(extra_args)
-        res = self.nameres_files(self.dir, [self.file_name],
-                                 debug=debug,
-                                 extra_args=extra_args + self.extra_args,
-                                 project=self.project)
-        if res:
-            return res[0]
-
-
-class Results(object):
-    def __init__(self):
-        self.successes = []
-        self.failures = []
-        self.crashes = []
-        self.save = True
-
-    def __len__(self):
-        return len(self.successes) + len(self.failures)
-
-    def add(self, results):
-        for result in results:
-            if result.is_success:
-                self.successes.append(result)
-            elif result.has_crashed:
-                self.crashes.append(result)
-            else:
-                self.failures.append(result)
-
-    @memoized_property
-    def individual_successes(self):
-        return cat(s.successes for s in self.successes)
-
-    @memoized_property
-    def individual_failures(self):
-        return cat(s.failures for s in self.failures)
-
-    @memoized_property
-    def aggregated_exceptions(self):
-        aggregated_exceptions = defaultdict(list)
-        for failure in self.failures:
-            for exc in failure.exceptions:
-                aggregated_exceptions[exc.exception].append(exc)
-        return aggregated_exceptions
-
-    @memoized_property
-    def exceptions_to_files(self):
-        exceptions = defaultdict(set)
-
-        for failure in self.failures:
-            for exc in failure.exceptions:
-                exceptions[exc.exception].add(failure.file_name)
-
-        def key(key_value):
-            k, _ = key_value
-            return len(k)
-
-        return sorted(exceptions.items(), key=key)
 
-    def get_failure(self, filename):
-        return [f for f in self.failures if f.file_name == filename][0]
+def merge_results(old_results, new_results):
+    """
+    Merge two streams of results sorted by file path. Yield (old result, new
+    result) pairs for each file, with None for a file missing in one stream.
+    """
+    old = next(old_results, None)
+    new = next(new_results, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old['file'] < new['file']):
+            yield old, None
+            old = next(old_results, None)
+        elif old is None or new['file'] < old['file']:
+            yield None, new
+            new = next(new_results, None)
+        else:
+            yield old, new
+            old = next(old_results, None)
+            new = next(new_results, None)
 
 
-def main(dirs, pattern, j, chunk_size, automated,
-         no_resolution, project, extra_args):
+class Report(object):
+    """
+    Aggregated statistics for a stream of results.
+    """
 
-    if not automated:
-        print("Loading old results ..")
-        prev_results = load_or_create("results_file", lambda: None)
-        if no_resolution:
-            results = prev_results
-            embed()
-            return
+    def __init__(self):
+        self.nb_files = Counter()
+        self.ind_successes = 0
+        self.ind_failures = 0
+        self.crashes = []
+        self.exceptions_to_files = Counter()
 
-    results = Results()
-    files = []
-    for dir in dirs:
-        dir_files = sorted(glob('{}/*.ad?'.format(dir)))
-        if pattern:
-            dir_files = [f for f in dir_files if re.findall(pattern, f)]
-        dir_files = chunks(
-            chunk_size,
-            map(os.path.basename, dir_files)
+    def add(self, result):
+        self.nb_files[status(result)] += 1
+        if result['crashed']:
+            self.crashes.append(result['file'])
+
+        self.ind_successes += result['successes']
+        self.ind_failures += len(result['failures'])
+        self.exceptions_to_files.update(
+            {msg for _, msg in result['failures'] if msg}
         )
-        files += [(dir, fs) for fs in dir_files]
-
-    project = os.path.abspath(project)
 
-    def transform(dir_f):
-        dir, f = dir_f
-        return FileResult.nameres_files(
-            dir, f, project=project, extra_args=extra_args
-        )
+    def print_report(self):
+        print("Report for {}:".format(time.strftime("%Y-%m-%d %Hh%M")))
+
+        successes = self.nb_files['success']
+        failures = self.nb_files['failure']
+        nb_files = successes + failures
+
+        print("Number of successful tests: {}".format(
+            col(successes, Colors.GREEN)
+        ))
+        print("Number of failures: {}".format(col(failures, Colors.RED)))
+        print("Number of crashes: {}".format(
+            col(len(self.crashes), Colors.RED)
+        ))
+
+        print("Percentage of files passing: {:.2f}%".format(
+            successes / (nb_files or 1) * 100
+        ))
+
+        total_xrefs = self.ind_successes + self.ind_failures
+        print("Number of individual successes: {}".format(
+            col(self.ind_successes, Colors.GREEN)
+        ))
+        print("Number of individual failures: {}".format(
+            col(self.ind_failures, Colors.RED)
+        ))
+        print("Percentage of successes: {:.2f}%".format(
+            self.ind_successes / (total_xrefs or 1) * 100
+        ))
+
+        print("Crashes: ")
+        for crash in sorted(self.crashes):
+            print("    {}".format(crash))
 
-    raw_results = pmap(transform, files, nb_threads=j)
+        print("Exceptions:")
+        for msg, nb_files in sorted(self.exceptions_to_files.items(),
+                                    key=lambda item: len(item[0])):
+            print("{}: {}".format(nb_files, msg))
 
-    total_nb_files = sum(len(fs[1]) for fs in files)
 
-    bar = ProgressBar(max_value=total_nb_files)
-    for subresults in raw_results:
-        results.add(subresults)
-        bar.update(len(results))
+def print_comparison(old_file, new_file):
+    """
+    Print the files that pass (respectively fail) in ``new_file`` and that
+    did not in ``old_file``.
+    """
+    newly_passing = []
+    newly_failing = []
+    for old, new in merge_results(read_results(old_file),
+                                  read_results(new_file)):
+        if new is None:
+            continue
+        old_status = old and status(old)
+        new_status = status(new)
+        if new_status == old_status:
+            continue
+        if new_status == 'success':
+            newly_passing.append(new['file'])
+        elif new_status == 'failure':
+            newly_failing.append(new['file'])
+
+    print(col("Newly passing tests:", Colors.GREEN))
+    for f in newly_passing:
+        print("    {}".format(f))
+    print(col("Newly failing tests:", Colors.RED))
+    for f in newly_failing:
+        print("   {}".format(f))
+
+
+def main(args, extra_args):
+    if args.no_resolution:
+        report = Report()
+        for result in read_results(args.results_file):
+            report.add(result)
+        report.print_report()
+        return
 
-    if automated:
+    paths = list_files(args.dirs, args.pattern)
+    project = os.path.abspath(args.project) if args.project else ""
+    keys = cache_keys(paths, project, extra_args)
+    timings, reusable = load_previous_results(args.results_file, keys)
+    if args.no_cache:
+        reusable = set()
+    to_analyze = [p for p in paths if p not in reusable]
+    file_chunks = make_chunks(to_analyze, args.chunk_size, args.jobs,
+                              timings)
+
+    report = Report()
+    new_results_file = args.results_file + '.new'
+    with open(new_results_file, 'w') as f:
+        if reusable:
+            print("Reusing the results for {} unchanged files".format(
+                len(reusable)
+            ))
+            for result in read_results(args.results_file):
+                if result['file'] in reusable:
+                    f.write(json.dumps(result))
+                    f.write('\n')
+                    report.add(result)
+
+        bar = ProgressBar(max_value=len(to_analyze))
+        for i, result in enumerate(
+            run_chunks(file_chunks, args.jobs, project, extra_args), 1
+        ):
+            # Crashes can come from resource exhaustion, so do not consider
+            # them as reproducible.
+            if not result['crashed']:
+                result['key'] = keys[result['file']]
+            f.write(json.dumps(result))
+            f.write('\n')
+            report.add(result)
+            bar.update(i)
+    bar.finish()
+    sort_results(new_results_file)
+
+    if args.automated:
         print("ACATS Passing:")
-        for success in results.successes:
-            print(success.file_name)
+        for result in read_results(new_results_file):
+            if status(result) == 'success':
+                print(os.path.basename(result['file']))
+        os.remove(new_results_file)
         return
 
-    ####################################
-    # Start of interactive mode report #
-    ####################################
-
-    print("Report for {}:".format(time.strftime("%Y-%m-%d %Hh%M")))
-
-    successes = len(results.successes)
-    failures = len(results.failures)
-    nb_files = successes + failures
-
-    print(
-        "Number of successful tests: {}".format(col(successes, Colors.GREEN))
-    )
-    print("Number of failures: {}".format(col(failures, Colors.RED)))
-    print(
-        "Number of crashes: {}".format(col(len(results.crashes), Colors.RED))
-    )
-
-    print("Percentage of files passing: {:.2f}%".format(
-        float(successes) / float(nb_files) * 100
-    ))
-
-    ind_successes = len(results.individual_successes)
-    ind_failures = len(results.individual_failures)
-    total_xrefs = ind_successes + ind_failures
-
-    print("Number of individual successes: {}".format(
-        col(ind_successes, Colors.GREEN)
-    ))
-    print("Number of individual failures: {}".format(
-        col(ind_failures, Colors.RED)
-    ))
-
-    print("Percentage of successes: {:.2f}%".format(
-        float(ind_successes) / float(total_xrefs) * 100
-    ))
-
-    print("Crashes: ")
-    for crash in results.crashes:
-        print("    {}".format(crash.file_name))
-
-    def print_exceptions():
-        print("Exceptions:")
-        for msg, files in results.exceptions_to_files:
-            print("{}: {}".format(len(files), msg))
-
-    previously_passing = set()
-    previously_failing = set()
-    if prev_results is not None:
-        print(col("Newly passing tests:", Colors.GREEN))
-        previously_passing = set(r.file_name for r in prev_results.successes)
-        now_passing = set(r.file_name for r in results.successes)
-        for f in (now_passing - previously_passing):
-            print("    {}".format(f))
-
-        print(col("Newly failing tests:", Colors.RED))
-        previously_failing = set(r.file_name for r in prev_results.failures)
-        now_failing = set(r.file_name for r in results.failures)
-        for f in (now_failing - previously_failing):
-            print("   {}".format(f))
-
-    embed()
-
-    if results.save:
-        dump_to(results, "results_file")
+    report.print_report()
+    if os.path.isfile(args.results_file):
+        print_comparison(args.results_file, new_results_file)
+    os.replace(new_results_file, args.results_file)
 
 
 if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description=__doc__)
-    parser.add_argument('dirs', help='The dirs to analyze',
-                        type=str, nargs='*')
-    parser.add_argument('--pattern', '-p', type=str, default="",
-                        help='Pattern to filter the files')
-    parser.add_argument('--jobs', '-j', type=int, default=1)
-    parser.add_argument('--chunk-size', '-c', type=int, default=100)
-    parser.add_argument('--project', '-P', type=str, default="")
-    parser.add_argument('--no-resolution', '-N', action='store_true')
-    parser.add_argument('--automated', '-A', action='store_true')
     args, extra_args = parser.parse_known_args()
-    main(args.dirs, args.pattern, args.jobs, args.chunk_size,
-         args.automated, args.no_resolution,
-         args.project, extra_args)
+    main(args, extra_args)